@@ -0,0 +1,209 @@
+import math
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from masumi_crew.telemetry import registry
+from payment_poller import PAID_STATES
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Admission control
+#
+# A /start_job that is accepted costs the purchaser a payment, so it should
+# only be accepted when the node can run the job in reasonable time. The
+# controller counts the work the node has already committed to (running and
+# queued crew runs plus payment requests that may still be paid) against its
+# capacity, watches recent run latency and the rate governor's provider
+# state, and rejects new jobs before a payment request is created. The same
+# numbers are reported on /availability.
+#
+# Pending work is counted from the job store, so batch jobs count from the
+# moment they are reserved, and paid jobs count until a crew run takes them.
+# ─────────────────────────────────────────────────────────────────────────────
+
+# Jobs in these states hold a slot before the runner or work queue sees them
+PENDING_STATUSES = ("starting", "awaiting_payment")
+
+admission_rejected = registry.counter(
+    "masumi_admission_rejected_total", "Job requests turned away before a payment request was created.", ("reason",),
+)
+
+
+class OverCapacityError(Exception):
+    """ Raised when the node should not take another job; retry_after is a hint in seconds """
+
+    def __init__(self, reason: str, message: str, retry_after: float):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, math.ceil(fraction * len(values)) - 1)]
+
+
+def _seconds_to_utc_midnight(now: float) -> float:
+    return 86400 - now % 86400
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        runner,
+        jobs,
+        work_queue=None,
+        governor=None,
+        max_queue_depth: int = 100,
+        pending_window: float = 300,
+        latency_window: float = 900,
+        max_p95_seconds: Optional[float] = None,
+        max_pause_seconds: float = 10,
+        refresh_interval: float = 5,
+    ):
+        self.runner = runner
+        self.jobs = jobs
+        self.work_queue = work_queue
+        self.governor = governor
+        self.max_queue_depth = max_queue_depth
+        self.pending_window = pending_window
+        self.latency_window = latency_window
+        self.max_p95_seconds = max_p95_seconds
+        self.max_pause_seconds = max_pause_seconds
+        self.refresh_interval = refresh_interval
+        self._latency: Dict[str, Any] = {}
+        self._latency_at = 0.0
+
+    @classmethod
+    def from_env(cls, runner, jobs, work_queue=None, governor=None) -> "AdmissionController":
+        """
+        Builds a controller from ADMISSION_MAX_QUEUE_DEPTH, _PENDING_WINDOW,
+        _LATENCY_WINDOW, _MAX_P95_SECONDS (0: latency never rejects) and
+        _MAX_PAUSE_SECONDS
+        """
+        max_p95 = float(os.getenv("ADMISSION_MAX_P95_SECONDS", "0"))
+        return cls(
+            runner,
+            jobs,
+            work_queue=work_queue,
+            governor=governor,
+            max_queue_depth=int(os.getenv("ADMISSION_MAX_QUEUE_DEPTH", "100")),
+            pending_window=float(os.getenv("ADMISSION_PENDING_WINDOW", "300")),
+            latency_window=float(os.getenv("ADMISSION_LATENCY_WINDOW", "900")),
+            max_p95_seconds=max_p95 if max_p95 > 0 else None,
+            max_pause_seconds=float(os.getenv("ADMISSION_MAX_PAUSE_SECONDS", "10")),
+        )
+
+    def latency(self) -> Dict[str, Any]:
+        """ Run time percentiles of jobs completed within latency_window, recomputed every refresh_interval """
+        now = time.time()
+        if now - self._latency_at >= self.refresh_interval:
+            finished = self.jobs.finished_since(now - self.latency_window, limit=1000)
+            durations = [
+                job["run_seconds"] for job in finished
+                if job["status"] == "completed" and job.get("run_seconds") is not None
+            ]
+            self._latency = {
+                "window_seconds": self.latency_window,
+                "jobs": len(durations),
+                "p50_seconds": _percentile(durations, 0.5),
+                "p95_seconds": _percentile(durations, 0.95),
+            }
+            self._latency_at = now
+        return self._latency
+
+    def pending(self) -> Tuple[int, int]:
+        """
+        Jobs waiting on their payment request or payment, and paid jobs no crew
+        run has taken yet. Unpaid jobs older than pending_window are unlikely
+        to be paid and are not counted.
+        """
+        since = time.time() - self.pending_window
+        unpaid = paid = 0
+        for job in self.jobs.find(status=PENDING_STATUSES):
+            # A batch record has no run of its own; its jobs are counted one by one
+            if job.get("kind") == "batch":
+                continue
+            if job.get("payment_status") in PAID_STATES:
+                paid += 1
+            elif job.get("created_at", 0) >= since:
+                unpaid += 1
+        return unpaid, paid
+
+    def capacity(self) -> Dict[str, Any]:
+        """ Committed work, free capacity, latency and provider rate-limit state of this node """
+        pending, paid = self.pending()
+        if self.work_queue is None:
+            limit = self.runner.max_workers + self.runner.max_queue
+            running, queue_depth = self.runner.running, self.runner.queued
+            free_worker_slots: Optional[int] = self.runner.free_slots
+            zombies: Optional[int] = self.runner.zombies
+        else:
+            # Crew workers live on other nodes; the shared queue is the backlog
+            stats = self.work_queue.stats()
+            limit = self.max_queue_depth
+            running, queue_depth = stats["leased"], stats["ready"] + stats["expired"]
+            free_worker_slots = zombies = None
+        committed = running + queue_depth + pending + paid
+        return {
+            "execution": "local" if self.work_queue is None else "queue",
+            "limit": limit,
+            "committed": committed,
+            "free": max(limit - committed, 0),
+            "free_worker_slots": free_worker_slots,
+            "running": running,
+            "zombies": zombies,
+            "queue_depth": queue_depth,
+            "pending_payments": pending,
+            "paid_unstarted": paid,
+            "latency": self.latency(),
+            "rate_limits": self.governor.stats() if self.governor else {},
+        }
+
+    def check(self, slots: int = 1) -> None:
+        """ Raises OverCapacityError if the node should not take slots more jobs now """
+        error = self.refusal(slots)
+        if error is not None:
+            admission_rejected.inc(reason=error.reason)
+            raise error
+
+    def refusal(self, slots: int = 1, capacity: Optional[Dict[str, Any]] = None) -> Optional[OverCapacityError]:
+        """ The reason the node would turn away slots more jobs now, or None """
+        try:
+            self._check(slots, capacity or self.capacity())
+        except OverCapacityError as e:
+            return e
+        return None
+
+    def _check(self, slots: int, capacity: Dict[str, Any]) -> None:
+        now = time.time()
+        for provider, state in capacity["rate_limits"].items():
+            if state["daily_quota"] is not None and state["used_today"] >= state["daily_quota"]:
+                raise OverCapacityError(
+                    "quota", f"The {provider} daily quota is used up", _seconds_to_utc_midnight(now)
+                )
+            if state["paused_for"] > self.max_pause_seconds:
+                raise OverCapacityError(
+                    "rate_limited", f"{provider} is rate limiting this node", state["paused_for"]
+                )
+
+        latency = capacity["latency"]
+        if self.max_p95_seconds and (latency["p95_seconds"] or 0) > self.max_p95_seconds:
+            raise OverCapacityError(
+                "latency",
+                f"Recent jobs took {latency['p95_seconds']:.0f}s at p95, over the {self.max_p95_seconds:.0f}s limit",
+                60,
+            )
+
+        # A batch larger than the whole node is still taken when the node is idle
+        if capacity["committed"] + min(slots, capacity["limit"]) > capacity["limit"]:
+            # Roughly when a running job will have freed its slot
+            retry_after = min(max(latency["p50_seconds"] or 30, 5), 300)
+            raise OverCapacityError(
+                "capacity",
+                f"{capacity['committed']} jobs are already running, queued or awaiting payment"
+                f" (limit {capacity['limit']})",
+                retry_after,
+            )
@@ -1,14 +1,22 @@
+import asyncio
+import json
 import os
 import uvicorn
 import uuid
 from dotenv import load_dotenv
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, Query, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from datetime import datetime, timezone
 from typing import List, Optional
-from crewai import Agent, Crew, Task, LLM
-from composio_crewai import ComposioToolSet, App
-from crewai_tools import BraveSearchTool
+from job_runner import JobRunner, QueueFullError, JobTimeoutError
+from job_store import create_job_store
+from job_events import JobEventBus, parse_last_event_id
+from masumi_crew.checkpoints import get_checkpoint_store
+from masumi_crew.models import Contact, JobResult
+from masumi_crew.parsing import contacts_guardrail, parse_contacts
+from masumi_crew.telemetry import install_crewai_listeners, span
+from masumi_crew.crew_pool import CrewPool, reset_crew
+from warmup import Warmup
 
 # Load environment variables
 load_dotenv()
@@ -24,8 +32,23 @@ app = FastAPI()
 async def root():
     return {"message": "Welcome to Apollo Email Crew API", "docs_url": "http://localhost:8000/docs"}
 
-# Temporary in-memory job store (DO NOT USE IN PRODUCTION)
-jobs = {}
+# Persistent job store, shared by every uvicorn worker (JOB_STORE_URL, JOB_TTL_SECONDS)
+jobs = create_job_store()
+
+# Crew runs are handed to a bounded worker pool so they never block the event loop.
+# Tune with CREW_MAX_WORKERS, CREW_MAX_QUEUE, CREW_JOB_TIMEOUT and CREW_WORKER_MODE.
+crew_runner = JobRunner.from_env()
+
+# Progress events per job, streamed over SSE on /jobs/{job_id}/events
+job_events = JobEventBus(
+    replay_size=int(os.getenv("JOB_EVENTS_REPLAY_SIZE", "500")),
+    jobs=jobs,
+    poll_seconds=float(os.getenv("JOB_EVENTS_POLL_SECONDS", "2"))
+)
+
+@app.on_event("startup")
+async def bind_job_events():
+    job_events.bind_loop(asyncio.get_running_loop())
 
 # Pydantic Models
 class KeyValuePair(BaseModel):
@@ -39,16 +62,29 @@ class ProvideInputRequest(BaseModel):
     job_id: str
 
 class ApolloEmailCrew:
-    def __init__(self):
-        self.toolset = ComposioToolSet()
-        self.apollo_tools = self.toolset.get_tools(apps=[App.APOLLO])
-        self.gmail_tools = self.toolset.get_tools(apps=[App.GMAIL])
-        self.brave_search = BraveSearchTool(n_results=3)
+    def __init__(self, on_event=None):
+        # crewai and Composio take seconds to import, so they load with the first crew, not the app
+        from crewai import Agent, Crew, Task
+        from composio_crewai import App
+        from masumi_crew.tools.registry import get_tools
+        from masumi_crew.model_router import get_model_router
+        from masumi_crew.outreach import OutreachPipeline
+
+        # on_event(event_type, data) receives progress updates for /jobs/{job_id}/events
+        self.on_event = on_event
+
+        # Each step's output is checkpointed per job, so a retried job resumes
+        # after the last step that completed
+        self.checkpoints = get_checkpoint_store()
+
+        # Tools come from the process-wide registry, loaded once and shared across jobs
+        self.apollo_tools = get_tools(App.APOLLO)
         
-        self.llm = LLM(
-            model="gpt-4-turbo",
-            max_tokens=4000,
-        )
+        # Models per step come from config/models.yaml: a small fast model for the
+        # Apollo search and JSON extraction, the stronger one only for email copy.
+        # Identical prompts are answered from the on-disk LLM cache.
+        router = get_model_router()
+        self.llm = router.llm_for("apollo_search")
         
         self.apollo_agent = Agent(
             role="Lead Prospector",
@@ -59,15 +95,6 @@ class ApolloEmailCrew:
             llm=self.llm
         )
         
-        self.email_agent = Agent(
-            role="Email Outreach Specialist",
-            goal="Send personalized emails to contacts using Gmail API",
-            backstory="Expert in crafting and sending professional outreach emails with high response rates.",
-            tools=self.gmail_tools,
-            verbose=True,
-            llm=self.llm
-        )
-        
         self.search_task = Task(
             description="""
             Seed-stage investors focused on B2B SaaS with $500K-$1M check sizes
@@ -80,6 +107,9 @@ class ApolloEmailCrew:
             Please make sure most of them have an email, if not, try not to return it.
             """,
             agent=self.apollo_agent,
+            callback=self._on_search_done,
+            # Validates the JSON contacts and re-asks the agent (bounded) if none parse
+            guardrail=contacts_guardrail,
             expected_output="""
             If you get an error, try a different combination of parameters or keywords.
 
@@ -104,43 +134,113 @@ class ApolloEmailCrew:
             llm=self.llm
         )
         
-        self.email_task = Task(
-            description="""
-            Send personalized emails to each contact in the enriched contacts list.
-            
-            For each contact, create a personalized email that includes:
-            1. Their name and company
-            2. A brief introduction
-            3. The value proposition
-            4. A clear call to action
-            
-            Use the GMAIL_SEND_EMAIL tool with the following parameters:
-            - user_id: 'me'
-            - recipient_email: The contact's email
-            - subject: Personalized subject line
-            - body: The email content
-            - is_html: true
-            
-            Return a status report for each email sent.
-            """,
-            agent=self.email_agent,
-            expected_output="""List of email sending status reports, output in JSON format ONLY. DON'T RETURN ANYTHING ELSE {
-               "email_content": "Email content",
-               "status": "success"
-            }""",
-            llm=self.llm
+        # Emails are written in batched LLM calls and sent by a deterministic
+        # pipeline instead of an agent calling GMAIL_SEND_EMAIL once per contact
+        self.outreach = OutreachPipeline(
+            router.llm_for("outreach_email"),
+            batch_size=int(os.getenv("OUTREACH_BATCH_SIZE", "10")),
+            max_workers=int(os.getenv("OUTREACH_CONCURRENCY", "4"))
         )
         
         self.crew = Crew(
-            agents=[self.apollo_agent, self.email_agent],
-            tasks=[self.search_task, self.email_task],
+            agents=[self.apollo_agent],
+            tasks=[self.search_task],
             verbose=True,
             llm=self.llm
         )
     
-    def execute(self, inputs=None):
-        return self.crew.kickoff(inputs)
-        
+    def reset(self):
+        """ Clears per-job state so crew_pool can hand this crew to the next job """
+        self.on_event = None
+        reset_crew(self.crew)
+
+    def _emit(self, event_type, data=None):
+        if self.on_event:
+            self.on_event(event_type, data)
+
+    def _on_search_done(self, output):
+        contacts = parse_contacts(output)
+        self._emit("contacts_found", [contact.model_dump(exclude_none=True) for contact in contacts])
+
+    def _search(self, inputs, job_id=None):
+        """ Runs the Apollo search, or rebuilds its output from the job's checkpoint """
+        from crewai.crews.crew_output import CrewOutput
+        from crewai.tasks.task_output import TaskOutput
+
+        saved = self.checkpoints.get(job_id, "contacts") if self.checkpoints and job_id else None
+        if saved is not None:
+            # An earlier attempt of this job already found the contacts
+            self._emit("contacts_found", saved)
+            search_output = TaskOutput(
+                description=self.search_task.description,
+                agent=self.apollo_agent.role,
+                raw=json.dumps(saved)
+            )
+            return CrewOutput(raw=search_output.raw, tasks_output=[search_output]), [Contact(**c) for c in saved]
+
+        with span("crew", "apollo_search") as crew_span:
+            result = self.crew.kickoff(inputs)
+            crew_span.add_usage(result.token_usage)
+        contacts = parse_contacts(result.tasks_output[0])
+        if self.checkpoints and job_id:
+            self.checkpoints.save(job_id, "contacts", [contact.model_dump(exclude_none=True) for contact in contacts])
+        return result, contacts
+
+    def execute(self, inputs=None, job_id=None):
+        from crewai.tasks.task_output import TaskOutput
+
+        inputs = inputs or {}
+        result, contacts = self._search(inputs, job_id)
+
+        with span("task", "outreach"):
+            statuses = self.outreach.run(
+                job_id or str(uuid.uuid4()),
+                [contact.model_dump(exclude_none=True) for contact in contacts],
+                pitch=str(inputs.get("text", "")),
+                on_status=lambda status: self._emit("email_status", status)
+            )
+
+        # Report the sends as the crew's final task output, as the email agent used to
+        email_output = TaskOutput(
+            description="Send personalized outreach emails to each contact",
+            agent="Email Outreach Specialist",
+            raw=json.dumps(statuses)
+        )
+        result.tasks_output.append(email_output)
+        result.raw = email_output.raw
+        result.json_dict = JobResult(contacts=contacts, emails=statuses).model_dump()
+        return result
+
+
+# Pre-built crews, one per worker, reused across jobs instead of rebuilt per job
+crew_pool = CrewPool(ApolloEmailCrew, size=crew_runner.max_workers, reset=ApolloEmailCrew.reset, name="apollo_email")
+
+
+def load_crew_stack():
+    """Imports crewai and Composio and hooks crewai's events into the stage timings."""
+    import crewai, composio_crewai  # noqa: F401
+    from masumi_crew import llm_cache, model_router, outreach  # noqa: F401
+    install_crewai_listeners()
+
+# The crew stack loads in the background once the server is listening, so
+# /health and /availability answer immediately; /ready flips when it is done.
+warmup = Warmup()
+warmup.step("crew_stack", load_crew_stack)
+# Process workers build their own crews; only thread workers share this pool
+if crew_runner.mode == "thread":
+    warmup.step("crew_pool", crew_pool.warm, required=False)
+
+@app.on_event("startup")
+async def start_warmup():
+    warmup.start()
+
+
+def run_apollo_email_crew(text: str, on_event=None, job_id=None):
+    """Runs a job on a pooled crew. Executed inside a crew_runner worker."""
+    with crew_pool.lease() as crew:
+        crew.on_event = on_event
+        return crew.execute({"text": text}, job_id=job_id)
+
 
 # 1) Start Job (MIP-003: /start_job)
 @app.post("/start_job")
@@ -156,23 +256,50 @@ async def start_job(request_body: StartJobRequest):
     job_id = str(uuid.uuid4())
     payment_id = str(uuid.uuid4())  # Placeholder, in production track real payment
 
-    # For demonstration: set job status to 'awaiting payment'
-    jobs[job_id] = {
-        "status": "awaiting payment",
-        "payment_id": payment_id,
-        "created_at": datetime.now(timezone.utc).isoformat(),
-        "input_data": request_body.text,
-        "result": None
-    }
+    jobs.create(
+        job_id,
+        status="queued",
+        payment_id=payment_id,
+        input_data=request_body.text,
+        result=None
+    )
+
+    emit = job_events.emitter(job_id)
+    emit("queued")
 
-    # Initialize and execute crew
-    crew = ApolloEmailCrew()
-    inputs = {"text": request_body.text}
-    result = crew.execute(inputs)
+    def on_start():
+        jobs.update(job_id, status="running")
+        emit("running")
 
-    # Store result
-    jobs[job_id]["status"] = "completed"
-    jobs[job_id]["result"] = result
+    def on_success(result):
+        jobs.update(job_id, status="completed", result=result)
+        emit("completed", {"job_id": job_id})
+
+    def on_error(error):
+        status = "timeout" if isinstance(error, JobTimeoutError) else "failed"
+        jobs.update(job_id, status=status, error=str(error))
+        emit(status, {"error": str(error)})
+        print(f"Job {job_id} failed: {error}")
+
+    # Hand the crew run to the worker pool and return right away.
+    # Event callbacks cannot cross into a process pool, so only thread workers stream progress.
+    try:
+        crew_runner.submit(
+            run_apollo_email_crew,
+            request_body.text,
+            emit if crew_runner.mode == "thread" else None,
+            job_id,
+            on_start=on_start,
+            on_success=on_success,
+            on_error=on_error
+        )
+    except QueueFullError:
+        jobs.delete(job_id)
+        raise HTTPException(
+            status_code=429,
+            detail="Server is at capacity. Please retry later.",
+            headers={"Retry-After": "30"}
+        )
 
     return {
         "status": "success",
@@ -187,16 +314,35 @@ async def check_status(job_id: str = Query(..., description="Job ID to check sta
     Retrieves the current status of a specific job.
     Fulfills MIP-003 /status endpoint.
     """
-    if job_id not in jobs:
+    job = jobs.get(job_id)
+    if job is None:
         return {"error": "Job not found"}
 
-    job = jobs[job_id]
     return {
         "job_id": job_id,
         "status": job["status"],
-        "result": job["result"]
+        "result": job["result"],
+        "error": job.get("error")
     }
 
+# 2b) Stream Job Progress (Server-Sent Events)
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request):
+    """
+    Streams progress events for a job: status changes, contacts found by the
+    Apollo search and each Gmail send result. Reconnecting clients send
+    Last-Event-ID to replay what they missed.
+    """
+    if job_id not in jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    last_event_id = parse_last_event_id(request.headers.get("last-event-id"))
+    return StreamingResponse(
+        job_events.sse(job_id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # 3) Provide Input (MIP-003: /provide_input)
 @app.post("/provide_input")
 async def provide_input(request_body: ProvideInputRequest):
@@ -220,9 +366,43 @@ async def check_availability():
     """
     return {
         "status": "available",
-        "message": "The server is running smoothly."
+        "message": "The server is running smoothly.",
+        "workers": crew_runner.stats(),
+        "crew_pool": crew_pool.stats(),
+        "warmup": warmup.status(),
+        "llm_cache": _llm_cache_stats(),
+        "models": _model_stats()
     }
 
+def _llm_cache_stats():
+    # Importing the cache pulls in crewai; leave that to the warm-up
+    if not warmup.ready:
+        return None
+    from masumi_crew.llm_cache import llm_cache_stats
+    return llm_cache_stats()
+
+def _model_stats():
+    if not warmup.ready:
+        return None
+    from masumi_crew.model_router import get_model_router
+    return get_model_router().stats()
+
+# Liveness probe: answers as soon as the app is listening
+@app.get("/health")
+async def health():
+    return {"status": "healthy"}
+
+# Readiness probe: 503 until the crew stack has loaded
+@app.get("/ready")
+async def ready():
+    """
+    Returns 200 once warm-up has finished, 503 before.
+    Route traffic to a new instance only after this passes.
+    """
+    if not warmup.ready:
+        raise HTTPException(status_code=503, detail=warmup.status())
+    return {"status": "ready", **warmup.status()}
+
 # 5) Retrieve Input Schema (MIP-003: /input_schema)
 @app.get("/input_schema")
 async def input_schema():
@@ -243,9 +423,7 @@ def main():
         print("Error: OPENAI_API_KEY is missing. Please check your .env file.")
         return
 
-    crew = ApolloEmailCrew()
-    inputs = {"text": "The impact of AI on the job market"}
-    result = crew.execute(inputs)
+    result = run_apollo_email_crew("The impact of AI on the job market")
     print("\nCrew Output:\n", result)
 
 if __name__ == "__main__":
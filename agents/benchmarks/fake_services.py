@@ -0,0 +1,397 @@
+"""
+Local stand-ins for every external service the agents call, for benchmarks.
+
+One FastAPI app serves all of them under separate path prefixes:
+
+    /apollo/api/v1      Apollo people/match and people/bulk_match
+    /composio/api       Composio backend (app/action schemas, action execution
+                        for APOLLO_* searches and GMAIL_SEND_EMAIL)
+    /llm/v1             OpenAI-compatible chat completions
+    /payment/api/v1     Masumi payment service (create, list, submit-result)
+
+Each service sleeps for a configurable latency before answering so load
+scenarios see realistic timings. Run it with
+
+    python benchmarks/fake_services.py --port 9900 --llm-latency 1.5
+
+and start the agent server with the environment printed by --print-env.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+
+FIRST_NAMES = ["Ada", "Grace", "Alan", "Linus", "Barbara", "Ken", "Margaret", "Dennis", "Radia", "Edsger"]
+LAST_NAMES = ["Lovelace", "Hopper", "Turing", "Torvalds", "Liskov", "Thompson", "Hamilton", "Ritchie", "Perlman", "Dijkstra"]
+COMPANIES = ["Seedstone Ventures", "Blockframe Capital", "Northgate Partners", "Ledger Labs", "Arcadia VC"]
+TITLES = ["Partner", "Principal", "Managing Director", "Investor", "General Partner"]
+
+
+class FakeServiceConfig:
+    def __init__(
+        self,
+        apollo_latency: float = 0.2,
+        composio_latency: float = 0.3,
+        llm_latency: float = 1.0,
+        payment_latency: float = 0.05,
+        payment_lock_delay: float = 2.0,
+        jitter: float = 0.2,
+        people_per_search: int = 5,
+        error_rate: float = 0.0,
+    ):
+        self.apollo_latency = apollo_latency
+        self.composio_latency = composio_latency
+        self.llm_latency = llm_latency
+        self.payment_latency = payment_latency
+        self.payment_lock_delay = payment_lock_delay
+        self.jitter = jitter
+        self.people_per_search = people_per_search
+        self.error_rate = error_rate
+
+
+def _person(seed: str, index: int) -> Dict[str, Any]:
+    rng = random.Random(f"{seed}|{index}")
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    company = rng.choice(COMPANIES)
+    domain = re.sub(r"[^a-z]", "", company.lower()) + ".com"
+    return {
+        "id": hashlib.md5(f"{first}{last}{company}".encode()).hexdigest()[:24],
+        "first_name": first,
+        "last_name": last,
+        "name": f"{first} {last}",
+        "title": rng.choice(TITLES),
+        "seniority": "partner",
+        "organization_name": company,
+        "organization": {"name": company, "website_url": f"https://{domain}"},
+        "linkedin_url": f"https://www.linkedin.com/in/{first.lower()}-{last.lower()}-{index}",
+        "email": f"{first.lower()}.{last.lower()}@{domain}",
+        "email_status": "verified",
+    }
+
+
+def _completion(model: str, content: str) -> Dict[str, Any]:
+    prompt_tokens, completion_tokens = 500, max(1, len(content) // 4)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def _json_after(marker: str, text: str) -> Optional[Any]:
+    start = text.find(marker)
+    if start < 0:
+        return None
+    start = text.find("[", start)
+    if start < 0:
+        return None
+    try:
+        return json.JSONDecoder().raw_decode(text[start:])[0]
+    except ValueError:
+        return None
+
+
+def _chat_reply(messages: List[Dict[str, Any]], config: FakeServiceConfig) -> str:
+    """
+    Plays the agent side of a crew run: the first turn calls the first tool
+    the prompt offers, the next turn returns the observed people as the final
+    answer. Outreach prompts get one email per contact.
+    """
+    text = "\n".join(str(message.get("content") or "") for message in messages)
+
+    contacts = _json_after("Contacts (JSON):", text)
+    if contacts is not None:
+        return json.dumps([
+            {
+                "recipient_email": contact.get("email"),
+                "subject": f"Intro for {contact.get('organization_name') or 'you'}",
+                "body": f"<p>Hi {contact.get('first_name') or 'there'},</p><p>Benchmark email.</p>",
+            }
+            for contact in contacts
+        ])
+
+    observation = text.rfind("Observation:")
+    if observation >= 0:
+        people = _json_after("Observation:", text[observation:]) or []
+        answer = [person for person in people if isinstance(person, dict)]
+        if not answer:
+            answer = [_person(text[:200], i) for i in range(config.people_per_search)]
+        return "Thought: I now know the final answer\nFinal Answer: " + json.dumps(answer)
+
+    tool = re.search(r"Tool Name: ([^\n]+)", text)
+    if tool:
+        return (
+            "Thought: I should search Apollo for matching people.\n"
+            f"Action: {tool.group(1).strip()}\n"
+            'Action Input: {"q_keywords": "investor", "person_titles": ["Investor"]}'
+        )
+    people = [_person(text[:200], i) for i in range(config.people_per_search)]
+    return "Thought: I now know the final answer\nFinal Answer: " + json.dumps(people)
+
+
+def _action_schema(name: str, app: str, description: str, properties: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "name": name,
+        "display_name": name.replace("_", " ").title(),
+        "description": description,
+        "parameters": {"properties": properties, "title": f"{name}Request", "type": "object"},
+        "response": {
+            "properties": {"data": {"type": "object"}, "successful": {"type": "boolean"}},
+            "title": f"{name}Response",
+            "type": "object",
+        },
+        "appName": app.lower(),
+        "appId": app.lower(),
+        "version": "latest",
+        "available_versions": ["latest"],
+        "tags": ["important"],
+        "enabled": True,
+    }
+
+
+ACTIONS = [
+    _action_schema(
+        "APOLLO_PEOPLE_SEARCH", "APOLLO", "Search Apollo's people database.",
+        {
+            "q_keywords": {"type": "string", "description": "Keywords to search for"},
+            "person_titles": {"type": "array", "items": {"type": "string"}, "description": "Titles"},
+            "limit": {"type": "integer", "description": "Maximum results"},
+        },
+    ),
+    _action_schema(
+        "GMAIL_SEND_EMAIL", "GMAIL", "Send an email through Gmail.",
+        {
+            "recipient_email": {"type": "string", "description": "Recipient"},
+            "subject": {"type": "string", "description": "Subject"},
+            "body": {"type": "string", "description": "Body"},
+            "is_html": {"type": "boolean", "description": "HTML body"},
+            "user_id": {"type": "string", "description": "Sender"},
+        },
+    ),
+]
+
+
+def create_app(config: Optional[FakeServiceConfig] = None) -> FastAPI:
+    config = config or FakeServiceConfig()
+    app = FastAPI(title="Fake external services for benchmarks")
+    # blockchainIdentifier -> payment record
+    payments: Dict[str, Dict[str, Any]] = {}
+    counters: Dict[str, int] = {}
+
+    async def delay(service: str, latency: float) -> None:
+        counters[service] = counters.get(service, 0) + 1
+        if latency > 0:
+            await asyncio.sleep(max(0.0, random.gauss(latency, latency * config.jitter)))
+
+    def failing() -> bool:
+        return config.error_rate > 0 and random.random() < config.error_rate
+
+    @app.get("/stats")
+    async def stats():
+        return {"requests": counters, "payments": len(payments)}
+
+    # ── Apollo ───────────────────────────────────────────────────────────────
+    @app.post("/apollo/api/v1/people/match")
+    async def apollo_match(request: Request):
+        await delay("apollo", config.apollo_latency)
+        detail = await request.json()
+        return {"person": _person(json.dumps(detail, sort_keys=True), 0)}
+
+    @app.post("/apollo/api/v1/people/bulk_match")
+    async def apollo_bulk_match(request: Request):
+        await delay("apollo", config.apollo_latency)
+        body = await request.json()
+        details = body.get("details") or []
+        return {
+            "status": "success",
+            "matches": [_person(json.dumps(detail, sort_keys=True), 0) for detail in details],
+        }
+
+    # ── Composio ─────────────────────────────────────────────────────────────
+    @app.get("/composio/api/v1/client/auth/client_info")
+    async def composio_client_info():
+        return {"client": {"id": "benchmark", "name": "benchmark"}, "apiKey": {"key": "benchmark"}}
+
+    @app.get("/composio/api/v1/apps")
+    async def composio_apps():
+        return {"items": [
+            {
+                "name": name.lower(), "key": name.lower(), "appId": name.lower(),
+                "description": name, "categories": [], "meta": {}, "enabled": True,
+            }
+            for name in ("APOLLO", "GMAIL")
+        ]}
+
+    @app.get("/composio/api/v2/actions")
+    async def composio_actions(apps: Optional[str] = None):
+        wanted = {app.lower() for app in apps.split(",")} if apps else None
+        return {"items": [action for action in ACTIONS if wanted is None or action["appName"] in wanted]}
+
+    @app.get("/composio/api/v2/actions/{name}")
+    async def composio_action(name: str):
+        return next((action for action in ACTIONS if action["name"] == name.upper()), {})
+
+    @app.get("/composio/api/v1/connectedAccounts")
+    async def composio_connected_accounts(appNames: Optional[str] = None):
+        now = datetime.now(timezone.utc).isoformat()
+        names = appNames.split(",") if appNames else ["apollo", "gmail"]
+        return {"items": [
+            {
+                "id": f"benchmark-{name}", "status": "ACTIVE", "createdAt": now, "updatedAt": now,
+                "appUniqueId": name, "appName": name, "integrationId": f"benchmark-{name}",
+                "connectionParams": {}, "entityId": "default", "clientUniqueUserId": "default",
+            }
+            for name in names
+        ], "totalPages": 1, "page": 1}
+
+    @app.post("/composio/api/v2/actions/{name}/execute")
+    async def composio_execute(name: str, request: Request):
+        await delay("composio", config.composio_latency)
+        body = await request.json()
+        params = body.get("input") or {}
+        if failing():
+            return {"data": {}, "error": "Injected failure", "successful": False}
+        if name.upper().startswith("APOLLO"):
+            seed = json.dumps(params, sort_keys=True)
+            limit = int(params.get("limit") or config.people_per_search)
+            return {"data": {"people": [_person(seed, i) for i in range(limit)]}, "error": None, "successful": True}
+        return {"data": {"id": uuid.uuid4().hex}, "error": None, "successful": True}
+
+    # ── OpenAI-compatible LLM ────────────────────────────────────────────────
+    @app.post("/llm/v1/chat/completions")
+    async def chat_completions(request: Request):
+        await delay("llm", config.llm_latency)
+        body = await request.json()
+        return _completion(body.get("model", "fake"), _chat_reply(body.get("messages") or [], config))
+
+    # ── Masumi payment service ───────────────────────────────────────────────
+    @app.post("/payment/api/v1/payment/")
+    async def create_payment(request: Request):
+        await delay("payment", config.payment_latency)
+        body = await request.json()
+        now = datetime.now(timezone.utc)
+        payment = {
+            "blockchainIdentifier": uuid.uuid4().hex,
+            "agentIdentifier": body.get("agentIdentifier"),
+            "identifierFromPurchaser": body.get("identifierFromPurchaser"),
+            "inputHash": body.get("inputHash"),
+            "network": body.get("network"),
+            "payByTime": body.get("payByTime"),
+            "submitResultTime": body.get("submitResultTime"),
+            "unlockTime": (now + timedelta(hours=36)).isoformat(),
+            "externalDisputeUnlockTime": (now + timedelta(hours=48)).isoformat(),
+            "onChainState": None,
+            "createdAt": now.isoformat(),
+            "_created": time.monotonic(),
+        }
+        payments[payment["blockchainIdentifier"]] = payment
+        return {"status": "success", "data": {k: v for k, v in payment.items() if not k.startswith("_")}}
+
+    @app.get("/payment/api/v1/payment/")
+    async def list_payments(limit: int = 100, cursorId: Optional[str] = None):
+        await delay("payment", config.payment_latency)
+        now = time.monotonic()
+        # Purchasers "pay" payment_lock_delay seconds after the request is created
+        for payment in payments.values():
+            if payment["onChainState"] is None and now - payment["_created"] >= config.payment_lock_delay:
+                payment["onChainState"] = "FundsLocked"
+        ordered = sorted(payments.values(), key=lambda p: p["_created"], reverse=True)
+        if cursorId:
+            ids = [p["blockchainIdentifier"] for p in ordered]
+            ordered = ordered[ids.index(cursorId) + 1:] if cursorId in ids else []
+        page = ordered[:limit]
+        return {"status": "success", "data": {
+            "Payments": [{k: v for k, v in p.items() if not k.startswith("_")} for p in page],
+            "cursorId": page[-1]["blockchainIdentifier"] if len(page) == limit else None,
+        }}
+
+    @app.post("/payment/api/v1/payment/submit-result")
+    async def submit_result(request: Request):
+        await delay("payment", config.payment_latency)
+        body = await request.json()
+        payment = payments.get(body.get("blockchainIdentifier"))
+        if payment is None:
+            return {"status": "error", "error": "Payment not found"}
+        payment["onChainState"] = "ResultSubmitted"
+        payment["submitResultHash"] = body.get("submitResultHash")
+        return {"status": "success", "data": {"blockchainIdentifier": payment["blockchainIdentifier"]}}
+
+    return app
+
+
+def service_env(host: str, port: int) -> Dict[str, str]:
+    """Environment that points an agent server at the fake services."""
+    base = f"http://{host}:{port}"
+    return {
+        "APOLLO_API_URL": f"{base}/apollo/api/v1",
+        "APOLLO_API_KEY": "benchmark",
+        "COMPOSIO_BASE_URL": f"{base}/composio/api",
+        "COMPOSIO_API_KEY": "benchmark",
+        "BRAVE_API_KEY": "benchmark",
+        "OPENAI_API_KEY": "benchmark",
+        "OPENAI_API_BASE": f"{base}/llm/v1",
+        "OPENAI_BASE_URL": f"{base}/llm/v1",
+        "DEEPSEEK_API_BASE": f"{base}/llm/v1",
+        "PAYMENT_SERVICE_URL": f"{base}/payment/api/v1",
+        "PAYMENT_API_KEY": "benchmark",
+        "AGENT_IDENTIFIER": "benchmark-agent",
+        "PAYMENT_POLL_YOUNG_INTERVAL": "1",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9900)
+    parser.add_argument("--apollo-latency", type=float, default=0.2)
+    parser.add_argument("--composio-latency", type=float, default=0.3)
+    parser.add_argument("--llm-latency", type=float, default=1.0)
+    parser.add_argument("--payment-latency", type=float, default=0.05)
+    parser.add_argument("--payment-lock-delay", type=float, default=2.0,
+                        help="Seconds until a payment request shows as FundsLocked")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Latency standard deviation as a fraction")
+    parser.add_argument("--people", type=int, default=5, help="People returned per Apollo search")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of Composio calls that fail")
+    parser.add_argument("--print-env", action="store_true", help="Print shell exports for the agent server and exit")
+    args = parser.parse_args()
+
+    if args.print_env:
+        for key, value in service_env(args.host, args.port).items():
+            print(f"export {key}={value}")
+        return
+
+    config = FakeServiceConfig(
+        apollo_latency=args.apollo_latency,
+        composio_latency=args.composio_latency,
+        llm_latency=args.llm_latency,
+        payment_latency=args.payment_latency,
+        payment_lock_delay=args.payment_lock_delay,
+        jitter=args.jitter,
+        people_per_search=args.people,
+        error_rate=args.error_rate,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
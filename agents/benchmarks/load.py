@@ -0,0 +1,218 @@
+"""
+Load scenarios for the agent servers.
+
+    start_job   POST /start_job as fast as the concurrency allows
+    status      GET /status for jobs created up front
+    e2e         start a job and poll /status until it finishes
+
+Each scenario reports p50/p95/p99 latency and throughput. Use --json to save
+the report and --compare to fail (exit code 1) when p95 latency or
+throughput regresses by more than --tolerance against a saved report:
+
+    python benchmarks/load.py e2e --requests 50 --concurrency 8 --json after.json --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+TERMINAL_STATUSES = ("completed", "failed", "timeout")
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    # Nearest-rank percentile
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(name: str, latencies: List[float], errors: int, elapsed: float, **extra) -> Dict[str, Any]:
+    return {
+        "scenario": name,
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "elapsed": elapsed,
+        **extra,
+    }
+
+
+class Target:
+    """Request shapes for the two servers: masumi_deploy.py and apollo_email_crew.py."""
+
+    def __init__(self, base_url: str, kind: str, text: str):
+        self.base_url = base_url.rstrip("/")
+        self.kind = kind
+        self.text = text
+
+    def start_body(self) -> Dict[str, Any]:
+        if self.kind == "apollo":
+            return {"text": self.text}
+        return {"identifier_from_purchaser": uuid.uuid4().hex[:16], "input_data": {"text": self.text}}
+
+    async def start_job(self, session: aiohttp.ClientSession) -> str:
+        async with session.post(f"{self.base_url}/start_job", json=self.start_body()) as response:
+            body = await response.json(content_type=None)
+            if response.status != 200 or "job_id" not in body:
+                raise RuntimeError(f"start_job failed ({response.status}): {body}")
+            return body["job_id"]
+
+    async def status(self, session: aiohttp.ClientSession, job_id: str) -> Dict[str, Any]:
+        async with session.get(f"{self.base_url}/status", params={"job_id": job_id}) as response:
+            body = await response.json(content_type=None)
+            if response.status != 200:
+                raise RuntimeError(f"status failed ({response.status}): {body}")
+            return body
+
+
+async def run_pool(requests: int, concurrency: int, fn) -> Dict[str, Any]:
+    """Runs fn() requests times with at most concurrency in flight; times every call."""
+    latencies: List[float] = []
+    results: List[Any] = []
+    errors: List[str] = []
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                results.append(await fn())
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                errors.append(str(e))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {"latencies": latencies, "results": results, "errors": errors, "elapsed": time.perf_counter() - started}
+
+
+async def scenario_start_job(target: Target, session, args) -> Dict[str, Any]:
+    run = await run_pool(args.requests, args.concurrency, lambda: target.start_job(session))
+    return summarize("start_job", run["latencies"], len(run["errors"]), run["elapsed"],
+                     sample_errors=run["errors"][:3])
+
+
+async def scenario_status(target: Target, session, args) -> Dict[str, Any]:
+    seeded = await run_pool(args.seed_jobs, args.concurrency, lambda: target.start_job(session))
+    job_ids = seeded["results"]
+    if not job_ids:
+        raise SystemExit(f"Could not create any jobs to poll: {seeded['errors'][:3]}")
+    counter = iter(range(sys.maxsize))
+    run = await run_pool(
+        args.requests, args.concurrency,
+        lambda: target.status(session, job_ids[next(counter) % len(job_ids)])
+    )
+    return summarize("status", run["latencies"], len(run["errors"]), run["elapsed"],
+                     sample_errors=run["errors"][:3])
+
+
+async def scenario_e2e(target: Target, session, args) -> Dict[str, Any]:
+    outcomes: Dict[str, int] = {}
+
+    async def job():
+        job_id = await target.start_job(session)
+        deadline = time.perf_counter() + args.job_timeout
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(args.poll_interval)
+            status = (await target.status(session, job_id)).get("status")
+            if status in TERMINAL_STATUSES:
+                outcomes[status] = outcomes.get(status, 0) + 1
+                if status != "completed":
+                    raise RuntimeError(f"Job {job_id} ended as {status}")
+                return job_id
+        outcomes["unfinished"] = outcomes.get("unfinished", 0) + 1
+        raise RuntimeError(f"Job {job_id} did not finish within {args.job_timeout}s")
+
+    run = await run_pool(args.requests, args.concurrency, job)
+    return summarize("e2e", run["latencies"], len(run["errors"]), run["elapsed"],
+                     outcomes=outcomes, sample_errors=run["errors"][:3])
+
+
+SCENARIOS = {
+    "start_job": scenario_start_job,
+    "status": scenario_status,
+    "e2e": scenario_e2e,
+}
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Returns the regressions of report against baseline, beyond tolerance."""
+    regressions = []
+    if baseline.get("p95") and report.get("p95") and report["p95"] > baseline["p95"] * (1 + tolerance):
+        regressions.append(f"p95 {report['p95']:.3f}s > baseline {baseline['p95']:.3f}s")
+    if baseline.get("throughput") and report["throughput"] < baseline["throughput"] * (1 - tolerance):
+        regressions.append(f"throughput {report['throughput']:.2f}/s < baseline {baseline['throughput']:.2f}/s")
+    if report["errors"] > baseline.get("errors", 0):
+        regressions.append(f"{report['errors']} errors > baseline {baseline.get('errors', 0)}")
+    return regressions
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    def ms(value):
+        return f"{value * 1000:.1f}ms" if value is not None else "-"
+    unit = "jobs/s" if report["scenario"] == "e2e" else "req/s"
+    print(
+        f"{report['scenario']:<10} n={report['requests']:<5} errors={report['errors']:<4} "
+        f"p50={ms(report['p50'])} p95={ms(report['p95'])} p99={ms(report['p99'])} "
+        f"{report['throughput']:.2f} {unit}"
+    )
+    if report.get("outcomes"):
+        print(f"{'':<10} outcomes: {report['outcomes']}")
+    for error in report.get("sample_errors", []):
+        print(f"{'':<10} error: {error}")
+
+
+async def main_async(args) -> int:
+    target = Target(args.base_url, args.target, args.text)
+    timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+    connector = aiohttp.TCPConnector(limit=args.concurrency * 2)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        report = await SCENARIOS[args.scenario](target, session, args)
+    report["concurrency"] = args.concurrency
+    report["target"] = args.target
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenario", choices=sorted(SCENARIOS))
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--target", choices=("masumi", "apollo"), default="masumi",
+                        help="masumi_deploy.py (paid jobs) or apollo_email_crew.py")
+    parser.add_argument("--text", default="Seed-stage investors focused on B2B SaaS")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--seed-jobs", type=int, default=20, help="Jobs created before the status scenario")
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--job-timeout", type=float, default=300)
+    parser.add_argument("--request-timeout", type=float, default=60)
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--compare", help="Baseline report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed regression as a fraction")
+    sys.exit(asyncio.run(main_async(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
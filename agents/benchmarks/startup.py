@@ -0,0 +1,195 @@
+"""
+Start-up cost of the agent servers.
+
+    imports   import the server module in a fresh interpreter (python -X importtime)
+    serve     start uvicorn and time the first 200 from /health and from /ready
+
+Each run uses a new process, so nothing is warm from a previous run. The
+report keeps the median over --repeat runs. Use --json to save it and
+--compare to fail (exit code 1) when any timing regresses by more than
+--tolerance against a saved report:
+
+    python benchmarks/startup.py serve --module apollo_email_crew --json after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Dict, List, Optional
+
+AGENTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def server_env(extra_path: Optional[str] = None) -> Dict[str, str]:
+    env = dict(os.environ)
+    paths = [AGENTS_DIR, os.path.join(AGENTS_DIR, "masumi_crew", "src")]
+    if extra_path:
+        paths.insert(0, extra_path)
+    if env.get("PYTHONPATH"):
+        paths.append(env["PYTHONPATH"])
+    env["PYTHONPATH"] = os.pathsep.join(paths)
+    return env
+
+
+def parse_importtime(stderr: str, module: str) -> Dict[str, Any]:
+    """Total import time of module and the heaviest top-level packages it pulled in, in seconds."""
+    total = None
+    packages: Dict[str, float] = {}
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        if name == module and indent == 1:
+            total = cumulative / 1e6
+        elif indent <= 3:
+            # Direct imports of the server module (or of the interpreter start-up)
+            top = name.split(".")[0]
+            packages[top] = max(packages.get(top, 0.0), cumulative / 1e6)
+    return {"total": total, "packages": packages}
+
+
+def run_imports(args) -> Dict[str, Any]:
+    totals: List[float] = []
+    packages: Dict[str, List[float]] = {}
+    for _ in range(args.repeat):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {args.module}"],
+            cwd=AGENTS_DIR, env=server_env(args.pythonpath), capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise SystemExit(f"Importing {args.module} failed:\n{proc.stderr[-2000:]}")
+        parsed = parse_importtime(proc.stderr, args.module)
+        if parsed["total"] is None:
+            raise SystemExit(f"No importtime line for {args.module}")
+        totals.append(parsed["total"])
+        for name, seconds in parsed["packages"].items():
+            packages.setdefault(name, []).append(seconds)
+    heaviest = sorted(((statistics.median(v), k) for k, v in packages.items()), reverse=True)[:args.top]
+    return {
+        "scenario": "imports",
+        "module": args.module,
+        "runs": args.repeat,
+        "timings": {"import": statistics.median(totals)},
+        "heaviest": {name: seconds for seconds, name in heaviest},
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _status(url: str) -> Optional[int]:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def time_serve(args) -> Dict[str, float]:
+    """Starts one server process and times how long /health and /ready take to return 200."""
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{args.module}:app", "--port", str(port), "--log-level", "warning"],
+        cwd=AGENTS_DIR, env=server_env(args.pythonpath),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    timings: Dict[str, float] = {}
+    try:
+        deadline = started + args.timeout
+        while time.perf_counter() < deadline and len(timings) < 2:
+            if proc.poll() is not None:
+                raise SystemExit(f"{args.module} exited with code {proc.returncode} during start-up")
+            for probe in ("health", "ready"):
+                if probe not in timings and _status(f"{base_url}/{probe}") == 200:
+                    timings[probe] = time.perf_counter() - started
+            time.sleep(args.poll_interval)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    if len(timings) < 2:
+        raise SystemExit(f"{args.module} was not ready within {args.timeout}s (got {sorted(timings)})")
+    return timings
+
+
+def run_serve(args) -> Dict[str, Any]:
+    runs = [time_serve(args) for _ in range(args.repeat)]
+    return {
+        "scenario": "serve",
+        "module": args.module,
+        "runs": args.repeat,
+        "timings": {probe: statistics.median(run[probe] for run in runs) for probe in ("health", "ready")},
+    }
+
+
+SCENARIOS = {
+    "imports": run_imports,
+    "serve": run_serve,
+}
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Returns the timings of report that are slower than baseline by more than tolerance."""
+    regressions = []
+    for name, seconds in report["timings"].items():
+        before = baseline.get("timings", {}).get(name)
+        if before and seconds > before * (1 + tolerance):
+            regressions.append(f"{name} {seconds:.3f}s > baseline {before:.3f}s")
+    return regressions
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    timings = " ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in report["timings"].items())
+    print(f"{report['scenario']:<8} {report['module']} runs={report['runs']} {timings}")
+    for name, seconds in report.get("heaviest", {}).items():
+        print(f"{'':<8} {name:<24} {seconds * 1000:8.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenario", choices=sorted(SCENARIOS))
+    parser.add_argument("--module", default="masumi_deploy", help="masumi_deploy or apollo_email_crew")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="Heaviest packages listed by the imports scenario")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds to wait for /ready")
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--pythonpath", help="Extra directory to put first on the server's PYTHONPATH")
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--compare", help="Baseline report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression as a fraction")
+    args = parser.parse_args()
+
+    report = SCENARIOS[args.scenario](args)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
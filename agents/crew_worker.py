@@ -0,0 +1,123 @@
+"""
+Crew worker: runs the paid jobs that masumi_deploy.py puts on the work queue.
+
+    CREW_EXECUTION=queue uvicorn masumi_deploy:app    # API nodes take jobs and payments
+    CREW_EXECUTION=queue python crew_worker.py        # crew nodes run them
+
+Every node shares JOB_STORE_URL and WORK_QUEUE_URL. A worker runs up to
+CREW_MAX_WORKERS jobs at once. While a job runs, the worker heartbeats its
+lease. If the worker dies, the lease expires and another worker picks the
+job up again, up to WORK_QUEUE_MAX_ATTEMPTS times. On SIGTERM or SIGINT the
+worker stops claiming new jobs and finishes the ones it has.
+"""
+import asyncio
+import logging
+import os
+import signal
+import socket
+import time
+import uuid
+
+import masumi_deploy as api
+from job_store import FINISHED_STATUSES
+from masumi_crew.telemetry import span
+from work_queue import WorkQueue, create_work_queue
+
+logger = logging.getLogger("crew_worker")
+
+POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", "1"))
+
+
+async def keep_lease(queue: WorkQueue, message: dict, worker_id: str, run: asyncio.Task) -> None:
+    while True:
+        await asyncio.sleep(queue.lease_seconds / 3)
+        if not await asyncio.to_thread(queue.heartbeat, message["id"], worker_id):
+            # Another worker may already run the job; stop before this one completes the
+            # payment. A crew thread cannot be killed: its sends are guarded by the send log.
+            logger.warning(f"Lost the lease on job {message['job_id']}; cancelling this run")
+            run.cancel()
+            return
+
+
+async def process(queue: WorkQueue, message: dict, worker_id: str) -> None:
+    job_id = message["job_id"]
+    payment_id = message["payload"]["payment_id"]
+    job = api.jobs.get(job_id)
+    if job is None or job["status"] in FINISHED_STATUSES:
+        # Already finished by a worker that died before acking
+        return
+
+    if message["attempts"] > queue.max_attempts:
+        error = f"Gave up after {queue.max_attempts} attempts; workers kept losing the job"
+        logger.error(f"Job {job_id}: {error}")
+        await api.settle_batch(api.jobs.update(job_id, status="failed", error=error))
+    else:
+        if message["attempts"] > 1:
+            logger.warning(f"Redelivered job {job_id} (attempt {message['attempts']})")
+        job = api.jobs.update(job_id, status="running", worker=worker_id, attempts=message["attempts"])
+        with span("queue", "job"):
+            try:
+                await api.run_paid_job(job, payment_id)
+            except Exception as e:
+                logger.error(f"Error processing payment {payment_id} for job {job_id}: {str(e)}", exc_info=True)
+                await api.settle_batch(api.jobs.update(job_id, status="failed", error=str(e)))
+
+
+async def consume(queue: WorkQueue, worker_id: str, stopping: asyncio.Event) -> None:
+    while not stopping.is_set():
+        message = await asyncio.to_thread(queue.claim, worker_id)
+        if message is None:
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        run = asyncio.create_task(process(queue, message, worker_id))
+        lease = asyncio.create_task(keep_lease(queue, message, worker_id, run))
+        try:
+            await run
+        except asyncio.CancelledError:
+            if not lease.done():
+                raise
+            # The lease and the job belong to another worker now; do not ack
+            continue
+        except Exception as e:
+            # Leave the message leased: it is redelivered once the lease expires
+            logger.error(f"Worker failed on job {message['job_id']}: {str(e)}", exc_info=True)
+            continue
+        finally:
+            lease.cancel()
+        await asyncio.to_thread(queue.ack, message["id"], worker_id)
+
+
+async def main_async() -> None:
+    queue = api.work_queue or create_work_queue()
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    loop = asyncio.get_running_loop()
+    api.job_events.bind_loop(loop)
+
+    stopping = asyncio.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stopping.set)
+
+    started = time.perf_counter()
+    await asyncio.to_thread(api.load_crew_stack)
+    if api.crew_runner.mode == "thread":
+        try:
+            await asyncio.to_thread(api.crew_pool.warm)
+        except Exception as e:
+            logger.warning(f"Crew pool warm-up failed, crews will be built on demand: {e}")
+    logger.info(f"Worker {worker_id} ready in {time.perf_counter() - started:.1f}s, "
+                f"running up to {api.crew_runner.max_workers} jobs")
+
+    await asyncio.gather(*(consume(queue, worker_id, stopping) for _ in range(api.crew_runner.max_workers)))
+    logger.info(f"Worker {worker_id} stopped")
+
+
+def main():
+    asyncio.run(main_async())
+
+
+if __name__ == "__main__":
+    main()
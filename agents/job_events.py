@@ -0,0 +1,179 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Deque, List, Optional
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Job event streams
+#
+# Crew runs publish progress (contacts found, enriched contacts, email send
+# results, status changes) to a JobEventBus. Clients follow a job over
+# Server-Sent Events on /jobs/{job_id}/events instead of polling /status.
+# Each job keeps a bounded replay buffer so a client that reconnects with
+# Last-Event-ID picks up where it left off. The bus is per-process: events are
+# only visible on the uvicorn worker that runs the job. Given the job store,
+# the bus also follows the job's stored status: a stream it has no events for
+# starts from that status, and while a subscriber waits the store is checked
+# every poll_seconds. Jobs run by crew workers or other uvicorn workers thus
+# report every status change, and their streams end when they finish.
+# ─────────────────────────────────────────────────────────────────────────────
+
+# Event types after which a job's stream ends
+TERMINAL_EVENTS = ("completed", "failed", "timeout")
+
+# Job statuses that are also event types, in the order a job goes through them
+STATUS_EVENTS = ("awaiting_payment", "queued", "running") + TERMINAL_EVENTS
+
+
+class _JobStream:
+    def __init__(self, replay_size: int):
+        self.events: Deque[dict] = deque(maxlen=replay_size)
+        self.subscribers: List[asyncio.Queue] = []
+        self.next_id = 1
+        self.status: Optional[str] = None
+        self.closed = False
+        self.closed_at: Optional[float] = None
+
+
+class JobEventBus:
+    def __init__(
+        self,
+        replay_size: int = 500,
+        max_jobs: int = 1000,
+        heartbeat_seconds: float = 15,
+        jobs=None,
+        poll_seconds: float = 2,
+    ):
+        self.replay_size = replay_size
+        self.jobs = jobs
+        self.poll_seconds = poll_seconds
+        self.max_jobs = max_jobs
+        self.heartbeat_seconds = heartbeat_seconds
+        self._streams: "OrderedDict[str, _JobStream]" = OrderedDict()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        """ Remembers the server loop so worker threads can publish safely """
+        self._loop = loop
+
+    def _stream(self, job_id: str) -> _JobStream:
+        stream = self._streams.get(job_id)
+        if stream is None:
+            stream = self._streams[job_id] = _JobStream(self.replay_size)
+            self._trim()
+        return stream
+
+    def _trim(self) -> None:
+        # Forget the oldest finished jobs first, then the oldest of any kind
+        while len(self._streams) > self.max_jobs:
+            victim = next((job_id for job_id, s in self._streams.items() if s.closed), None)
+            if victim is None:
+                victim = next(iter(self._streams))
+            del self._streams[victim]
+
+    def publish(self, job_id: str, event_type: str, data: Any = None) -> None:
+        """ Publishes an event; safe to call from crew worker threads """
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if self._loop is not None and running is not self._loop and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._publish, job_id, event_type, data)
+        else:
+            self._publish(job_id, event_type, data)
+
+    def _publish(self, job_id: str, event_type: str, data: Any) -> None:
+        stream = self._stream(job_id)
+        if stream.closed:
+            return
+        event = {"id": stream.next_id, "type": event_type, "data": data, "time": time.time()}
+        stream.next_id += 1
+        stream.events.append(event)
+        if event_type in STATUS_EVENTS:
+            stream.status = event_type
+        for queue in stream.subscribers:
+            queue.put_nowait(event)
+        if event_type in TERMINAL_EVENTS:
+            stream.closed = True
+            stream.closed_at = time.time()
+
+    def emitter(self, job_id: str):
+        """ Returns a callable(event_type, data) bound to one job, for passing into crews """
+        def emit(event_type: str, data: Any = None) -> None:
+            self.publish(job_id, event_type, data)
+        return emit
+
+    async def _sync_status(self, job_id: str, stream: _JobStream) -> None:
+        """ Publishes the job's stored status if it is further along than the last status this bus saw """
+        if self.jobs is None or stream.closed:
+            return
+        job = await asyncio.to_thread(self.jobs.get, job_id)
+        if job is None or job["status"] not in STATUS_EVENTS:
+            return
+        # Events published here may run ahead of the store; never step back
+        if stream.status and STATUS_EVENTS.index(job["status"]) <= STATUS_EVENTS.index(stream.status):
+            return
+        data = {"status": job["status"]}
+        if job.get("error"):
+            data["error"] = job["error"]
+        self._publish(job_id, job["status"], data)
+
+    async def subscribe(self, job_id: str, last_event_id: int = 0) -> AsyncIterator[Optional[dict]]:
+        """
+        Yields buffered events newer than last_event_id, then live ones until
+        the job finishes. Yields None when heartbeat_seconds pass without events.
+        """
+        stream = self._stream(job_id)
+        if not stream.events:
+            # Nothing published here: the job finished before a restart or eviction, or another process runs it
+            await self._sync_status(job_id, stream)
+        queue: asyncio.Queue = asyncio.Queue()
+        backlog = [event for event in stream.events if event["id"] > last_event_id]
+        if not stream.closed:
+            stream.subscribers.append(queue)
+        try:
+            for event in backlog:
+                yield event
+                if event["type"] in TERMINAL_EVENTS:
+                    return
+            if stream.closed:
+                return
+            wait = min(self.heartbeat_seconds, self.poll_seconds) if self.jobs is not None else self.heartbeat_seconds
+            idle = 0.0
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=wait)
+                except asyncio.TimeoutError:
+                    # Status changes made by another process only show up in the store
+                    await self._sync_status(job_id, stream)
+                    if queue.empty():
+                        idle += wait
+                        if idle >= self.heartbeat_seconds:
+                            idle = 0.0
+                            yield None
+                    continue
+                idle = 0.0
+                yield event
+                if event["type"] in TERMINAL_EVENTS:
+                    return
+        finally:
+            if queue in stream.subscribers:
+                stream.subscribers.remove(queue)
+
+    async def sse(self, job_id: str, last_event_id: int = 0) -> AsyncIterator[str]:
+        """ Formats the job's events as a Server-Sent Events stream """
+        async for event in self.subscribe(job_id, last_event_id):
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            payload = json.dumps(event["data"], default=str)
+            yield f"id: {event['id']}\nevent: {event['type']}\ndata: {payload}\n\n"
+
+
+def parse_last_event_id(value: Optional[str]) -> int:
+    try:
+        return int(value) if value else 0
+    except ValueError:
+        return 0
+
@@ -0,0 +1,181 @@
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Bounded worker pool for crew runs
+#
+# Crew kickoffs are blocking and can take minutes, so they must never run on
+# the uvicorn event loop. JobRunner hands them to a thread (or process) pool,
+# caps how many can wait for a slot and enforces a per-job timeout.
+# ─────────────────────────────────────────────────────────────────────────────
+
+
+class QueueFullError(Exception):
+    """ Raised when the runner has no free slot and its wait queue is full """
+
+
+class JobTimeoutError(Exception):
+    """ Raised when a job does not finish within the configured timeout """
+
+
+class JobRunner:
+    def __init__(
+        self,
+        max_workers: int = 4,
+        max_queue: int = 16,
+        timeout: Optional[float] = 900,
+        mode: str = "thread",
+    ):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown worker mode: {mode}")
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.mode = mode
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._running = 0
+        self._queued = 0
+        # Runs whose caller gave up (timeout or cancellation) but whose thread is still busy
+        self._zombies = 0
+
+    @classmethod
+    def from_env(cls, prefix: str = "CREW") -> "JobRunner":
+        """ Builds a runner from <PREFIX>_MAX_WORKERS, _MAX_QUEUE, _JOB_TIMEOUT and _WORKER_MODE """
+        timeout = float(os.getenv(f"{prefix}_JOB_TIMEOUT", "900"))
+        return cls(
+            max_workers=int(os.getenv(f"{prefix}_MAX_WORKERS", "4")),
+            max_queue=int(os.getenv(f"{prefix}_MAX_QUEUE", "16")),
+            timeout=timeout if timeout > 0 else None,
+            mode=os.getenv(f"{prefix}_WORKER_MODE", "thread"),
+        )
+
+    # The executor and semaphore are created lazily so they bind to the
+    # running event loop rather than whatever loop exists at import time.
+    def _ensure_started(self) -> None:
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="crew-worker"
+                )
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    @property
+    def zombies(self) -> int:
+        return self._zombies
+
+    @property
+    def free_slots(self) -> int:
+        return max(self.max_workers - self._running, 0)
+
+    def has_capacity(self) -> bool:
+        return self._running + self._queued < self.max_workers + self.max_queue
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": self._running,
+            "zombies": self._zombies,
+            "queued": self._queued,
+            "free_slots": self.free_slots,
+        }
+
+    async def run(self, fn: Callable[..., Any], *args: Any, on_start: Optional[Callable[[], None]] = None) -> Any:
+        """
+        Runs fn(*args) in the pool once a slot is free and returns its result.
+        Raises JobTimeoutError if it exceeds the timeout. A timed-out (or
+        cancelled) run cannot be killed: fn keeps running and keeps its slot,
+        counted in running and zombies, until it returns; its result is discarded.
+        """
+        self._ensure_started()
+        self._queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._queued -= 1
+        self._running += 1
+        future = None
+        try:
+            if on_start:
+                on_start()
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor, fn, *args)
+            try:
+                # shield: a timeout must not mark the future done while fn still runs
+                return await asyncio.wait_for(asyncio.shield(future), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                raise JobTimeoutError(f"Job exceeded timeout of {self.timeout} seconds")
+        finally:
+            if future is None or future.done():
+                self._release()
+            else:
+                self._zombies += 1
+                future.add_done_callback(self._release_zombie)
+
+    def _release(self) -> None:
+        self._running -= 1
+        self._slots.release()
+
+    def _release_zombie(self, future: asyncio.Future) -> None:
+        self._zombies -= 1
+        self._release()
+        if not future.cancelled():
+            # Nobody awaits the result any more; retrieve it so errors are not reported as unhandled
+            future.exception()
+
+    def submit(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        on_start: Optional[Callable[[], None]] = None,
+        on_success: Optional[Callable[[Any], Awaitable[None] | None]] = None,
+        on_error: Optional[Callable[[Exception], Awaitable[None] | None]] = None,
+    ) -> asyncio.Task:
+        """
+        Schedules fn(*args) in the background and returns immediately.
+        Raises QueueFullError when every slot is busy and the wait queue is full.
+        """
+        if not self.has_capacity():
+            raise QueueFullError(
+                f"All {self.max_workers} workers are busy and {self._queued} jobs are queued"
+            )
+        # Count the job as queued right away so concurrent submits see it
+        # before the background task gets a chance to run.
+        self._queued += 1
+
+        async def _job():
+            self._queued -= 1
+            try:
+                result = await self.run(fn, *args, on_start=on_start)
+            except Exception as e:
+                if on_error:
+                    outcome = on_error(e)
+                    if asyncio.iscoroutine(outcome):
+                        await outcome
+                return
+            if on_success:
+                outcome = on_success(result)
+                if asyncio.iscoroutine(outcome):
+                    await outcome
+
+        return asyncio.get_running_loop().create_task(_job())
+
+    def shutdown(self, wait: bool = False) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,292 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Job store
+#
+# Jobs used to live in a module-level dict that was lost on restart, grew
+# without bound and could not be shared between uvicorn workers. JobStore is
+# the interface the API servers talk to; SQLiteJobStore is the default
+# backend. Other backends register themselves in BACKENDS by URL scheme.
+# ─────────────────────────────────────────────────────────────────────────────
+
+# Statuses after which a job never changes again and becomes eligible for eviction
+FINISHED_STATUSES = ("completed", "failed", "timeout")
+
+# Fields stored in their own (indexed) columns; everything else goes into the JSON blob
+INDEXED_FIELDS = ("status", "payment_id", "identifier_from_purchaser", "input_hash")
+
+
+def _json_default(value: Any) -> Any:
+    # Crew results are pydantic models (CrewOutput, TaskOutput); store their JSON form
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return str(value)
+
+
+def to_jsonable(value: Any) -> Any:
+    """ Converts a value (including crew results) into plain JSON types """
+    return json.loads(json.dumps(value, default=_json_default))
+
+
+class JobStore(ABC):
+    """ Interface every job store backend implements """
+
+    def __init__(self, ttl_seconds: Optional[float] = None, evict_interval: float = 300):
+        self.ttl_seconds = ttl_seconds
+        self.evict_interval = evict_interval
+        self._last_eviction = 0.0
+
+    @abstractmethod
+    def create(self, job_id: str, **fields: Any) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def update(self, job_id: str, **fields: Any) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def transition(self, job_id: str, from_status: str, **fields: Any) -> Optional[Dict[str, Any]]:
+        """
+        Applies fields only if the job is currently in from_status and returns
+        the updated job, or None if another worker already moved it on.
+        """
+        ...
+
+    @abstractmethod
+    def delete(self, job_id: str) -> None:
+        ...
+
+    @abstractmethod
+    def find(self, limit: Optional[int] = None, **filters: Any) -> List[Dict[str, Any]]:
+        """ Returns jobs matching equality filters on the indexed fields """
+        ...
+
+    @abstractmethod
+    def finished_since(self, since: float, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """ Returns jobs that finished at or after since, most recent first """
+        ...
+
+    @abstractmethod
+    def evict_expired(self) -> int:
+        """ Deletes finished jobs older than the TTL and returns how many were removed """
+        ...
+
+    def __contains__(self, job_id: str) -> bool:
+        return self.get(job_id) is not None
+
+    def maybe_evict(self) -> None:
+        """ Runs eviction at most once per evict_interval seconds """
+        if not self.ttl_seconds:
+            return
+        now = time.time()
+        if now - self._last_eviction >= self.evict_interval:
+            self._last_eviction = now
+            self.evict_expired()
+
+
+class SQLiteJobStore(JobStore):
+    """ SQLite backend in WAL mode, safe to share between processes on one host """
+
+    def __init__(self, path: str = "jobs.db", **kwargs: Any):
+        super().__init__(**kwargs)
+        self.path = path
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self) -> None:
+        conn = self._connect()
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT,
+                payment_id TEXT,
+                identifier_from_purchaser TEXT,
+                input_hash TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                finished_at REAL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status);
+            CREATE INDEX IF NOT EXISTS idx_jobs_payment_id ON jobs(payment_id);
+            CREATE INDEX IF NOT EXISTS idx_jobs_purchaser ON jobs(identifier_from_purchaser);
+            CREATE INDEX IF NOT EXISTS idx_jobs_finished_at ON jobs(finished_at);
+            """
+        )
+        # Databases created before a field was indexed get its column added in place
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for field in INDEXED_FIELDS:
+            if field not in columns:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {field} TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_input_hash ON jobs(input_hash)")
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+        job = json.loads(row["data"])
+        job["job_id"] = row["job_id"]
+        # The column is the store's own numeric timestamp; a caller-supplied
+        # created_at in older rows' data must not shadow it
+        job["created_at"] = row["created_at"]
+        for field in INDEXED_FIELDS:
+            job[field] = row[field]
+        job["finished_at"] = row["finished_at"]
+        return job
+
+    def create(self, job_id: str, **fields: Any) -> Dict[str, Any]:
+        self.maybe_evict()
+        now = time.time()
+        data = {k: v for k, v in fields.items() if k not in INDEXED_FIELDS}
+        data.setdefault("created_at", now)
+        status = fields.get("status")
+        self._connect().execute(
+            f"INSERT INTO jobs (job_id, {', '.join(INDEXED_FIELDS)}, created_at, updated_at, finished_at, data)"
+            f" VALUES (?, {', '.join('?' for _ in INDEXED_FIELDS)}, ?, ?, ?, ?)",
+            (
+                job_id,
+                *(fields.get(field) for field in INDEXED_FIELDS),
+                now,
+                now,
+                now if status in FINISHED_STATUSES else None,
+                json.dumps(data, default=_json_default),
+            ),
+        )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def update(self, job_id: str, **fields: Any) -> Optional[Dict[str, Any]]:
+        return self._update(job_id, None, fields)
+
+    def transition(self, job_id: str, from_status: str, **fields: Any) -> Optional[Dict[str, Any]]:
+        return self._update(job_id, from_status, fields)
+
+    def _update(self, job_id: str, from_status: Optional[str], fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        # BEGIN IMMEDIATE takes the write lock up front so concurrent
+        # read-modify-write cycles from other workers cannot interleave.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None or (from_status is not None and row["status"] != from_status):
+                conn.execute("ROLLBACK")
+                return None
+            job = self._row_to_job(row)
+            job.update(fields)
+            now = time.time()
+            # A finished job that is retried is live again and must not be evicted
+            finished_at = row["finished_at"]
+            if job.get("status") not in FINISHED_STATUSES:
+                finished_at = None
+            elif finished_at is None:
+                finished_at = now
+            data = {k: v for k, v in job.items() if k not in INDEXED_FIELDS and k not in ("job_id", "finished_at")}
+            conn.execute(
+                f"UPDATE jobs SET {', '.join(f'{field} = ?' for field in INDEXED_FIELDS)},"
+                " updated_at = ?, finished_at = ?, data = ? WHERE job_id = ?",
+                (
+                    *(job.get(field) for field in INDEXED_FIELDS),
+                    now,
+                    finished_at,
+                    json.dumps(data, default=_json_default),
+                    job_id,
+                ),
+            )
+            job["finished_at"] = finished_at
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return to_jsonable(job)
+
+    def delete(self, job_id: str) -> None:
+        self._connect().execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def find(self, limit: Optional[int] = None, **filters: Any) -> List[Dict[str, Any]]:
+        unknown = set(filters) - set(INDEXED_FIELDS)
+        if unknown:
+            raise ValueError(f"Cannot filter jobs on non-indexed fields: {sorted(unknown)}")
+        query = "SELECT * FROM jobs"
+        params: List[Any] = []
+        if filters:
+            clauses = []
+            for field, value in filters.items():
+                if isinstance(value, (list, tuple, set)):
+                    clauses.append(f"{field} IN ({', '.join('?' for _ in value)})")
+                    params.extend(value)
+                else:
+                    clauses.append(f"{field} = ?")
+                    params.append(value)
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY created_at"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        rows = self._connect().execute(query, params).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def finished_since(self, since: float, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        query = "SELECT * FROM jobs WHERE finished_at >= ? ORDER BY finished_at DESC"
+        params: List[Any] = [since]
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        rows = self._connect().execute(query, params).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def evict_expired(self) -> int:
+        if not self.ttl_seconds:
+            return 0
+        cutoff = time.time() - self.ttl_seconds
+        cursor = self._connect().execute(
+            "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (cutoff,)
+        )
+        return cursor.rowcount
+
+
+# URL scheme -> backend class. Register new backends here.
+BACKENDS = {
+    "sqlite": SQLiteJobStore,
+}
+
+
+def create_job_store(url: Optional[str] = None, ttl_seconds: Optional[float] = None) -> JobStore:
+    """
+    Builds the job store described by url (default: JOB_STORE_URL or sqlite:///jobs.db).
+    Finished jobs are evicted after ttl_seconds (default: JOB_TTL_SECONDS or 7 days).
+    """
+    url = url or os.getenv("JOB_STORE_URL", "sqlite:///jobs.db")
+    if ttl_seconds is None:
+        ttl_seconds = float(os.getenv("JOB_TTL_SECONDS", str(7 * 24 * 3600)))
+    parsed = urlparse(url)
+    backend = BACKENDS.get(parsed.scheme)
+    if backend is None:
+        raise ValueError(f"Unsupported job store backend: {parsed.scheme}")
+    # sqlite:///jobs.db -> jobs.db, sqlite:////var/lib/jobs.db -> /var/lib/jobs.db
+    path = parsed.path[1:] if parsed.path.startswith("/") else parsed.path
+    return backend(path or "jobs.db", ttl_seconds=ttl_seconds)
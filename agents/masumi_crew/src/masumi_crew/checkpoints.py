@@ -0,0 +1,121 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from masumi_crew.telemetry import registry
+
+checkpoint_hits = registry.counter(
+    "masumi_checkpoint_hits_total", "Job steps skipped because a checkpoint had their output.", ("step",),
+)
+
+
+class CheckpointStore:
+    """
+    Durable output of each completed step of a job, keyed by job id and step.
+
+    A retried or redelivered job reads its checkpoints and skips the steps
+    that already finished (the Apollo search, written emails, the payment
+    completion), so only the failed tail runs again. Checkpoints are deleted
+    after ttl_seconds.
+    """
+
+    def __init__(self, path: str = "checkpoints.db", ttl_seconds: float = 7 * 24 * 3600):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._last_eviction = 0.0
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            " job_id TEXT NOT NULL, step TEXT NOT NULL, data TEXT NOT NULL, created_at REAL NOT NULL,"
+            " PRIMARY KEY (job_id, step))"
+        )
+        self._connect().execute("CREATE INDEX IF NOT EXISTS idx_checkpoints_created_at ON checkpoints(created_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, job_id: str, step: str) -> Optional[Any]:
+        """Returns the step's saved output, or None if the step has not completed."""
+        row = self._connect().execute(
+            "SELECT data FROM checkpoints WHERE job_id = ? AND step = ?", (job_id, step)
+        ).fetchone()
+        if row is None:
+            return None
+        checkpoint_hits.inc(step=step)
+        return json.loads(row[0])
+
+    def save(self, job_id: str, step: str, data: Any) -> None:
+        now = time.time()
+        self._connect().execute(
+            "INSERT OR REPLACE INTO checkpoints (job_id, step, data, created_at) VALUES (?, ?, ?, ?)",
+            (job_id, step, json.dumps(data, default=str), now),
+        )
+        if now - self._last_eviction >= 300:
+            self._last_eviction = now
+            self._connect().execute("DELETE FROM checkpoints WHERE created_at < ?", (now - self.ttl_seconds,))
+
+    def steps(self, job_id: str) -> Dict[str, Any]:
+        rows = self._connect().execute(
+            "SELECT step, data FROM checkpoints WHERE job_id = ? ORDER BY created_at", (job_id,)
+        )
+        return {step: json.loads(data) for step, data in rows}
+
+    def clear(self, job_id: str) -> None:
+        self._connect().execute("DELETE FROM checkpoints WHERE job_id = ?", (job_id,))
+
+
+_checkpoint_store: Optional[CheckpointStore] = None
+_checkpoint_store_lock = threading.Lock()
+
+
+def get_checkpoint_store() -> Optional[CheckpointStore]:
+    """
+    Returns the process-wide checkpoint store at CHECKPOINT_PATH (default
+    checkpoints.db). Set CHECKPOINT_PATH to an empty string to disable
+    checkpointing.
+    """
+    global _checkpoint_store
+    path = os.getenv("CHECKPOINT_PATH", "checkpoints.db")
+    if not path:
+        return None
+    if _checkpoint_store is None:
+        with _checkpoint_store_lock:
+            if _checkpoint_store is None:
+                _checkpoint_store = CheckpointStore(
+                    path, ttl_seconds=float(os.getenv("JOB_TTL_SECONDS", str(7 * 24 * 3600)))
+                )
+    return _checkpoint_store
+
+
+def task_step(index: int) -> str:
+    return f"task_{index}"
+
+
+@contextmanager
+def checkpoint_tasks(crew, store: CheckpointStore, job_id: str) -> Iterator[None]:
+    """Saves each task's raw output under job_id as soon as the task finishes."""
+    saved = [(task, task.callback) for task in crew.tasks]
+
+    def saving(index, callback):
+        def on_done(output):
+            store.save(job_id, task_step(index), output.raw)
+            if callback:
+                callback(output)
+        return on_done
+
+    for index, (task, callback) in enumerate(saved):
+        task.callback = saving(index, callback)
+    try:
+        yield
+    finally:
+        for task, callback in saved:
+            task.callback = callback
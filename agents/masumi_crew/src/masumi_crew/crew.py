@@ -1,7 +1,16 @@
-from crewai import Agent, Crew, Process, Task, LLM
+import os
+
+from crewai import Agent, Crew, Process, Task
+from masumi_crew.model_router import get_model_router
 from crewai.project import CrewBase, agent, crew, task
+from masumi_crew.parsing import contacts_guardrail
+from masumi_crew.sinks import get_jsonl_sink
 from masumi_crew.tools.apollo_tool import ApolloSearchTool
 
+# CONTACTS_JSONL_PATH streams every enriched contact to that JSON Lines file as
+# it is produced, instead of the task writing its whole answer to apollo_results.json
+CONTACTS_JSONL_PATH = os.getenv("CONTACTS_JSONL_PATH")
+
 # If you want to run a snippet of code before or after the crew starts,
 # you can use the @before_kickoff and @after_kickoff decorators
 # https://docs.crewai.com/concepts/crews#example-crew-class-with-decorators
@@ -23,9 +32,10 @@ class MasumiCrew():
     def apollo_agent(self) -> Agent:
         return Agent(
             config=self.agents_config['apollo_agent'],
-            tools=[ApolloSearchTool()],
+            tools=[ApolloSearchTool(sink=get_jsonl_sink(CONTACTS_JSONL_PATH) if CONTACTS_JSONL_PATH else None)],
             verbose=True,
-            llm=LLM(model="deepseek/deepseek-chat", api_key="", temperature=1.5)
+            # Model, fallbacks and concurrency cap come from config/models.yaml
+            llm=get_model_router().llm_for("masumi_search")
         )
 
     # To learn more about structured task outputs,
@@ -36,7 +46,9 @@ class MasumiCrew():
     def apollo_search_task(self) -> Task:
         return Task(
             config=self.tasks_config['apollo_search_task'],
-            output_file='apollo_results.json'
+            output_file=None if CONTACTS_JSONL_PATH else 'apollo_results.json',
+            # Validates the JSON contacts and re-asks the agent (bounded) if none parse
+            guardrail=contacts_guardrail
         )
 
     @crew
@@ -0,0 +1,113 @@
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Generic, Iterator, List, Optional, TypeVar
+
+from masumi_crew.telemetry import span
+
+if TYPE_CHECKING:
+    from crewai import Crew
+
+T = TypeVar("T")
+
+# Per-run counters crewai keeps on tasks and agents; they must start from zero for every job
+_TASK_COUNTERS = ("retry_count", "used_tools", "tools_errors", "delegations")
+_AGENT_COUNTERS = ("_times_executed",)
+
+
+def reset_crew(crew: "Crew") -> None:
+    """Clears what one kickoff leaves behind so the same Crew can serve the next job."""
+    for task in crew.tasks:
+        for counter in _TASK_COUNTERS:
+            if hasattr(task, counter):
+                setattr(task, counter, 0)
+        task.output = None
+    for agent in crew.agents:
+        for counter in _AGENT_COUNTERS:
+            if hasattr(agent, counter):
+                setattr(agent, counter, 0)
+        if hasattr(agent, "tools_results"):
+            agent.tools_results = []
+
+
+class CrewPool(Generic[T]):
+    """
+    A fixed number of pre-built crews, each leased to one job at a time.
+
+    Building a crew (LLM clients, agents, tasks, YAML config) happens once per
+    pooled instance instead of once per job. Size the pool to the worker
+    count so a lease never waits. A crew whose job raised is dropped and
+    rebuilt on demand, since its state can no longer be trusted.
+    """
+
+    def __init__(self, factory: Callable[[], T], size: int, reset: Optional[Callable[[T], None]] = None,
+                 name: str = "crew"):
+        self.factory = factory
+        self.size = max(1, size)
+        self.reset = reset
+        self.name = name
+        self._idle: List[T] = []
+        self._built = 0
+        # Signalled whenever a crew is returned or a slot to build one frees up
+        self._available = threading.Condition()
+
+    def _build(self) -> T:
+        with span("crew_build", self.name):
+            return self.factory()
+
+    def _put(self, instance: T) -> None:
+        with self._available:
+            self._idle.append(instance)
+            self._available.notify()
+
+    def warm(self) -> None:
+        """Builds every missing instance up front, off the per-job critical path."""
+        while True:
+            with self._available:
+                if self._built >= self.size:
+                    return
+                self._built += 1
+            try:
+                instance = self._build()
+            except Exception:
+                self._discard()
+                raise
+            self._put(instance)
+
+    def _acquire(self) -> T:
+        with self._available:
+            while not self._idle and self._built >= self.size:
+                self._available.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._built += 1
+        try:
+            return self._build()
+        except Exception:
+            self._discard()
+            raise
+
+    def _discard(self) -> None:
+        """Gives up a slot; a waiting lease builds the replacement."""
+        with self._available:
+            self._built -= 1
+            self._available.notify()
+
+    @contextmanager
+    def lease(self) -> Iterator[T]:
+        instance = self._acquire()
+        try:
+            yield instance
+        except BaseException:
+            self._discard()
+            raise
+        try:
+            if self.reset is not None:
+                self.reset(instance)
+        except Exception:
+            self._discard()
+            raise
+        self._put(instance)
+
+    def stats(self) -> dict:
+        with self._available:
+            return {"size": self.size, "built": self._built, "idle": len(self._idle)}
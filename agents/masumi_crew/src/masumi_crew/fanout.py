@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from pydantic import ValidationError
+
+from masumi_crew.crew_pool import CrewPool
+from masumi_crew.models import Contact
+from masumi_crew.parsing import parse_contacts
+from masumi_crew.telemetry import span
+
+# Name and organization suffixes that vary between Apollo records of the same person
+_ORG_SUFFIXES = re.compile(r"\b(inc|llc|ltd|gmbh|corp|corporation|co|capital|ventures|partners)\b\.?")
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def _normalize(value: Optional[str]) -> str:
+    return _NON_ALNUM.sub(" ", (value or "").lower()).strip()
+
+
+def _linkedin_slug(url: Optional[str]) -> str:
+    url = (url or "").strip().lower().split("?")[0].split("#")[0].rstrip("/")
+    url = re.sub(r"^https?://", "", url)
+    return re.sub(r"^([a-z]{2,3}\.)?(www\.)?", "", url) if "linkedin.com/" in url else ""
+
+
+def contact_keys(contact: Contact) -> List[str]:
+    """
+    Identity hashes of a contact, strongest first: LinkedIn profile, email,
+    then normalized first name, last name and organization.
+    """
+    keys = []
+    slug = _linkedin_slug(contact.linkedin_url)
+    if slug:
+        keys.append("li:" + slug)
+    email = (contact.email or "").strip().lower()
+    if "@" in email and "not_unlocked" not in email:
+        keys.append("em:" + email)
+    name = _normalize(f"{contact.first_name} {contact.last_name or ''}")
+    org = _ORG_SUFFIXES.sub("", _normalize(contact.organization_name)).strip()
+    if name and org:
+        keys.append("no:" + name + "|" + re.sub(r"\s+", " ", org))
+    return [hashlib.sha1(key.encode()).hexdigest() for key in keys]
+
+
+class ContactDeduplicator:
+    """
+    Merges contacts from several searches, keeping one record per person.
+
+    Every identity key of an accepted contact is indexed, so a duplicate is
+    caught by whichever key the two records share. Fields missing from the
+    kept record are filled from its duplicates.
+    """
+
+    def __init__(self):
+        self.contacts: List[Contact] = []
+        self.sources: List[List[str]] = []
+        self.duplicates = 0
+        self._index: Dict[str, int] = {}
+
+    def add(self, contact: Contact, source: str) -> bool:
+        """Returns True if the contact was new."""
+        keys = contact_keys(contact)
+        position = next((self._index[key] for key in keys if key in self._index), None)
+        if position is None:
+            position = len(self.contacts)
+            self.contacts.append(contact)
+            self.sources.append([source])
+            added = True
+        else:
+            kept = self.contacts[position]
+            missing = {
+                field: value for field, value in contact.model_dump(exclude_none=True).items()
+                if getattr(kept, field, None) in (None, "")
+            }
+            if missing:
+                self.contacts[position] = kept.model_copy(update=missing)
+                keys = contact_keys(self.contacts[position])
+            if source not in self.sources[position]:
+                self.sources[position].append(source)
+            self.duplicates += 1
+            added = False
+        for key in keys:
+            self._index.setdefault(key, position)
+        return added
+
+    def records(self) -> List[Dict[str, Any]]:
+        return [
+            {**contact.model_dump(exclude_none=True), "segments": sources}
+            for contact, sources in zip(self.contacts, self.sources)
+        ]
+
+
+def segment_label(inputs: Dict[str, Any]) -> str:
+    return f"{inputs.get('search_target', '')} / {inputs.get('industry', '')}"
+
+
+@contextmanager
+def _without_output_files(crew) -> Iterator[None]:
+    # Pooled crews write apollo_results.json; concurrent segments must not race on it
+    saved = [(task, task.output_file) for task in crew.tasks]
+    for task, _ in saved:
+        task.output_file = None
+    try:
+        yield
+    finally:
+        for task, output_file in saved:
+            task.output_file = output_file
+
+
+@contextmanager
+def _tagged_sinks(crew, **tags: Any) -> Iterator[List[Any]]:
+    # Tools that stream to a sink tag this run's records; yields the sinks they write to
+    tools = [tool for agent in crew.agents for tool in agent.tools or [] if getattr(tool, "sink", None) is not None]
+    for tool in tools:
+        tool.record_tags = tags
+    try:
+        yield list({id(tool.sink): tool.sink for tool in tools}.values())
+    finally:
+        for tool in tools:
+            tool.record_tags = {}
+
+
+def _sink_contacts(sinks: List[Any], tags: Dict[str, Any]) -> List[Contact]:
+    contacts = []
+    for sink in sinks:
+        for record in sink.read(**tags):
+            try:
+                contacts.append(Contact(**{key: value for key, value in record.items() if key not in tags}))
+            except ValidationError:
+                continue
+    return contacts
+
+
+def _run_segment(pool: CrewPool, inputs: Dict[str, Any], job_id: str) -> List[Contact]:
+    tags = {"job_id": job_id, "segment": segment_label(inputs)}
+    with pool.lease() as crew, _without_output_files(crew), _tagged_sinks(crew, **tags) as sinks:
+        with span("crew", "segment", segment=tags["segment"]) as segment_span:
+            result = crew.kickoff(inputs=inputs)
+            segment_span.add_usage(getattr(result, "token_usage", None))
+    # With a sink the agent only saw a preview; the full list is in the sink,
+    # unless the agent answered without calling the tool
+    contacts = _sink_contacts(sinks, tags)
+    return contacts or parse_contacts(result.tasks_output[0])
+
+
+def run_segments(pool: CrewPool, segments: List[Dict[str, Any]], max_parallel: Optional[int] = None,
+                 defaults: Optional[Dict[str, Any]] = None, job_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Runs the search crew once per segment, at most max_parallel at a time, and
+    merges the contacts of all segments into one deduplicated list.
+
+    Each segment is the inputs dict of one kickoff (search_target, industry,
+    limit); defaults fill the keys a segment leaves out. A segment that fails
+    is reported in the summary and does not stop the others. Contacts a
+    search streams to a sink are tagged with job_id (default: a new id) and
+    the segment, and read back from the sink.
+    """
+    parallel = max(1, min(max_parallel or pool.size, pool.size, len(segments) or 1))
+    inputs_list = [{**(defaults or {}), **segment} for segment in segments]
+    job_id = job_id or uuid.uuid4().hex
+    deduplicator = ContactDeduplicator()
+    summary = []
+
+    with ThreadPoolExecutor(max_workers=parallel, thread_name_prefix="segment") as executor:
+        futures = [executor.submit(_run_segment, pool, inputs, job_id) for inputs in inputs_list]
+        # Merge in segment order so the combined output does not depend on timing
+        for inputs, future in zip(inputs_list, futures):
+            label = segment_label(inputs)
+            try:
+                contacts = future.result()
+            except Exception as e:
+                summary.append({"segment": label, "error": str(e)})
+                continue
+            added = sum(deduplicator.add(contact, label) for contact in contacts)
+            summary.append({"segment": label, "found": len(contacts), "new": added})
+
+    return {
+        "job_id": job_id,
+        "segments": summary,
+        "duplicates": deduplicator.duplicates,
+        "contacts": deduplicator.records(),
+    }
+
+
+def write_combined(result: Dict[str, Any], path: str) -> None:
+    """Writes the merged result in one step, so readers never see a partial file."""
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile("w", dir=directory, suffix=".tmp", delete=False) as f:
+        json.dump(result, f)
+    os.replace(f.name, path)
@@ -0,0 +1,341 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+
+import yaml
+
+from masumi_crew.telemetry import registry
+
+DEFAULT_LIMITS_CONFIG = os.path.join(os.path.dirname(__file__), "config", "limits.yaml")
+
+# Older per-limiter settings, still honoured as overrides of the provider's rate
+_RATE_ENV_OVERRIDES = {
+    "apollo": "APOLLO_RATE_PER_SECOND",
+    "gmail": "GMAIL_SENDS_PER_SECOND",
+}
+
+# Error class names and message fragments that mean the provider is rate limiting us
+_RATE_LIMIT_ERRORS = ("RateLimitError", "TooManyRequests")
+_RATE_LIMIT_MESSAGES = ("429", "rate limit", "ratelimitexceeded", "too many requests")
+
+rate_limited = registry.counter(
+    "masumi_rate_limited_total", "Rate-limit responses that made a provider back off.", ("provider",),
+)
+rate_limit_wait = registry.counter(
+    "masumi_rate_limit_wait_seconds_total", "Seconds callers waited for a provider's rate limit.", ("provider",),
+)
+quota_exhausted = registry.counter(
+    "masumi_quota_exhausted_total", "Calls refused because a provider's daily quota was used up.", ("provider",),
+)
+
+
+class QuotaExceededError(Exception):
+    """Raised when a provider's daily quota is used up."""
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    names = {cls.__name__ for cls in type(error).__mro__}
+    if names.intersection(_RATE_LIMIT_ERRORS):
+        return True
+    return getattr(error, "status_code", None) == 429 or is_rate_limit_message(str(error))
+
+
+def is_rate_limit_message(message: Optional[str]) -> bool:
+    message = (message or "").lower()
+    return any(fragment in message for fragment in _RATE_LIMIT_MESSAGES)
+
+
+def retry_after(source: Any) -> Optional[float]:
+    """Seconds from the Retry-After header of a response, or of the response an error carries."""
+    headers = getattr(source, "headers", None)
+    if headers is None:
+        headers = getattr(getattr(source, "response", None), "headers", None)
+    try:
+        return float(headers.get("Retry-After")) if headers else None
+    except (TypeError, ValueError):
+        return None
+
+
+class ProviderLimits:
+    """
+    Limits for one provider. rate is requests per second (None: unlimited),
+    refilled into a bucket of burst tokens; max_concurrency caps requests in
+    flight per process; daily_quota caps requests per UTC day.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: Optional[float] = None,
+        burst: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        daily_quota: Optional[int] = None,
+        min_rate_factor: float = 0.1,
+        recovery_per_second: float = 0.02,
+        max_backoff: float = 60,
+    ):
+        self.name = name
+        self.rate = rate
+        self.burst = max(1.0, burst or rate or 1)
+        self.max_concurrency = max_concurrency
+        self.daily_quota = daily_quota
+        self.min_rate_factor = min_rate_factor
+        self.recovery_per_second = recovery_per_second
+        self.max_backoff = max_backoff
+
+
+def _today(now: float) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(now))
+
+
+def _new_state(limits: ProviderLimits, now: float) -> Dict[str, Any]:
+    return {
+        "tokens": limits.burst, "updated_at": now, "paused_until": 0.0, "factor": 1.0,
+        "strikes": 0, "limited_at": 0.0, "day": _today(now), "used": 0,
+    }
+
+
+class MemoryLimitStore:
+    """Provider state for one process."""
+
+    def __init__(self):
+        self._states: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def update(self, provider: str, new: Callable[[], Dict[str, Any]], fn: Callable[[Dict[str, Any]], Any]) -> Any:
+        with self._lock:
+            state = self._states.setdefault(provider, new())
+            return fn(state)
+
+    def get(self, provider: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            state = self._states.get(provider)
+            return dict(state) if state else None
+
+
+class SQLiteLimitStore:
+    """
+    Provider state in a SQLite file, so every worker process on the host
+    draws from the same buckets and quotas and sees the same backoff.
+    """
+
+    def __init__(self, path: str = "rate_limits.db"):
+        self.path = path
+        self._local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS provider_limits (provider TEXT PRIMARY KEY, state TEXT NOT NULL)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def update(self, provider: str, new: Callable[[], Dict[str, Any]], fn: Callable[[Dict[str, Any]], Any]) -> Any:
+        conn = self._connect()
+        # BEGIN IMMEDIATE takes the write lock up front so two processes never spend the same token
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT state FROM provider_limits WHERE provider = ?", (provider,)).fetchone()
+            state = json.loads(row[0]) if row else new()
+            result = fn(state)
+            conn.execute(
+                "INSERT OR REPLACE INTO provider_limits (provider, state) VALUES (?, ?)", (provider, json.dumps(state))
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def get(self, provider: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute("SELECT state FROM provider_limits WHERE provider = ?", (provider,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+class RateGovernor:
+    """
+    One place that paces every outbound call: Apollo, Gmail, the LLM
+    providers and the Masumi payment service.
+
+    Each provider has a token bucket, a per-process concurrency cap and an
+    optional daily quota. A rate-limit response pauses the provider for its
+    Retry-After (or an exponential backoff) and halves its rate for every
+    caller; the rate then climbs back by recovery_per_second, so sustained
+    traffic settles just under the provider's real limit. Providers without
+    limits pass straight through.
+    """
+
+    def __init__(self, limits: Dict[str, ProviderLimits], store: Any = None):
+        self.limits = limits
+        self.store = store or MemoryLimitStore()
+        self._slots = {
+            name: threading.BoundedSemaphore(spec.max_concurrency)
+            for name, spec in limits.items() if spec.max_concurrency
+        }
+
+    @classmethod
+    def from_file(cls, path: str, store: Any = None) -> "RateGovernor":
+        with open(path) as f:
+            config = yaml.safe_load(f) or {}
+        limits = {name: ProviderLimits(name, **(spec or {})) for name, spec in (config.get("providers") or {}).items()}
+        for name, variable in _RATE_ENV_OVERRIDES.items():
+            if os.getenv(variable) and name in limits:
+                limits[name].rate = float(os.environ[variable])
+                limits[name].burst = max(1.0, limits[name].rate)
+        return cls(limits, store)
+
+    def _reserve(self, provider: str, cost: float) -> float:
+        """Takes cost tokens if it can; otherwise returns how long to wait before trying again."""
+        limits = self.limits[provider]
+
+        def take(state):
+            now = time.time()
+            if state["day"] != _today(now):
+                state["day"], state["used"] = _today(now), 0
+            if limits.daily_quota is not None and state["used"] + cost > limits.daily_quota:
+                raise QuotaExceededError(f"{provider}: daily quota of {limits.daily_quota} requests used up")
+            if now < state["paused_until"]:
+                return state["paused_until"] - now
+            elapsed = max(0.0, now - state["updated_at"])
+            state["updated_at"] = now
+            state["factor"] = min(1.0, state["factor"] + elapsed * limits.recovery_per_second)
+            if now - state["limited_at"] > limits.max_backoff:
+                state["strikes"] = 0
+            if limits.rate:
+                rate = limits.rate * state["factor"]
+                state["tokens"] = min(limits.burst, state["tokens"] + elapsed * rate)
+                if state["tokens"] < cost:
+                    return (cost - state["tokens"]) / rate
+                state["tokens"] -= cost
+            state["used"] += cost
+            return 0.0
+
+        try:
+            return self.store.update(provider, lambda: _new_state(limits, time.time()), take)
+        except QuotaExceededError:
+            quota_exhausted.inc(provider=provider)
+            raise
+
+    def acquire(self, provider: str, cost: float = 1) -> None:
+        """Blocks until provider's bucket allows another request; raises QuotaExceededError if none are left today."""
+        if provider not in self.limits:
+            return
+        while True:
+            wait = self._reserve(provider, cost)
+            if wait <= 0:
+                return
+            rate_limit_wait.inc(wait, provider=provider)
+            time.sleep(wait)
+
+    async def acquire_async(self, provider: str, cost: float = 1) -> None:
+        """acquire() for coroutines; the SQLite reservation runs in a thread so it never blocks the event loop."""
+        if provider not in self.limits:
+            return
+        while True:
+            wait = await asyncio.to_thread(self._reserve, provider, cost)
+            if wait <= 0:
+                return
+            rate_limit_wait.inc(wait, provider=provider)
+            await asyncio.sleep(wait)
+
+    def backoff(self, provider: str, seconds: Optional[float] = None) -> None:
+        """
+        Records a rate-limit response: pauses the provider for seconds (its
+        Retry-After) or an exponential backoff, and halves its rate.
+        """
+        rate_limited.inc(provider=provider)
+        if provider not in self.limits:
+            return
+        limits = self.limits[provider]
+
+        def slow_down(state):
+            now = time.time()
+            state["strikes"] += 1
+            state["limited_at"] = now
+            state["factor"] = max(limits.min_rate_factor, state["factor"] / 2)
+            pause = seconds if seconds is not None else min(limits.max_backoff, 2 ** (state["strikes"] - 1))
+            state["paused_until"] = max(state["paused_until"], now + pause)
+            # Refill (and rate recovery) start when the pause ends, so no burst follows it
+            state["tokens"] = 0.0
+            state["updated_at"] = state["paused_until"]
+
+        self.store.update(provider, lambda: _new_state(limits, time.time()), slow_down)
+
+    @contextmanager
+    def limit(self, provider: str, cost: float = 1) -> Iterator[None]:
+        """
+        Holds a concurrency slot and a token for one request to provider.
+        A rate-limit error raised inside the block makes the provider back off.
+        """
+        slots = self._slots.get(provider)
+        if slots is not None:
+            slots.acquire()
+        try:
+            self.acquire(provider, cost)
+            try:
+                yield
+            except Exception as e:
+                if is_rate_limited(e):
+                    self.backoff(provider, retry_after(e))
+                raise
+        finally:
+            if slots is not None:
+                slots.release()
+
+    @asynccontextmanager
+    async def limit_async(self, provider: str, cost: float = 1) -> AsyncIterator[None]:
+        """limit() for coroutines; concurrency is left to the event loop's own callers."""
+        await self.acquire_async(provider, cost)
+        try:
+            yield
+        except Exception as e:
+            if is_rate_limited(e):
+                await asyncio.to_thread(self.backoff, provider, retry_after(e))
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        stats = {}
+        for name, limits in self.limits.items():
+            state = self.store.get(name) or _new_state(limits, now)
+            used = state["used"] if state["day"] == _today(now) else 0
+            stats[name] = {
+                "rate": limits.rate,
+                "rate_factor": round(state["factor"], 3),
+                "paused_for": round(max(0.0, state["paused_until"] - now), 3),
+                "used_today": used,
+                "daily_quota": limits.daily_quota,
+            }
+        return stats
+
+
+_governor: Optional[RateGovernor] = None
+_governor_lock = threading.Lock()
+
+
+def get_governor() -> RateGovernor:
+    """
+    Returns the process-wide governor. Limits come from RATE_LIMITS_PATH
+    (default config/limits.yaml); state is shared through RATE_LIMIT_STORE
+    (default rate_limits.db), or kept per process if that is empty.
+    """
+    global _governor
+    if _governor is None:
+        with _governor_lock:
+            if _governor is None:
+                path = os.getenv("RATE_LIMIT_STORE", "rate_limits.db")
+                _governor = RateGovernor.from_file(
+                    os.getenv("RATE_LIMITS_PATH") or DEFAULT_LIMITS_CONFIG,
+                    SQLiteLimitStore(path) if path else MemoryLimitStore(),
+                )
+    return _governor
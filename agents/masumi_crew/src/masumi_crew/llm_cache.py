@@ -0,0 +1,299 @@
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+from crewai import LLM
+
+from masumi_crew.governor import get_governor
+from masumi_crew.telemetry import span
+
+# Request parameters that change what the model returns; all of them are part of the cache key
+SAMPLING_PARAMS = (
+    "temperature", "top_p", "n", "stop", "max_tokens", "max_completion_tokens",
+    "presence_penalty", "frequency_penalty", "logit_bias", "response_format",
+    "seed", "reasoning_effort",
+)
+
+_bypass = contextvars.ContextVar("llm_cache_bypass", default=False)
+
+
+@contextmanager
+def llm_cache_bypass() -> Iterator[None]:
+    """Disables the LLM cache for calls made inside the block on the current thread."""
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def provider_for_model(model: str) -> str:
+    """The rate-limit provider of a model: its litellm prefix, or openai for bare names like gpt-4o."""
+    return model.split("/", 1)[0] if "/" in model else "openai"
+
+
+def _describe_tool(tool: Any) -> Any:
+    # Tool schemas may hold BaseTool instances; their name and description identify them
+    if isinstance(tool, dict):
+        return {key: _describe_tool(value) for key, value in tool.items()}
+    name = getattr(tool, "name", None)
+    if name is not None:
+        return {"name": name, "description": getattr(tool, "description", None)}
+    return tool
+
+
+def cache_key(model: str, messages: Any, tools: Optional[Iterable[Any]] = None,
+              params: Optional[Dict[str, Any]] = None) -> str:
+    """Content address of an LLM request: a hash of model, messages, tools and sampling params."""
+    payload = {
+        "model": model,
+        "messages": messages,
+        "tools": [_describe_tool(tool) for tool in tools] if tools else None,
+        "params": params or {},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def encode_tool_calls(response: Any) -> Optional[List[Dict[str, Any]]]:
+    """
+    The tool calls of a native tool-calling response as plain dicts, or None
+    if response is not one or a call cannot be stored. crewai reads the dicts
+    back like the provider's own objects (OpenAI function calls, Anthropic
+    tool_use blocks).
+    """
+    if not isinstance(response, list) or not response:
+        return None
+    calls = []
+    for call in response:
+        if hasattr(call, "model_dump"):
+            call = call.model_dump(mode="json", exclude_none=True)
+        if not isinstance(call, dict) or not ("function" in call or ("name" in call and "input" in call)):
+            return None
+        calls.append(call)
+    try:
+        json.dumps(calls)
+    except (TypeError, ValueError):
+        return None
+    return calls
+
+
+class LLMCache:
+    """
+    On-disk cache of LLM completions keyed by cache_key: text answers and
+    the tool calls of native tool-calling rounds.
+
+    Entries live for ttl_seconds. When the cache grows beyond max_entries the
+    least recently used entries are dropped.
+    """
+
+    def __init__(
+        self,
+        path: str = "llm_cache.db",
+        ttl_seconds: float = 7 * 24 * 3600,
+        max_entries: int = 10_000,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.tool_call_hits = 0
+        self._puts = 0
+        self._stats_lock = threading.Lock()
+        self._local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS llm_responses ("
+            " key TEXT PRIMARY KEY, model TEXT, response TEXT NOT NULL,"
+            " stored_at REAL NOT NULL, last_access REAL NOT NULL, kind TEXT NOT NULL DEFAULT 'text')"
+        )
+        # Caches created before tool calls were cached hold only text answers
+        columns = {row[1] for row in self._connect().execute("PRAGMA table_info(llm_responses)")}
+        if "kind" not in columns:
+            self._connect().execute("ALTER TABLE llm_responses ADD COLUMN kind TEXT NOT NULL DEFAULT 'text'")
+        self._connect().execute(
+            "CREATE INDEX IF NOT EXISTS idx_llm_responses_last_access ON llm_responses(last_access)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, attr: str) -> None:
+        with self._stats_lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def get(self, key: str) -> Optional[Union[str, List[Dict[str, Any]]]]:
+        """Returns the cached text or tool calls, or None when there is no fresh entry."""
+        conn = self._connect()
+        row = conn.execute("SELECT response, stored_at, kind FROM llm_responses WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is not None and now - row[1] <= self.ttl_seconds:
+            conn.execute("UPDATE llm_responses SET last_access = ? WHERE key = ?", (now, key))
+            self._count("hits")
+            if row[2] == "tool_calls":
+                self._count("tool_call_hits")
+                return json.loads(row[0])
+            return row[0]
+        self._count("misses")
+        return None
+
+    def put(self, key: str, model: str, response: Union[str, List[Dict[str, Any]]]) -> None:
+        """Stores a text answer, or tool calls as returned by encode_tool_calls."""
+        kind = "text" if isinstance(response, str) else "tool_calls"
+        if kind == "tool_calls":
+            response = json.dumps(response)
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_responses (key, model, response, stored_at, last_access, kind)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (key, model, response, now, now, kind),
+        )
+        self._count("_puts")
+        # Counting rows is a table scan, so only check the size limit periodically
+        if self._puts % 100 == 0:
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        conn.execute("DELETE FROM llm_responses WHERE stored_at < ?", (time.time() - self.ttl_seconds,))
+        (size,) = conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()
+        excess = size - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM llm_responses WHERE key IN"
+                " (SELECT key FROM llm_responses ORDER BY last_access LIMIT ?)",
+                (excess,),
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        (size,) = self._connect().execute("SELECT COUNT(*) FROM llm_responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "tool_call_hits": self.tool_call_hits,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": size,
+        }
+
+
+_llm_cache: Optional[LLMCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """
+    Returns the process-wide LLM cache, configured by LLM_CACHE_PATH,
+    LLM_CACHE_TTL and LLM_CACHE_MAX_ENTRIES. Set LLM_CACHE_PATH to an empty
+    string to disable caching.
+    """
+    global _llm_cache
+    path = os.getenv("LLM_CACHE_PATH", "llm_cache.db")
+    if not path:
+        return None
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                _llm_cache = LLMCache(
+                    path=path,
+                    ttl_seconds=float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600))),
+                    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000")),
+                )
+    return _llm_cache
+
+
+def llm_cache_stats() -> Optional[Dict[str, Any]]:
+    cache = get_llm_cache()
+    return cache.stats() if cache else None
+
+
+def intercept_call(llm: Any, call: Any) -> Any:
+    """Makes call() of this LLM object run call instead; returns the LLM."""
+    # crewai 1.x LLMs are pydantic models: set the instance attribute directly
+    # so it shadows the class method without going through field validation
+    object.__setattr__(llm, "call", call)
+    return llm
+
+
+class CachedLLM:
+    """
+    Answers repeated requests of a crewai LLM from an LLMCache.
+
+    It wraps the LLM object instead of subclassing LLM: from crewai 1.0,
+    LLM(...) returns a native provider class (OpenAICompletion and the like),
+    so a subclass's call() would never run. build() creates the LLM and
+    routes its call() through this wrapper; crews use the LLM object itself.
+
+    Text completions are cached, and so are the tool calls a model returns
+    in crewai's native tool-calling loop (tools given, available_functions
+    None); the tool schemas are part of the key. Calls that execute
+    functions (available_functions) or ask for a response_model always go
+    to the model, as do calls made for a task named in skip_tasks or inside
+    llm_cache_bypass(). Calls that reach the model are paced by the rate
+    governor under the model's provider.
+    """
+
+    def __init__(self, llm: Any, model: Optional[str] = None, cache: Optional[LLMCache] = None,
+                 skip_tasks: Iterable[str] = ()):
+        self.llm = llm
+        # The configured name: native providers drop the provider prefix from llm.model
+        self.model = model or llm.model
+        self.cache = cache if cache is not None else get_llm_cache()
+        self.skip_tasks = set(skip_tasks)
+        self._call = llm.call
+
+    @classmethod
+    def build(cls, model: str, cache: Optional[LLMCache] = None, skip_tasks: Iterable[str] = (), **kwargs) -> Any:
+        """Creates the crewai LLM for model with caching installed and returns it."""
+        cached = cls(LLM(model=model, **kwargs), model, cache, skip_tasks)
+        return intercept_call(cached.llm, cached.call)
+
+    def _sampling_params(self) -> Dict[str, Any]:
+        params = {name: getattr(self.llm, name, None) for name in SAMPLING_PARAMS}
+        params.update(getattr(self.llm, "additional_params", None) or {})
+        return {name: value for name, value in params.items() if value is not None}
+
+    def _bypass(self, available_functions: Any, kwargs: Dict[str, Any]) -> bool:
+        if self.cache is None or available_functions or kwargs.get("response_model") or _bypass.get():
+            return True
+        from_task = kwargs.get("from_task")
+        return from_task is not None and getattr(from_task, "name", None) in self.skip_tasks
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        # Calls that reach the provider are timed by telemetry's crewai LLM
+        # listeners; only cache lookups are recorded here, as stage "llm_cache"
+        if self._bypass(available_functions, kwargs):
+            if self.cache is not None:
+                self.cache._count("bypassed")
+            with get_governor().limit(provider_for_model(self.model)):
+                return self._call(messages, tools, callbacks, available_functions, **kwargs)
+
+        key = cache_key(self.model, messages, tools, self._sampling_params())
+        with span("llm_cache", self.model) as lookup_span:
+            cached = self.cache.get(key)
+            lookup_span.outcome = "miss" if cached is None else "hit"
+        if cached is not None:
+            return cached
+
+        with get_governor().limit(provider_for_model(self.model)):
+            response = self._call(messages, tools, callbacks, available_functions, **kwargs)
+        if isinstance(response, str):
+            if response.strip():
+                self.cache.put(key, self.model, response)
+        else:
+            tool_calls = encode_tool_calls(response)
+            if tool_calls is not None:
+                self.cache.put(key, self.model, tool_calls)
+        return response
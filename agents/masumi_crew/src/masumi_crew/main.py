@@ -1,10 +1,16 @@
 #!/usr/bin/env python
+import json
+import os
 import sys
+import uuid
 import warnings
 
 from datetime import datetime
 
+from masumi_crew.checkpoints import checkpoint_tasks, get_checkpoint_store, task_step
 from masumi_crew.crew import MasumiCrew
+from masumi_crew.crew_pool import CrewPool, reset_crew
+from masumi_crew.fanout import run_segments, write_combined
 
 warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 
@@ -13,6 +19,28 @@ warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 # Replace with inputs you want to test with, it will automatically
 # interpolate any tasks and agents information
 
+# Crews are built on first use and reused afterwards, at most one per worker
+crew_pool = CrewPool(
+    lambda: MasumiCrew().crew(),
+    size=int(os.getenv("CREW_MAX_WORKERS", "4")),
+    reset=reset_crew,
+    name="masumi"
+)
+
+def _kickoff(job_id, inputs):
+    """
+    Runs the crew under job_id, checkpointing its inputs and each task's
+    output so `replay <job_id>` can pick the run up again.
+    """
+    checkpoints = get_checkpoint_store()
+    with crew_pool.lease() as crew:
+        if checkpoints is None:
+            return crew.kickoff(inputs=inputs)
+        checkpoints.save(job_id, "inputs", inputs)
+        with checkpoint_tasks(crew, checkpoints, job_id):
+            return crew.kickoff(inputs=inputs)
+
+
 def run():
     """
     Run the crew.
@@ -24,11 +52,50 @@ def run():
         'industry': 'blockchain/web3',
         'limit': 10
     }
+    # CREW_JOB_ID names the run; pass it to `replay` to resume the run if it fails
+    job_id = os.getenv("CREW_JOB_ID") or uuid.uuid4().hex
+    print(f"Job id: {job_id}")
     
     try:
-        MasumiCrew().crew().kickoff(inputs=inputs)
+        _kickoff(job_id, inputs)
+    except Exception as e:
+        raise Exception(f"An error occurred while running the crew (resume with `replay {job_id}`): {e}")
+
+
+def fanout():
+    """
+    Run the search for many segments concurrently and write one merged,
+    deduplicated contact list.
+
+    Usage: fanout <segments.json> [output.json]
+    segments.json holds a list of inputs such as
+    {"search_target": "angel investors", "industry": "fintech", "limit": 10}.
+    FANOUT_MAX_PARALLEL caps the concurrent crews (default CREW_MAX_WORKERS).
+    """
+    with open(sys.argv[1]) as f:
+        segments = json.load(f)
+    output = sys.argv[2] if len(sys.argv) > 2 else "apollo_campaign.json"
+    defaults = {
+        'topic': 'AI LLMs',
+        'current_year': str(datetime.now().year),
+        'limit': 10
+    }
+
+    try:
+        result = run_segments(
+            crew_pool,
+            segments,
+            max_parallel=int(os.getenv("FANOUT_MAX_PARALLEL", str(crew_pool.size))),
+            defaults=defaults,
+            job_id=os.getenv("CREW_JOB_ID")
+        )
     except Exception as e:
-        raise Exception(f"An error occurred while running the crew: {e}")
+        raise Exception(f"An error occurred while running the segments: {e}")
+
+    write_combined(result, output)
+    for segment in result["segments"]:
+        print(segment)
+    print(f"{len(result['contacts'])} contacts ({result['duplicates']} duplicates merged) written to {output}")
 
 
 def train():
@@ -42,17 +109,37 @@ def train():
         "limit": 10
     }
     try:
-        MasumiCrew().crew().train(n_iterations=int(sys.argv[1]), filename=sys.argv[2], inputs=inputs)
+        with crew_pool.lease() as crew:
+            crew.train(n_iterations=int(sys.argv[1]), filename=sys.argv[2], inputs=inputs)
 
     except Exception as e:
         raise Exception(f"An error occurred while training the crew: {e}")
 
 def replay():
     """
-    Replay the crew execution from a specific task.
+    Resume a run by its job id, or replay the crew execution from a specific task.
+
+    A job id from `run` resumes from its first task without a checkpoint:
+    a finished run prints its saved output, an unfinished one runs again with
+    the saved inputs (calls the finished tasks made are answered from the LLM
+    cache). Any other argument is passed to crewai as a task id.
     """
+    checkpoints = get_checkpoint_store()
+    saved = checkpoints.steps(sys.argv[1]) if checkpoints else {}
     try:
-        MasumiCrew().crew().replay(task_id=sys.argv[1])
+        if "inputs" not in saved:
+            with crew_pool.lease() as crew:
+                crew.replay(task_id=sys.argv[1])
+            return
+
+        with crew_pool.lease() as crew:
+            steps = [task_step(index) for index in range(len(crew.tasks))]
+        pending = [index for index, step in enumerate(steps) if step not in saved]
+        if not pending:
+            print(saved[steps[-1]])
+            return
+        print(f"Resuming job {sys.argv[1]} from task {pending[0]}")
+        _kickoff(sys.argv[1], saved["inputs"])
 
     except Exception as e:
         raise Exception(f"An error occurred while replaying the crew: {e}")
@@ -69,7 +156,8 @@ def test():
         "limit": 10
     }
     try:
-        MasumiCrew().crew().test(n_iterations=int(sys.argv[1]), openai_model_name=sys.argv[2], inputs=inputs)
+        with crew_pool.lease() as crew:
+            crew.test(n_iterations=int(sys.argv[1]), openai_model_name=sys.argv[2], inputs=inputs)
 
     except Exception as e:
         raise Exception(f"An error occurred while testing the crew: {e}")
@@ -0,0 +1,187 @@
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import yaml
+
+from crewai import LLM
+
+from masumi_crew.llm_cache import CachedLLM, intercept_call
+from masumi_crew.telemetry import registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_CONFIG = os.path.join(os.path.dirname(__file__), "config", "models.yaml")
+
+# Router settings in a model entry; every other key is an LLM argument
+_ROUTER_KEYS = ("max_concurrency", "queue_timeout")
+
+# Provider errors (litellm, openai, httpx) worth retrying on another model, by class name.
+# crewai's native providers re-raise connection failures as the builtin ConnectionError.
+FALLBACK_ERRORS = (
+    "RateLimitError", "Timeout", "APITimeoutError", "TimeoutError", "ReadTimeout",
+    "APIConnectionError", "ConnectionError", "ServiceUnavailableError", "InternalServerError",
+)
+
+llm_fallbacks = registry.counter(
+    "masumi_llm_fallbacks_total", "LLM calls moved to a fallback model.", ("step", "model", "reason"),
+)
+llm_in_flight = registry.gauge(
+    "masumi_llm_in_flight", "LLM calls currently in flight per model.", ("model",),
+)
+
+
+class ModelBusyError(Exception):
+    """Raised when a model has no free concurrency slot within its queue_timeout."""
+
+
+def should_fall_back(error: BaseException) -> bool:
+    names = {cls.__name__ for cls in type(error).__mro__}
+    return isinstance(error, ModelBusyError) or bool(names.intersection(FALLBACK_ERRORS))
+
+
+class ModelLimiter:
+    """Caps the calls in flight to one model across every crew in the process."""
+
+    def __init__(self, model: str, max_concurrency: int, queue_timeout: Optional[float] = None):
+        self.model = model
+        self.max_concurrency = max(1, max_concurrency)
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, wait: bool = True) -> Iterator[None]:
+        """Holds one slot; with wait=False gives up after queue_timeout."""
+        timeout = None if wait else self.queue_timeout
+        if not self._slots.acquire(timeout=timeout):
+            raise ModelBusyError(f"{self.model}: all {self.max_concurrency} slots busy")
+        with self._lock:
+            self.in_flight += 1
+            llm_in_flight.set(self.in_flight, model=self.model)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                llm_in_flight.set(self.in_flight, model=self.model)
+            self._slots.release()
+
+
+class RoutedLLM:
+    """
+    The calls of one crew step: the step's primary model, limited to its
+    concurrency, with fallbacks tried in order when a call times out, is rate
+    limited, or finds the model saturated. Each model's calls go through its
+    CachedLLM. Like CachedLLM it wraps the primary LLM object rather than
+    subclassing LLM, so routing works with crewai's native provider classes.
+    """
+
+    def __init__(self, step: str, primary: CachedLLM, limiter: ModelLimiter,
+                 fallbacks: List[Tuple[CachedLLM, ModelLimiter]]):
+        self.step = step
+        self.primary = primary
+        self.limiter = limiter
+        self.fallbacks = fallbacks
+
+    def install(self) -> Any:
+        """Routes the primary LLM object's calls through this router and returns it for the crew."""
+        return intercept_call(self.primary.llm, self.call)
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        candidates = [(self.primary, self.limiter)] + self.fallbacks
+        for position, (llm, limiter) in enumerate(candidates):
+            last = position == len(candidates) - 1
+            try:
+                with limiter.slot(wait=last):
+                    return llm.call(messages, tools, callbacks, available_functions, **kwargs)
+            except Exception as e:
+                if last or not should_fall_back(e):
+                    raise
+                logger.warning(f"{self.step}: {limiter.model} failed ({type(e).__name__}), falling back")
+                llm_fallbacks.inc(step=self.step, model=limiter.model, reason=type(e).__name__)
+
+
+class ModelRouter:
+    """
+    Builds the LLM for each crew step from a models/routes config
+    (see config/models.yaml). Limiters are per model name, so every step
+    and crew using a model shares its concurrency cap.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.models: Dict[str, Dict[str, Any]] = config.get("models") or {}
+        self.routes: Dict[str, Dict[str, Any]] = config.get("routes") or {}
+        self._limiters: Dict[str, ModelLimiter] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: str) -> "ModelRouter":
+        with open(path) as f:
+            return cls(yaml.safe_load(f) or {})
+
+    def _spec(self, name: str) -> Dict[str, Any]:
+        if name not in self.models:
+            raise KeyError(f"Unknown model {name!r}; configured models: {sorted(self.models)}")
+        return self.models[name]
+
+    def limiter(self, name: str) -> ModelLimiter:
+        with self._lock:
+            if name not in self._limiters:
+                spec = self._spec(name)
+                self._limiters[name] = ModelLimiter(
+                    spec["model"],
+                    int(spec.get("max_concurrency", 4)),
+                    float(spec.get("queue_timeout", 30)),
+                )
+            return self._limiters[name]
+
+    def _llm_args(self, name: str, **overrides) -> Dict[str, Any]:
+        args = {key: value for key, value in self._spec(name).items() if key not in _ROUTER_KEYS}
+        args.update(overrides)
+        return args
+
+    def _cached(self, name: str, skip_tasks=(), **overrides) -> CachedLLM:
+        args = self._llm_args(name, **overrides)
+        model = args.pop("model")
+        return CachedLLM(LLM(model=model, **args), model, skip_tasks=skip_tasks)
+
+    def llm_for(self, step: str, **overrides) -> Any:
+        """
+        The crewai LLM for step, with its calls routed; overrides (e.g.
+        skip_tasks) go to every model in the chain.
+        """
+        if step not in self.routes:
+            raise KeyError(f"No model route for step {step!r}; configured steps: {sorted(self.routes)}")
+        route = self.routes[step]
+        fallbacks = [
+            (self._cached(name, **overrides), self.limiter(name))
+            for name in route.get("fallbacks") or []
+        ]
+        primary = self._cached(route["model"], **overrides)
+        return RoutedLLM(step, primary, self.limiter(route["model"]), fallbacks).install()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return {
+            limiter.model: {"in_flight": limiter.in_flight, "max_concurrency": limiter.max_concurrency}
+            for limiter in limiters
+        }
+
+
+_model_router: Optional[ModelRouter] = None
+_model_router_lock = threading.Lock()
+
+
+def get_model_router() -> ModelRouter:
+    """Returns the process-wide router, configured by MODEL_CONFIG_PATH (default config/models.yaml)."""
+    global _model_router
+    if _model_router is None:
+        with _model_router_lock:
+            if _model_router is None:
+                _model_router = ModelRouter.from_file(os.getenv("MODEL_CONFIG_PATH") or DEFAULT_MODEL_CONFIG)
+    return _model_router
@@ -0,0 +1,40 @@
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class Contact(BaseModel):
+    """A prospect returned by the Apollo search task, optionally enriched."""
+    model_config = ConfigDict(extra="allow")
+
+    first_name: str = Field(..., min_length=1)
+    last_name: Optional[str] = None
+    organization_name: Optional[str] = None
+    linkedin_url: Optional[str] = None
+    title: Optional[str] = None
+    seniority: Optional[str] = None
+    email: Optional[str] = None
+    description: Optional[str] = None
+
+
+class GeneratedEmail(BaseModel):
+    """One outreach email written by the LLM."""
+    recipient_email: Optional[str] = None
+    subject: str = Field(..., min_length=1)
+    body: str = Field(..., min_length=1)
+
+
+class EmailStatus(BaseModel):
+    """Send result for one recipient of the outreach pipeline."""
+    model_config = ConfigDict(extra="ignore")
+
+    recipient_email: str
+    subject: Optional[str] = None
+    status: str
+    error: Optional[str] = None
+
+
+class JobResult(BaseModel):
+    """Structured result of an Apollo email job, stored as the crew's json_dict."""
+    contacts: List[Contact] = Field(default_factory=list)
+    emails: List[EmailStatus] = Field(default_factory=list)
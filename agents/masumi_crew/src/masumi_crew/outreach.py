@@ -0,0 +1,320 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from composio_crewai import Action
+
+from masumi_crew.checkpoints import CheckpointStore, get_checkpoint_store
+from masumi_crew.governor import RateGovernor, get_governor, is_rate_limit_message
+from masumi_crew.llm_cache import llm_cache_bypass
+from masumi_crew.models import GeneratedEmail
+from masumi_crew.parsing import parse_records
+from masumi_crew.tools.registry import registry
+
+logger = logging.getLogger(__name__)
+
+EMAIL_PROMPT = """
+You are an email outreach specialist writing personalized outreach emails.
+
+Campaign: {pitch}
+
+Write one email for EACH of the following contacts. Every email must include:
+1. Their name and company
+2. A brief introduction
+3. The value proposition
+4. A clear call to action
+
+Contacts (JSON):
+{contacts}
+
+Return ONLY a JSON array with exactly one object per contact, each with the
+contact's email address as recipient_email:
+[{{"recipient_email": "...", "subject": "...", "body": "<html body>"}}]
+"""
+
+
+def is_sendable(email: Optional[str]) -> bool:
+    """Skips missing addresses and Apollo's placeholder for locked emails."""
+    return bool(email) and "@" in email and "not_unlocked" not in email
+
+
+def normalize_email(email: str) -> str:
+    return email.strip().lower()
+
+
+def idempotency_key(job_id: str, recipient_email: str) -> str:
+    """A job sends at most one email per recipient, so the key ignores subject and body."""
+    return hashlib.sha256(f"{job_id}|{normalize_email(recipient_email)}".encode()).hexdigest()
+
+
+# Errors that show the email never left: refused by the governor's quota,
+# rejected by Composio before the request, or a connection that never opened.
+# Any other error may come after Gmail accepted the email. By class name, as
+# they come from several client libraries.
+UNSENT_ERRORS = ("QuotaExceededError", "InvalidParams", "ValidationError", "ConnectTimeout")
+
+
+def sent_nothing(error: Exception) -> bool:
+    """True if error proves the send never reached Gmail, so trying again cannot duplicate it."""
+    names = {cls.__name__ for cls in type(error).__mro__}
+    if names.intersection(UNSENT_ERRORS):
+        return True
+    # A 4xx answer rejects the request as a whole
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return isinstance(status, int) and 400 <= status < 500
+
+
+# Send states that must never lead to another send: "sending" belongs to a
+# send in progress, "in_doubt" to one that stopped before its outcome was known
+SETTLED_STATUSES = ("sent", "sending", "in_doubt")
+
+
+class SendLog:
+    """
+    Durable per-recipient send records.
+
+    A send is claimed atomically under its idempotency key before the Gmail
+    call and recorded again after it, so neither a retried job nor a second
+    worker emails the same person twice. A claim still "sending" after
+    in_doubt_after seconds belongs to a worker that died mid-send: Gmail may
+    have delivered it, so it is marked "in_doubt" and never sent again
+    automatically.
+    """
+
+    def __init__(self, path: str = "outreach.db", in_doubt_after: float = 300):
+        self.path = path
+        self.in_doubt_after = in_doubt_after
+        self._local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS sends ("
+            " idempotency_key TEXT PRIMARY KEY, job_id TEXT NOT NULL, recipient_email TEXT NOT NULL,"
+            " subject TEXT, status TEXT NOT NULL, error TEXT, updated_at REAL NOT NULL)"
+        )
+        self._connect().execute("CREATE INDEX IF NOT EXISTS idx_sends_job_id ON sends(job_id)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute("SELECT * FROM sends WHERE idempotency_key = ?", (key,)).fetchone()
+        return dict(row) if row else None
+
+    def claim(self, key: str, job_id: str, recipient_email: str,
+              subject: Optional[str]) -> Tuple[bool, Dict[str, Any]]:
+        """Takes the right to send under key; returns (claimed, current record)."""
+        now = time.time()
+        conn = self._connect()
+        claimed = conn.execute(
+            "INSERT INTO sends (idempotency_key, job_id, recipient_email, subject, status, error, updated_at)"
+            " VALUES (?, ?, ?, ?, 'sending', NULL, ?) ON CONFLICT(idempotency_key) DO NOTHING",
+            (key, job_id, recipient_email, subject, now),
+        ).rowcount
+        if not claimed:
+            # A send that failed may be tried again, by exactly one caller
+            claimed = conn.execute(
+                "UPDATE sends SET status = 'sending', subject = ?, error = NULL, updated_at = ?"
+                " WHERE idempotency_key = ? AND status = 'failed'",
+                (subject, now, key),
+            ).rowcount
+        if claimed:
+            return True, self.get(key)
+        return False, self.settled(key)
+
+    def settled(self, key: str) -> Optional[Dict[str, Any]]:
+        """The record under key if its email must not be sent again, else None."""
+        now = time.time()
+        self._connect().execute(
+            "UPDATE sends SET status = 'in_doubt', updated_at = ?"
+            " WHERE idempotency_key = ? AND status = 'sending' AND updated_at < ?",
+            (now, key, now - self.in_doubt_after),
+        )
+        record = self.get(key)
+        return record if record and record["status"] in SETTLED_STATUSES else None
+
+    def record(self, key: str, job_id: str, recipient_email: str, subject: Optional[str],
+               status: str, error: Optional[str] = None) -> Dict[str, Any]:
+        record = {
+            "idempotency_key": key,
+            "job_id": job_id,
+            "recipient_email": recipient_email,
+            "subject": subject,
+            "status": status,
+            "error": error,
+            "updated_at": time.time(),
+        }
+        self._connect().execute(
+            "INSERT OR REPLACE INTO sends (idempotency_key, job_id, recipient_email, subject, status, error, updated_at)"
+            " VALUES (:idempotency_key, :job_id, :recipient_email, :subject, :status, :error, :updated_at)",
+            record,
+        )
+        return record
+
+    def for_job(self, job_id: str) -> List[Dict[str, Any]]:
+        rows = self._connect().execute("SELECT * FROM sends WHERE job_id = ? ORDER BY updated_at", (job_id,))
+        return [dict(row) for row in rows]
+
+
+def _fallback_email(contact: Dict[str, Any], pitch: str) -> Dict[str, Any]:
+    name = contact.get("first_name") or "there"
+    company = contact.get("organization_name") or "your company"
+    return {
+        "recipient_email": contact.get("email"),
+        "subject": f"Quick intro for {company}",
+        "body": f"<p>Hi {name},</p><p>{pitch}</p><p>Would you be open to a short call next week?</p>",
+    }
+
+
+class OutreachPipeline:
+    """
+    Deterministic replacement for the agent-driven Gmail loop.
+
+    Email bodies are written in batched LLM calls (many contacts per prompt)
+    and sent concurrently through Composio's GMAIL_SEND_EMAIL action, paced by
+    the rate governor's "gmail" limits and daily quota, which every job shares. Each recipient gets an idempotent send record, and
+    the written emails are checkpointed so a retried job resends the same copy
+    instead of writing it again.
+    """
+
+    def __init__(
+        self,
+        llm: Any,
+        send_log: Optional[SendLog] = None,
+        batch_size: int = 10,
+        max_workers: int = 4,
+        governor: Optional[RateGovernor] = None,
+        checkpoints: Optional[CheckpointStore] = None,
+    ):
+        self.llm = llm
+        self.send_log = send_log or SendLog(os.getenv("OUTREACH_DB_PATH", "outreach.db"))
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.governor = governor or get_governor()
+        self.checkpoints = checkpoints or get_checkpoint_store()
+
+    def _write_batch(self, contacts: List[Dict[str, Any]], pitch: str) -> List[Dict[str, Any]]:
+        prompt = EMAIL_PROMPT.format(pitch=pitch, contacts=json.dumps(contacts, indent=1))
+        try:
+            # Email copy should stay fresh per run, so this step opts out of the LLM cache
+            with llm_cache_bypass():
+                response = self.llm.call([{"role": "user", "content": prompt}])
+            emails, _ = parse_records(response, GeneratedEmail)
+        except Exception as e:
+            logger.warning(f"Email generation failed for {len(contacts)} contacts: {e}")
+            emails = []
+        # Drafts are matched by address, not position: the model may reorder,
+        # drop or merge entries. Contacts without a draft get the generic email.
+        drafts: Dict[str, GeneratedEmail] = {}
+        for email in emails:
+            if email.recipient_email:
+                drafts.setdefault(normalize_email(email.recipient_email), email)
+        written = []
+        for contact in contacts:
+            draft = drafts.get(normalize_email(contact.get("email") or ""))
+            if draft is None:
+                written.append(_fallback_email(contact, pitch))
+            else:
+                # The contact list is the source of truth for who gets emailed
+                written.append({**draft.model_dump(), "recipient_email": contact.get("email")})
+        return written
+
+    def write_emails(self, contacts: List[Dict[str, Any]], pitch: str) -> List[Dict[str, Any]]:
+        """Generates one email per contact, batch_size contacts per LLM call."""
+        batches = [contacts[i:i + self.batch_size] for i in range(0, len(contacts), self.batch_size)]
+        if not batches:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as pool:
+            results = pool.map(lambda batch: self._write_batch(batch, pitch), batches)
+            return [email for batch in results for email in batch]
+
+    def _drafts(self, job_id: str, contacts: List[Dict[str, Any]], pitch: str) -> List[Dict[str, Any]]:
+        """Emails for contacts, reusing the ones an earlier attempt of this job already wrote."""
+        if self.checkpoints is None:
+            return self.write_emails(contacts, pitch)
+        drafts = self.checkpoints.get(job_id, "emails_written") or {}
+        missing = [contact for contact in contacts if contact["email"] not in drafts]
+        if missing:
+            drafts.update((email["recipient_email"], email) for email in self.write_emails(missing, pitch))
+            self.checkpoints.save(job_id, "emails_written", drafts)
+        return [drafts[contact["email"]] for contact in contacts]
+
+    def _send(self, job_id: str, email: Dict[str, Any]) -> Dict[str, Any]:
+        recipient = email["recipient_email"]
+        key = idempotency_key(job_id, recipient)
+        claimed, record = self.send_log.claim(key, job_id, recipient, email.get("subject"))
+        if not claimed:
+            # Sent, being sent or in doubt; or a send that failed in between, which a later attempt retries
+            return record or self.send_log.get(key)
+        try:
+            with self.governor.limit("gmail"):
+                response = registry.toolset.execute_action(
+                    action=Action.GMAIL_SEND_EMAIL,
+                    params={
+                        "user_id": "me",
+                        "recipient_email": recipient,
+                        "subject": email.get("subject", ""),
+                        "body": email.get("body", ""),
+                        "is_html": True,
+                    },
+                )
+        except Exception as e:
+            # A quota or validation error sent nothing, and a retry of the job may
+            # send it; after a timeout or dropped connection Gmail may already
+            # have delivered it, so the send is in doubt and never repeated
+            status = "failed" if sent_nothing(e) else "in_doubt"
+            return self.send_log.record(key, job_id, recipient, email.get("subject"), status, str(e))
+
+        if response.get("successful", response.get("successfull")):
+            return self.send_log.record(key, job_id, recipient, email.get("subject"), "sent")
+        error = str(response.get("error") or "Gmail send failed")
+        if is_rate_limit_message(error):
+            self.governor.backoff("gmail")
+        return self.send_log.record(key, job_id, recipient, email.get("subject"), "failed", error)
+
+    def run(
+        self,
+        job_id: str,
+        contacts: List[Dict[str, Any]],
+        pitch: str,
+        on_status: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Writes and sends outreach emails; returns one status record per recipient address."""
+        # Contacts sharing an address (in any case) get one email
+        recipients: Dict[str, Dict[str, Any]] = {}
+        for contact in contacts:
+            if is_sendable(contact.get("email")):
+                recipients.setdefault(normalize_email(contact["email"]), contact)
+
+        # Recipients an earlier attempt of this job emailed, or may have, need no new copy
+        statuses: Dict[str, Dict[str, Any]] = {}
+        unsent = []
+        for address, contact in recipients.items():
+            existing = self.send_log.settled(idempotency_key(job_id, address))
+            if existing:
+                statuses[address] = existing
+            else:
+                unsent.append(contact)
+
+        def send(email):
+            status = self._send(job_id, email)
+            if on_status:
+                on_status(status)
+            return status
+
+        emails = self._drafts(job_id, unsent, pitch)
+        if emails:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(emails))) as pool:
+                for status in pool.map(send, emails):
+                    statuses[normalize_email(status["recipient_email"])] = status
+        return [statuses[address] for address in recipients if address in statuses]
@@ -0,0 +1,210 @@
+import json
+import re
+from typing import Any, Iterable, Iterator, List, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+from masumi_crew.models import Contact
+
+T = TypeVar("T", bound=BaseModel)
+
+# Characters that can change the scanner's state; everything else is skipped in bulk
+_SPECIAL = re.compile(r'[{}"\'\\]')
+
+# Opening quote -> the quotes that close it, for strings written by LLMs
+_CLOSING_QUOTES = {'"': '"', "“": "”\"", "'": "'", "‘": "’'"}
+_WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_PY_LITERALS = {"None": "null", "True": "true", "False": "false"}
+# Characters a JSON string cannot hold as written
+_STRING_ESCAPES = {'"': '\\"', "\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
+class RecordStream:
+    """
+    Incrementally splits text into top-level JSON objects.
+
+    Feed it chunks as they arrive (for example from a streaming LLM response)
+    and it yields the source of every object as soon as its closing brace is
+    seen. Prose, code fences and array brackets around the objects are ignored.
+    """
+
+    def __init__(self):
+        self._pending = ""
+        self._pos = 0
+        self._depth = 0
+        self._quote: Optional[str] = None
+
+    def feed(self, chunk: str) -> Iterator[str]:
+        text = chunk
+        while text:
+            if self._depth == 0:
+                start = text.find("{")
+                if start < 0:
+                    return
+                self._pending, self._pos, self._depth = "", 1, 1
+                text = text[start:]
+                self._pending = text
+            else:
+                self._pending += text
+            text = ""
+
+            while True:
+                match = _SPECIAL.search(self._pending, self._pos)
+                if match is None:
+                    self._pos = len(self._pending)
+                    break
+                char, self._pos = match.group(), match.end()
+                if char == "\\":
+                    # Skip the escaped character; wait for it if it has not arrived yet
+                    if self._pos >= len(self._pending):
+                        self._pos -= 1
+                        break
+                    self._pos += 1
+                elif self._quote:
+                    if char == self._quote:
+                        self._quote = None
+                elif char in "\"'":
+                    self._quote = char
+                elif char == "{":
+                    self._depth += 1
+                else:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        record, text = self._pending[:self._pos], self._pending[self._pos:]
+                        self._pending, self._pos = "", 0
+                        yield record
+                        break
+
+
+def _repair(source: str) -> str:
+    """
+    Rewrites LLM-style JSON into strict JSON in one pass. Repairs apply only
+    outside string literals, so string values are never rewritten: smart and
+    single quotes delimiting strings become double quotes, unquoted keys are
+    quoted, None/True/False become JSON literals and trailing commas are dropped.
+    """
+    out: List[str] = []
+    last = ""  # last significant character written outside a string
+    pos, end = 0, len(source)
+    while pos < end:
+        char = source[pos]
+        if char in _CLOSING_QUOTES:
+            closing = _CLOSING_QUOTES[char]
+            pos += 1
+            value: List[str] = []
+            while pos < end and source[pos] not in closing:
+                if source[pos] == "\\" and pos + 1 < end:
+                    # \' is not a JSON escape; every other escape is kept as written
+                    escaped = source[pos + 1]
+                    value.append("'" if escaped == "'" else source[pos:pos + 2])
+                    pos += 2
+                    continue
+                value.append(_STRING_ESCAPES.get(source[pos], source[pos]))
+                pos += 1
+            out.append('"' + "".join(value) + '"')
+            last = '"'
+            pos += 1
+            continue
+        word = _WORD.match(source, pos) if char.isalpha() or char == "_" else None
+        if word is not None:
+            pos = word.end()
+            rest = source[pos:].lstrip()
+            if last in "{," and rest.startswith(":"):
+                out.append(f'"{word.group()}"')
+            else:
+                out.append(_PY_LITERALS.get(word.group(), word.group()))
+            last = word.group()[-1]
+            continue
+        if char == ",":
+            rest = source[pos + 1:].lstrip()
+            if rest[:1] in ("}", "]"):
+                pos += 1
+                continue
+        out.append(char)
+        if not char.isspace():
+            last = char
+        pos += 1
+    return "".join(out)
+
+
+def repair_json(source: str) -> Any:
+    """Parses one JSON object, repairing the formatting mistakes LLMs commonly make."""
+    try:
+        return json.loads(source)
+    except ValueError:
+        return json.loads(_repair(source))
+
+
+def _validate(data: Any, model: Type[T], records: List[T], errors: List[str]) -> None:
+    if isinstance(data, list):
+        for item in data:
+            _validate(item, model, records, errors)
+        return
+    if not isinstance(data, dict):
+        errors.append(f"Expected an object, got {type(data).__name__}")
+        return
+    try:
+        records.append(model.model_validate(data))
+        return
+    except ValidationError as e:
+        error = str(e)
+    # A wrapper such as {"data": {"people": [...]}}: look for nested records instead
+    nested = [value for value in data.values() if isinstance(value, (list, dict))]
+    if not nested:
+        errors.append(error)
+        return
+    before = len(records)
+    for value in nested:
+        _validate(value, model, records, [])
+    if len(records) == before:
+        errors.append(error)
+
+
+def iter_records(chunks: Iterable[str], model: Type[T], errors: Optional[List[str]] = None) -> Iterator[T]:
+    """Yields each record from a stream of text chunks as soon as it parses and validates."""
+    stream = RecordStream()
+    for chunk in chunks:
+        for source in stream.feed(chunk):
+            try:
+                data = repair_json(source)
+            except ValueError as e:
+                if errors is not None:
+                    errors.append(f"Unparseable record: {e}")
+                continue
+            records: List[T] = []
+            _validate(data, model, records, errors if errors is not None else [])
+            yield from records
+
+
+def parse_records(output: Any, model: Type[T]) -> Tuple[List[T], List[str]]:
+    """
+    Extracts every valid record from text, a parsed JSON value or a task
+    output. Returns (records, errors) so callers can decide whether to re-ask.
+    """
+    errors: List[str] = []
+    output = getattr(output, "raw", output)
+    if isinstance(output, (list, dict)):
+        records: List[T] = []
+        _validate(output, model, records, errors)
+        return records, errors
+    return list(iter_records([str(output)], model, errors)), errors
+
+
+def parse_contacts(output: Any) -> List[Contact]:
+    return parse_records(output, Contact)[0]
+
+
+def contacts_guardrail(output: Any) -> Tuple[bool, Any]:
+    """
+    Task guardrail for the Apollo search task. Normalizes the output to a
+    clean JSON array of contacts, or asks the agent to try again (bounded by
+    the task's retry limit) when no valid contact could be parsed.
+    """
+    contacts, errors = parse_records(output, Contact)
+    if not contacts:
+        detail = errors[0] if errors else "no JSON objects found"
+        return False, (
+            "Your answer did not contain any valid contacts "
+            f"({detail}). Return ONLY a JSON array of contact objects with at least a first_name."
+        )
+    return True, json.dumps([contact.model_dump(exclude_none=True) for contact in contacts])
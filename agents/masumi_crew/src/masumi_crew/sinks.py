@@ -0,0 +1,65 @@
+import json
+import os
+import threading
+from typing import Any, Dict, Iterator, Optional, TextIO
+
+
+class JsonlSink:
+    """
+    Appends records to a JSON Lines file as they are produced, one compact
+    line each, so a long prospect list is never held or serialized whole.
+    Safe to share between threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.written = 0
+        self._file: Optional[TextIO] = None
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, separators=(",", ":"), default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                # Line buffered: each record reaches the file as soon as it is written
+                self._file = open(self.path, "a", buffering=1, encoding="utf-8")
+            self._file.write(line)
+            self.written += 1
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def read(self, **tags: Any) -> Iterator[Dict[str, Any]]:
+        """Yields the records in the file whose fields equal tags, e.g. the records of one job."""
+        self.flush()
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # The torn last line of a writer that crashed mid-record
+                    continue
+                if all(record.get(key) == value for key, value in tags.items()):
+                    yield record
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_sinks: Dict[str, JsonlSink] = {}
+_sinks_lock = threading.Lock()
+
+
+def get_jsonl_sink(path: str) -> JsonlSink:
+    """Returns the process-wide sink for path, so concurrent crews never interleave partial lines."""
+    with _sinks_lock:
+        if path not in _sinks:
+            _sinks[path] = JsonlSink(path)
+        return _sinks[path]
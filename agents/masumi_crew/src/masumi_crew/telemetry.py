@@ -0,0 +1,325 @@
+import bisect
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Stage durations range from sub-millisecond cache hits to multi-minute crew runs
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in sorted(values.items())]
+
+
+class Gauge(_Metric):
+    """A gauge that is either set directly or read from a callback at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._function = function
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            return [f"{self.name} {self._function()}"]
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> (per-bucket counts, sum, count)
+        self._values: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = {key: (list(state[0]), state[1], state[2]) for key, state in self._values.items()}
+        lines = []
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Prometheus text exposition format, version 0.0.4."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+registry = Registry()
+
+stage_duration = registry.histogram(
+    "masumi_stage_duration_seconds",
+    "Duration of each job stage (payment, crew, task, tool, llm, enrichment) and of start-up steps.",
+    ("stage", "name", "outcome"),
+)
+stage_retries = registry.counter(
+    "masumi_stage_retries_total", "Retries made inside a stage.", ("stage", "name"),
+)
+stage_tokens = registry.counter(
+    "masumi_stage_tokens_total", "LLM tokens used inside a stage.", ("stage", "name", "kind"),
+)
+
+
+def _token_counts(usage: Any) -> Dict[str, int]:
+    if usage is None:
+        return {}
+    counts = {}
+    for kind in ("prompt_tokens", "completion_tokens", "cached_prompt_tokens"):
+        count = usage.get(kind) if isinstance(usage, dict) else getattr(usage, kind, None)
+        if count:
+            counts[kind] = count
+    return counts
+
+
+class Span:
+    """One timed stage. Set outcome, retries or tokens on it before it ends."""
+
+    def __init__(self, stage: str, name: str = "", **attributes):
+        self.stage = stage
+        self.name = name
+        self.attributes = attributes
+        self.outcome = "ok"
+        self.retries = 0
+        self.tokens: Dict[str, int] = {}
+        self.started = time.perf_counter()
+        self.duration: Optional[float] = None
+
+    def add_usage(self, usage: Any) -> None:
+        """Adds a crewai UsageMetrics (or a dict with the same fields) to the span's token counts."""
+        for kind, count in _token_counts(usage).items():
+            self.tokens[kind] = self.tokens.get(kind, 0) + count
+
+    def finish(self) -> None:
+        self.duration = time.perf_counter() - self.started
+        record(self.stage, self.name, self.duration, self.outcome, self.retries)
+        for kind, count in self.tokens.items():
+            if count:
+                stage_tokens.inc(count, stage=self.stage, name=self.name, kind=kind)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps({
+                "span": self.stage,
+                "name": self.name,
+                "duration": round(self.duration, 4),
+                "outcome": self.outcome,
+                "retries": self.retries,
+                "tokens": self.tokens,
+                **self.attributes,
+            }, default=str))
+
+
+@contextmanager
+def span(stage: str, name: str = "", **attributes) -> Iterator[Span]:
+    """Times the enclosed block as one stage; an exception marks the outcome "error"."""
+    current = Span(stage, name, **attributes)
+    try:
+        yield current
+    except BaseException:
+        current.outcome = "error"
+        raise
+    finally:
+        current.finish()
+
+
+def record(stage: str, name: str, seconds: float, outcome: str = "ok", retries: int = 0) -> None:
+    """Records a stage that was timed elsewhere, e.g. from crewai event timestamps."""
+    stage_duration.observe(max(0.0, seconds), stage=stage, name=name, outcome=outcome)
+    if retries:
+        stage_retries.inc(retries, stage=stage, name=name)
+
+
+_crewai_listeners_installed = False
+
+
+def install_crewai_listeners() -> None:
+    """
+    Records task, tool and LLM call spans from crewai's event bus, with the
+    tokens each LLM call reports. Safe to call more than once; does nothing
+    if the installed crewai has no event bus.
+    """
+    global _crewai_listeners_installed
+    if _crewai_listeners_installed:
+        return
+    try:
+        from crewai.utilities.events import (
+            crewai_event_bus, TaskStartedEvent, TaskCompletedEvent, TaskFailedEvent,
+            ToolUsageFinishedEvent, ToolUsageErrorEvent,
+            LLMCallStartedEvent, LLMCallCompletedEvent, LLMCallFailedEvent,
+        )
+    except ImportError:
+        try:
+            from crewai.events import (
+                crewai_event_bus, TaskStartedEvent, TaskCompletedEvent, TaskFailedEvent,
+                ToolUsageFinishedEvent, ToolUsageErrorEvent,
+                LLMCallStartedEvent, LLMCallCompletedEvent, LLMCallFailedEvent,
+            )
+        except ImportError:
+            logger.warning("crewai event bus not available; task and tool spans are disabled")
+            return
+    _crewai_listeners_installed = True
+    task_started: Dict[int, float] = {}
+    llm_started: Dict[Any, float] = {}
+
+    def task_name(task) -> str:
+        return getattr(task, "name", None) or (getattr(task, "description", "") or "").strip()[:40]
+
+    @crewai_event_bus.on(TaskStartedEvent)
+    def on_task_started(source, event):
+        task_started[id(source)] = time.perf_counter()
+
+    def on_task_finished(source, outcome):
+        started = task_started.pop(id(source), None)
+        if started is not None:
+            record("task", task_name(source), time.perf_counter() - started, outcome)
+
+    @crewai_event_bus.on(TaskCompletedEvent)
+    def on_task_completed(source, event):
+        on_task_finished(source, "ok")
+
+    @crewai_event_bus.on(TaskFailedEvent)
+    def on_task_failed(source, event):
+        on_task_finished(source, "error")
+
+    def tool_seconds(event) -> float:
+        started, finished = getattr(event, "started_at", None), getattr(event, "finished_at", None)
+        return (finished - started).total_seconds() if started and finished else 0.0
+
+    @crewai_event_bus.on(ToolUsageFinishedEvent)
+    def on_tool_finished(source, event):
+        outcome = "cache_hit" if getattr(event, "from_cache", False) else "ok"
+        retries = max(0, (getattr(event, "run_attempts", 1) or 1) - 1)
+        record("tool", event.tool_name, tool_seconds(event), outcome, retries)
+
+    @crewai_event_bus.on(ToolUsageErrorEvent)
+    def on_tool_error(source, event):
+        retries = max(0, (getattr(event, "run_attempts", 1) or 1) - 1)
+        record("tool", event.tool_name, tool_seconds(event), "error", retries)
+
+    def llm_call(source, event):
+        # call_id pairs the events of one call; older crewai versions only have the LLM object
+        return getattr(event, "call_id", None) or id(source)
+
+    @crewai_event_bus.on(LLMCallStartedEvent)
+    def on_llm_started(source, event):
+        llm_started[llm_call(source, event)] = time.perf_counter()
+
+    def on_llm_finished(source, event, outcome):
+        model = getattr(event, "model", None) or getattr(source, "model", None) or "unknown"
+        started = llm_started.pop(llm_call(source, event), None)
+        if started is not None:
+            record("llm", model, time.perf_counter() - started, outcome)
+        for kind, count in _token_counts(getattr(event, "usage", None)).items():
+            stage_tokens.inc(count, stage="llm", name=model, kind=kind)
+
+    @crewai_event_bus.on(LLMCallCompletedEvent)
+    def on_llm_completed(source, event):
+        on_llm_finished(source, event, "ok")
+
+    @crewai_event_bus.on(LLMCallFailedEvent)
+    def on_llm_failed(source, event):
+        on_llm_finished(source, event, "error")
@@ -2,7 +2,16 @@ from crewai.tools import BaseTool
 from typing import Type, List, Dict, Any, Optional
 from pydantic import BaseModel, Field
 import json
-from composio_crewai import ComposioToolSet, App
+import logging
+from composio_crewai import App
+from masumi_crew.models import Contact
+from masumi_crew.governor import get_governor
+from masumi_crew.parsing import parse_records
+from masumi_crew.telemetry import span
+from masumi_crew.tools.enrichment import get_enricher
+from masumi_crew.tools.registry import get_tools
+
+logger = logging.getLogger(__name__)
 
 
 class ApolloSearchInput(BaseModel):
@@ -18,148 +27,61 @@ class ApolloSearchTool(BaseTool):
         "investors, or decision-makers in specific industries or companies."
     )
     args_schema: Type[BaseModel] = ApolloSearchInput
+    # Optional sink (e.g. a JsonlSink) that receives each enriched contact as it
+    # is produced. The full list then lives only in the sink; the agent sees the
+    # first preview_size contacts and the total.
+    sink: Optional[Any] = None
+    # Fields added to every record written to the sink, e.g. the job and
+    # segment that produced it, so a reader can pick its records out again
+    record_tags: Dict[str, Any] = Field(default_factory=dict)
+    preview_size: int = 25
+    max_search_attempts: int = 2
 
     def _run(self, query: str, limit: int = 3) -> str:
-        # Initialize the Apollo toolset
-        toolset = ComposioToolSet()
-        tools = toolset.get_tools(apps=[App.APOLLO])
+        # Reuse the Apollo tools cached in the shared registry
+        tools = get_tools(App.APOLLO)
         
         # Use the Apollo search tool
         apollo_tool = tools[0]  # Assuming the first tool is the search tool
         
-        # Execute the search
-        result = apollo_tool.run(query=query, limit=limit)
-        
-        # Apollo API key for enrichment
-        api_key = ""
+        # Execute the search and validate each returned person as a Contact.
+        # If nothing usable comes back, search again a bounded number of times.
+        with span("tool", apollo_tool.name) as search_span:
+            for attempt in range(self.max_search_attempts):
+                search_span.retries = attempt
+                # Searches share Apollo's rate limit and backoff with enrichment
+                with get_governor().limit("apollo"):
+                    result = apollo_tool.run(query=query, limit=limit)
+                contacts, errors = parse_records(result, Contact)
+                if contacts:
+                    break
+                logger.warning(f"No valid contacts in Apollo results (attempt {attempt + 1}): {errors[:1]}")
+            else:
+                # Tell the agent what went wrong instead of silently returning []
+                search_span.outcome = "empty"
+                return json.dumps({
+                    "error": "Apollo returned no parseable contacts. Try a simpler query.",
+                    "contacts": []
+                })
+
+        initial_contacts = [contact.model_dump(exclude_none=True) for contact in contacts]
+        logger.info(f"Apollo search returned {len(initial_contacts)} contacts, enriching")
 
-        # Endpoint for people match
-        url = "https://api.apollo.io/api/v1/people/match?reveal_personal_emails=true"
+        # Enrich the contacts concurrently using the Apollo people match API
+        if self.sink is None:
+            return json.dumps(get_enricher().enrich(initial_contacts))
 
-        # Set up headers
-        headers = {
-            "accept": "application/json",
-            "cache-control": "no-cache",
-            "content-type": "application/json",
-            "x-api-key": api_key
-        }
+        preview = []
 
-        # Parse the initial results
-        try:
-            # Try to parse the result as JSON
-            initial_contacts = json.loads(str(result))
-            print("\nInitial Apollo Search Results (JSON):\n")
-            print(json.dumps(initial_contacts, indent=2))
-            
-            # Enrich each contact using the Apollo people match API
-            enriched_contacts = []
-            
-            for contact in initial_contacts:
-                full_name = f"{contact.get('first_name', '')} {contact.get('last_name', '')}"
-                organization = contact.get('organization_name', '')
-                
-                # Prepare domain - handle possible None values
-                if organization:
-                    # Extract domain from organization name more carefully
-                    domain_parts = organization.lower().split()
-                    if len(domain_parts) > 0:
-                        domain = domain_parts[0].replace(",", "").replace(".", "")
-                        if domain:  # Only add .com if we have a domain
-                            domain += ".com"
-                    else:
-                        domain = ""
-                else:
-                    domain = ""
-                
-                # Create payload for Apollo people match API
-                payload = {"name": full_name}
-                
-                # Only add domain if we have a non-empty one
-                if domain:
-                    payload["domain"] = domain
-                    
-                # Add organization if available
-                if organization:
-                    payload["organization_name"] = organization
-                
-                try:
-                    # Call Apollo people match API with retry logic
-                    max_retries = 3
-                    for retry in range(max_retries):
-                        try:
-                            response = requests.post(url, headers=headers, json=payload)
-                            if response.status_code == 200:
-                                match_result = response.json()
-                                break
-                            elif response.status_code == 429:  # Rate limit
-                                wait_time = min(2 ** retry, 8)  # Exponential backoff
-                                print(f"Rate limited. Waiting {wait_time} seconds before retry.")
-                                time.sleep(wait_time)
-                            else:
-                                print(f"API error: {response.status_code} - {response.text}")
-                                if retry == max_retries - 1:
-                                    match_result = {"person": None}
-                                else:
-                                    time.sleep(1)
-                        except Exception as e:
-                            print(f"Request error: {e}")
-                            if retry == max_retries - 1:
-                                match_result = {"person": None}
-                            else:
-                                time.sleep(1)
-                    
-                    # Combine original contact with enriched data
-                    enriched_contact = contact.copy()
-                    
-                    # Extract relevant fields from API response
-                    if match_result.get('person'):
-                        person_data = match_result.get('person', {})
-                        
-                        # Add enriched data to the contact
-                        enriched_contact['email'] = person_data.get('email')
-                        enriched_contact['phone'] = person_data.get('phone')
-                        enriched_contact['title'] = person_data.get('title')
-                        enriched_contact['seniority'] = person_data.get('seniority')
-                        enriched_contact['personal_emails'] = person_data.get('personal_emails')
-                        enriched_contact['city'] = person_data.get('city')
-                        enriched_contact['state'] = person_data.get('state')
-                        enriched_contact['country'] = person_data.get('country')
-                        
-                        # Add company information if available
-                        if person_data.get('organization'):
-                            org_data = person_data.get('organization', {})
-                            enriched_contact['company_size'] = org_data.get('size')
-                            enriched_contact['company_industry'] = org_data.get('industry')
-                            enriched_contact['company_website'] = org_data.get('website_url')
-                    
-                    enriched_contacts.append(enriched_contact)
-                    print(f"Enriched contact: {full_name}")
-                    
-                except Exception as e:
-                    print(f"Error enriching contact {full_name}: {e}")
-                    # If enrichment fails, add the original contact
-                    enriched_contacts.append(contact)
-            
-            # Print the final enriched contacts
-            return json.dumps(enriched_contacts, indent=2)
-            
-        except json.JSONDecodeError as e:
-            # If the result isn't valid JSON, print the raw result
-            print(f"\nResult was not in valid JSON format: {e}. Raw result:")
-            print(result)
-            
-            # Try to extract JSON using regex as a fallback
-            import re
-            json_pattern = r'\[\s*\{.*\}\s*\]'
-            json_match = re.search(json_pattern, str(result), re.DOTALL)
-            
-            if json_match:
-                try:
-                    json_str = json_match.group(0)
-                    parsed_result = json.loads(json_str)
-                    print("\nExtracted JSON successfully but could not enrich contacts:")
-                    print(json.dumps(parsed_result, indent=2))
-                except json.JSONDecodeError:
-                    print("Extracted text is not valid JSON")
+        def stream(contact):
+            self.sink.write({**contact, **self.record_tags})
+            if len(preview) < self.preview_size:
+                preview.append(contact)
 
-            return json.dumps([], indent=2)
\ No newline at end of file
+        get_enricher().enrich(initial_contacts, on_contact=stream, collect=False)
+        self.sink.flush()
+        return json.dumps({
+            "contacts": preview,
+            "total": len(initial_contacts),
+            "written_to": getattr(self.sink, "path", None)
+        })
@@ -0,0 +1,158 @@
+import re
+import sqlite3
+import threading
+import time
+from difflib import SequenceMatcher
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from masumi_crew.telemetry import registry
+
+# Legal-form words that vary between records of the same organization
+_LEGAL_SUFFIXES = re.compile(
+    r"\b(the|inc|incorporated|llc|llp|ltd|limited|gmbh|ag|sa|bv|plc|corp|corporation|co|company)\b"
+)
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+# How much each source of a domain is trusted. Apollo's own match result is
+# authoritative; a website on a search result is usually right.
+SOURCE_CONFIDENCE = {"enrichment": 1.0, "search": 0.9}
+
+domain_lookups = registry.counter(
+    "masumi_domain_lookups_total", "Organization domain lookups before Apollo match calls.", ("outcome",),
+)
+
+
+def normalize_org(name: Optional[str]) -> str:
+    """Lower-cases an organization name and drops punctuation and legal-form words."""
+    name = _NON_ALNUM.sub(" ", (name or "").lower())
+    return " ".join(_LEGAL_SUFFIXES.sub(" ", name).split())
+
+
+def domain_from_url(url: Optional[str]) -> Optional[str]:
+    """Bare host of a website URL (example.com for https://www.example.com/about), or None."""
+    url = (url or "").strip().lower()
+    if not url:
+        return None
+    host = urlparse(url if "//" in url else f"//{url}").hostname or ""
+    host = re.sub(r"^www\d*\.", "", host)
+    return host if "." in host else None
+
+
+def organization_website(contact: Dict[str, Any]) -> Optional[str]:
+    """The organization website on a search result or enriched contact, if it has one."""
+    organization = contact.get("organization")
+    if isinstance(organization, dict):
+        website = organization.get("website_url") or organization.get("primary_domain")
+        if website:
+            return website
+    return contact.get("company_website") or contact.get("organization_website_url")
+
+
+class DomainIndex:
+    """
+    On-disk index of organization name -> website domain.
+
+    It learns from Apollo match results (organization.website_url) and from
+    search results that carry a website, and is consulted before each match
+    call. Names are normalized; a name that is not in the index is compared
+    with the entries sharing its first word, and the closest one above
+    fuzzy_threshold is used. lookup() returns the domain with a confidence
+    so callers can leave out domains they are not sure of.
+    """
+
+    def __init__(self, path: str = "domain_index.db", fuzzy_threshold: float = 0.88):
+        self.path = path
+        self.fuzzy_threshold = fuzzy_threshold
+        self._local = threading.local()
+        self._connect().executescript(
+            """
+            CREATE TABLE IF NOT EXISTS org_domains (
+                org_key TEXT PRIMARY KEY,
+                first_word TEXT NOT NULL,
+                domain TEXT NOT NULL,
+                source TEXT NOT NULL,
+                seen INTEGER NOT NULL DEFAULT 1,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_org_domains_first_word ON org_domains(first_word);
+            """
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def learn(self, organization: Optional[str], website: Optional[str], source: str = "enrichment") -> bool:
+        """
+        Records the domain of an organization. A domain from a less trusted
+        source never replaces one from a more trusted source; sources of equal
+        trust vote, and the entry switches domains when the votes against it
+        outnumber those for it.
+        """
+        key = normalize_org(organization)
+        domain = domain_from_url(website)
+        if not key or not domain:
+            return False
+        conn = self._connect()
+        row = conn.execute("SELECT domain, source, seen FROM org_domains WHERE org_key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is not None:
+            current, current_source, seen = row
+            trust, current_trust = SOURCE_CONFIDENCE.get(source, 0), SOURCE_CONFIDENCE.get(current_source, 0)
+            if current == domain:
+                # Seen again: a search confirmed by a match takes the match's source
+                conn.execute(
+                    "UPDATE org_domains SET seen = seen + 1, source = ?, updated_at = ? WHERE org_key = ?",
+                    (source if trust > current_trust else current_source, now, key),
+                )
+                return True
+            if trust < current_trust:
+                return False
+            if trust == current_trust and seen > 1:
+                conn.execute("UPDATE org_domains SET seen = seen - 1 WHERE org_key = ?", (key,))
+                return False
+        conn.execute(
+            "INSERT OR REPLACE INTO org_domains (org_key, first_word, domain, source, seen, updated_at)"
+            " VALUES (?, ?, ?, ?, 1, ?)",
+            (key, key.split()[0], domain, source, now),
+        )
+        return True
+
+    def learn_from_contact(self, contact: Dict[str, Any], source: str) -> bool:
+        organization = contact.get("organization_name")
+        if not organization and isinstance(contact.get("organization"), dict):
+            organization = contact["organization"].get("name")
+        return self.learn(organization, organization_website(contact), source)
+
+    def lookup(self, organization: Optional[str]) -> Optional[Tuple[str, float]]:
+        """Returns (domain, confidence) for an organization, or None if nothing close is indexed."""
+        key = normalize_org(organization)
+        if not key:
+            return None
+        conn = self._connect()
+        row = conn.execute("SELECT domain, source FROM org_domains WHERE org_key = ?", (key,)).fetchone()
+        if row is not None:
+            domain_lookups.inc(outcome="exact")
+            return row[0], SOURCE_CONFIDENCE.get(row[1], 0.5)
+
+        best: Optional[Tuple[str, float]] = None
+        candidates = conn.execute(
+            "SELECT org_key, domain, source FROM org_domains WHERE first_word = ?", (key.split()[0],)
+        )
+        for org_key, domain, source in candidates:
+            similarity = SequenceMatcher(None, key, org_key).ratio()
+            if similarity >= self.fuzzy_threshold:
+                confidence = similarity * SOURCE_CONFIDENCE.get(source, 0.5)
+                if best is None or confidence > best[1]:
+                    best = (domain, confidence)
+        domain_lookups.inc(outcome="fuzzy" if best else "miss")
+        return best
+
+    def stats(self) -> Dict[str, Any]:
+        rows = self._connect().execute("SELECT source, COUNT(*) FROM org_domains GROUP BY source").fetchall()
+        return {"size": sum(count for _, count in rows), "by_source": dict(rows)}
@@ -0,0 +1,335 @@
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from masumi_crew.governor import RateGovernor, get_governor, retry_after
+from masumi_crew.telemetry import span
+from masumi_crew.tools.domain_index import DomainIndex, organization_website
+from masumi_crew.tools.enrichment_cache import MISS, EnrichmentCache
+
+logger = logging.getLogger(__name__)
+
+# APOLLO_API_URL points enrichment at another host, e.g. the benchmark fakes
+APOLLO_API_URL = os.getenv("APOLLO_API_URL", "https://api.apollo.io/api/v1").rstrip("/")
+APOLLO_MATCH_URL = f"{APOLLO_API_URL}/people/match?reveal_personal_emails=true"
+APOLLO_BULK_MATCH_URL = f"{APOLLO_API_URL}/people/bulk_match?reveal_personal_emails=true"
+
+# Apollo accepts at most 10 people per bulk_match request
+MAX_BULK_BATCH_SIZE = 10
+
+
+def build_match_payload(
+    contact: Dict[str, Any],
+    domains: Optional[DomainIndex] = None,
+    min_domain_confidence: float = 0.8,
+) -> Dict[str, Any]:
+    """
+    Builds the people/match payload for a contact from the search results.
+    The organization's domain is only sent when the index knows it with at
+    least min_domain_confidence: a wrong domain makes Apollo miss people it
+    finds by name and organization alone.
+    """
+    full_name = f"{contact.get('first_name', '')} {contact.get('last_name', '')}"
+    organization = contact.get('organization_name', '')
+
+    payload = {"name": full_name}
+    if organization:
+        resolved = domains.lookup(organization) if domains else None
+        if resolved and resolved[1] >= min_domain_confidence:
+            payload["domain"] = resolved[0]
+        payload["organization_name"] = organization
+    return payload
+
+
+def merge_person(contact: Dict[str, Any], person: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combines the original contact with the enriched fields from a match result."""
+    enriched_contact = contact.copy()
+    if not person:
+        return enriched_contact
+
+    enriched_contact['email'] = person.get('email')
+    enriched_contact['phone'] = person.get('phone')
+    enriched_contact['title'] = person.get('title')
+    enriched_contact['seniority'] = person.get('seniority')
+    enriched_contact['personal_emails'] = person.get('personal_emails')
+    enriched_contact['city'] = person.get('city')
+    enriched_contact['state'] = person.get('state')
+    enriched_contact['country'] = person.get('country')
+
+    # Add company information if available
+    if person.get('organization'):
+        org_data = person.get('organization', {})
+        enriched_contact['company_size'] = org_data.get('size')
+        enriched_contact['company_industry'] = org_data.get('industry')
+        enriched_contact['company_website'] = org_data.get('website_url')
+    return enriched_contact
+
+
+# Contact fields kept as slots; anything else on a contact goes to ContactRecord.extra
+CONTACT_FIELDS = (
+    "first_name", "last_name", "organization_name", "linkedin_url", "description",
+    "email", "phone", "title", "seniority", "personal_emails", "city", "state", "country",
+    "company_size", "company_industry", "company_website",
+)
+
+
+class ContactRecord:
+    """
+    Compact enriched contact. Slots instead of a dict per contact, and no
+    reference to the full Apollo person, keep long prospect lists small.
+    """
+
+    __slots__ = CONTACT_FIELDS + ("extra",)
+
+    def __init__(self, **fields: Any):
+        for name in CONTACT_FIELDS:
+            setattr(self, name, fields.pop(name, None))
+        self.extra = fields or None
+
+    @classmethod
+    def from_match(cls, contact: Dict[str, Any], person: Optional[Dict[str, Any]]) -> "ContactRecord":
+        return cls(**merge_person(contact, person))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The contact as a dict, without empty fields."""
+        record = {name: getattr(self, name) for name in CONTACT_FIELDS if getattr(self, name) is not None}
+        if self.extra:
+            record.update(self.extra)
+        return record
+
+
+class ApolloEnricher:
+    """
+    Enriches contacts through Apollo's people/bulk_match endpoint.
+
+    Contacts found in the optional EnrichmentCache skip the API entirely. The
+    optional DomainIndex supplies organization domains for the match
+    payloads and learns new ones from every search result and match. The
+    rest are grouped into batches of up to ten; a batch the bulk call
+    rejects falls back to one people/match call per contact. Requests go
+    through a pooled session with bounded concurrency, paced by the rate
+    governor's "apollo" limits. Failed requests are retried with jittered
+    exponential backoff, and 429 responses make every worker back off.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        max_workers: int = 8,
+        max_retries: int = 3,
+        governor: Optional[RateGovernor] = None,
+        timeout: float = 30,
+        batch_size: int = MAX_BULK_BATCH_SIZE,
+        cache: Optional[EnrichmentCache] = None,
+        domains: Optional[DomainIndex] = None,
+        min_domain_confidence: float = 0.8,
+    ):
+        self.api_key = api_key if api_key is not None else os.getenv("APOLLO_API_KEY", "")
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.governor = governor or get_governor()
+        self.timeout = timeout
+        self.batch_size = max(1, min(batch_size, MAX_BULK_BATCH_SIZE))
+        self.cache = cache
+        self.domains = domains
+        self.min_domain_confidence = min_domain_confidence
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "accept": "application/json",
+            "cache-control": "no-cache",
+            "content-type": "application/json",
+            "x-api-key": self.api_key,
+        })
+
+    def _payload(self, contact: Dict[str, Any]) -> Dict[str, Any]:
+        return build_match_payload(contact, self.domains, self.min_domain_confidence)
+
+    def _learn_domain(self, contact: Dict[str, Any], person: Optional[Dict[str, Any]]) -> None:
+        if self.domains and person:
+            website = organization_website(person)
+            self.domains.learn(contact.get("organization_name"), website, "enrichment")
+            self.domains.learn_from_contact(person, "enrichment")
+
+    def _backoff(self, attempt: int) -> float:
+        return min(2 ** attempt, 8) * (0.5 + random.random())
+
+    def _post(self, url: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Posts to Apollo with retries; returns the JSON body or None if the request failed."""
+        endpoint = url.split("?")[0].rsplit("/", 1)[-1]
+        with span("enrichment", endpoint) as request_span:
+            for attempt in range(self.max_retries):
+                request_span.retries = attempt
+                try:
+                    with self.governor.limit("apollo"):
+                        response = self.session.post(url, json=payload, timeout=self.timeout)
+                except requests.RequestException as e:
+                    logger.warning(f"Apollo request error: {e}")
+                    time.sleep(self._backoff(attempt))
+                    continue
+                if response.status_code == 200:
+                    return response.json()
+                if response.status_code == 429:  # Rate limit
+                    logger.warning("Rate limited. Backing off Apollo requests.")
+                    self.governor.backoff("apollo", retry_after(response))
+                    continue
+                logger.warning(f"Apollo API error: {response.status_code} - {response.text}")
+                if 400 <= response.status_code < 500:
+                    request_span.outcome = "rejected"
+                    return None
+                time.sleep(self._backoff(attempt))
+            request_span.outcome = "failed"
+            return None
+
+    def bulk_match(self, payloads: List[Dict[str, Any]]) -> Optional[List[Optional[Dict[str, Any]]]]:
+        """
+        Calls people/bulk_match for up to ten payloads. Returns one person (or
+        None for no match) per payload, or None if Apollo rejected the batch.
+        """
+        result = self._post(APOLLO_BULK_MATCH_URL, {"details": payloads})
+        if result is None:
+            return None
+        matches = result.get('matches')
+        if not isinstance(matches, list) or len(matches) != len(payloads):
+            return None
+        return matches
+
+    def match_one(self, contact: Dict[str, Any]) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """Matches one contact; returns (answered, person) where answered is False if the request failed."""
+        full_name = f"{contact.get('first_name', '')} {contact.get('last_name', '')}"
+        try:
+            match_result = self._post(APOLLO_MATCH_URL, self._payload(contact))
+        except Exception as e:
+            logger.warning(f"Error enriching contact {full_name}: {e}")
+            return False, None
+        if match_result is None:
+            return False, None
+        return True, match_result.get('person')
+
+    def match_batch(self, contacts: List[Dict[str, Any]]) -> List[Tuple[bool, Optional[Dict[str, Any]]]]:
+        """Matches one batch with a single bulk call, falling back to single matches if rejected."""
+        try:
+            matches = self.bulk_match([self._payload(contact) for contact in contacts])
+        except Exception as e:
+            logger.warning(f"Bulk match error: {e}")
+            matches = None
+        if matches is None:
+            logger.info(f"Bulk match rejected for {len(contacts)} contacts, matching one by one.")
+            return [self.match_one(contact) for contact in contacts]
+        return [(True, person) for person in matches]
+
+    def enrich(
+        self,
+        contacts: List[Dict[str, Any]],
+        on_contact: Optional[Callable[[Dict[str, Any]], None]] = None,
+        collect: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """
+        Enriches contacts in concurrent bulk batches and returns them in input
+        order. on_contact, if given, is called with each enriched contact as
+        soon as it is ready. With collect=False the contacts only go to
+        on_contact and nothing is kept, so memory stays flat however many
+        contacts there are; the result is then an empty list.
+        """
+        if not contacts:
+            return []
+
+        # Search results that carry a website teach the index before any payload is built
+        if self.domains:
+            for contact in contacts:
+                self.domains.learn_from_contact(contact, "search")
+
+        records: List[Optional[ContactRecord]] = [None] * len(contacts) if collect else []
+
+        def done(index: int, person: Optional[Dict[str, Any]]) -> None:
+            self._learn_domain(contacts[index], person)
+            record = ContactRecord.from_match(contacts[index], person)
+            if collect:
+                records[index] = record
+            if on_contact:
+                on_contact(record.to_dict())
+
+        pending = []
+        for index, contact in enumerate(contacts):
+            cached = self.cache.get(contact) if self.cache else MISS
+            if cached is MISS:
+                pending.append(index)
+            else:
+                done(index, cached)
+
+        if pending:
+            batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+            workers = min(self.max_workers, len(batches))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                # Only a few batches are in flight at once, so finished results never pile up
+                queued = iter(batches)
+                in_flight: Deque[Tuple[List[int], Future]] = deque()
+
+                def submit(batch: Optional[List[int]]) -> None:
+                    if batch is not None:
+                        in_flight.append((batch, pool.submit(self.match_batch, [contacts[i] for i in batch])))
+
+                for batch in islice(queued, 2 * workers):
+                    submit(batch)
+                while in_flight:
+                    batch, future = in_flight.popleft()
+                    submit(next(queued, None))
+                    for index, (answered, person) in zip(batch, future.result()):
+                        # Failed requests are not cached so they are retried next time
+                        if answered and self.cache:
+                            self.cache.put(contacts[index], person)
+                        done(index, person)
+
+        return [record.to_dict() for record in records]
+
+
+def _domain_index_from_env() -> Optional[DomainIndex]:
+    # Set DOMAIN_INDEX_PATH to an empty string to disable the index
+    path = os.getenv("DOMAIN_INDEX_PATH", "domain_index.db")
+    if not path:
+        return None
+    return DomainIndex(path=path, fuzzy_threshold=float(os.getenv("DOMAIN_INDEX_FUZZY_THRESHOLD", "0.88")))
+
+
+def _cache_from_env() -> Optional[EnrichmentCache]:
+    # Set ENRICHMENT_CACHE_PATH to an empty string to disable the cache
+    path = os.getenv("ENRICHMENT_CACHE_PATH", "enrichment_cache.db")
+    if not path:
+        return None
+    return EnrichmentCache(
+        path=path,
+        ttl_seconds=float(os.getenv("ENRICHMENT_CACHE_TTL", str(30 * 24 * 3600))),
+        negative_ttl_seconds=float(os.getenv("ENRICHMENT_CACHE_NEGATIVE_TTL", str(24 * 3600))),
+        max_entries=int(os.getenv("ENRICHMENT_CACHE_MAX_ENTRIES", "100000")),
+    )
+
+
+_enricher: Optional[ApolloEnricher] = None
+_enricher_lock = threading.Lock()
+
+
+def get_enricher() -> ApolloEnricher:
+    """Returns the process-wide enricher so its connection pool is reused across calls."""
+    global _enricher
+    if _enricher is None:
+        with _enricher_lock:
+            if _enricher is None:
+                _enricher = ApolloEnricher(
+                    max_workers=int(os.getenv("APOLLO_ENRICH_CONCURRENCY", "8")),
+                    batch_size=int(os.getenv("APOLLO_BULK_BATCH_SIZE", str(MAX_BULK_BATCH_SIZE))),
+                    cache=_cache_from_env(),
+                    domains=_domain_index_from_env(),
+                    min_domain_confidence=float(os.getenv("DOMAIN_MIN_CONFIDENCE", "0.8"))
+                )
+    return _enricher
@@ -0,0 +1,129 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# Returned by EnrichmentCache.get when there is no usable entry. A cached
+# "no match" is returned as None, so a separate sentinel is needed.
+MISS = object()
+
+
+def _normalize(value: Optional[str]) -> str:
+    return re.sub(r"\s+", " ", (value or "").strip().lower())
+
+
+def _normalize_linkedin(url: Optional[str]) -> str:
+    url = _normalize(url)
+    url = re.sub(r"^https?://", "", url)
+    url = re.sub(r"^(www\.|[a-z]{2}\.)linkedin", "linkedin", url)
+    return url.split("?")[0].rstrip("/")
+
+
+def identity_key(contact: Dict[str, Any]) -> str:
+    """Builds the cache key for a contact from its normalized name, organization and LinkedIn URL."""
+    name = _normalize(f"{contact.get('first_name') or ''} {contact.get('last_name') or ''}")
+    organization = _normalize(contact.get('organization_name'))
+    linkedin = _normalize_linkedin(contact.get('linkedin_url'))
+    return "|".join((name, organization, linkedin))
+
+
+class EnrichmentCache:
+    """
+    On-disk cache of Apollo match results keyed by person identity.
+
+    Matches live for ttl_seconds and "no match" answers for the shorter
+    negative_ttl_seconds. When the cache grows beyond max_entries the least
+    recently used entries are dropped.
+    """
+
+    def __init__(
+        self,
+        path: str = "enrichment_cache.db",
+        ttl_seconds: float = 30 * 24 * 3600,
+        negative_ttl_seconds: float = 24 * 3600,
+        max_entries: int = 100_000,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._stats_lock = threading.Lock()
+        self._local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS enrichment ("
+            " key TEXT PRIMARY KEY, person TEXT, stored_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._connect().execute(
+            "CREATE INDEX IF NOT EXISTS idx_enrichment_last_access ON enrichment(last_access)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, attr: str) -> None:
+        with self._stats_lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def get(self, contact: Dict[str, Any]) -> Any:
+        """Returns the cached person, None for a cached "no match", or MISS."""
+        key = identity_key(contact)
+        conn = self._connect()
+        row = conn.execute("SELECT person, stored_at FROM enrichment WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is not None:
+            person, stored_at = row
+            ttl = self.ttl_seconds if person is not None else self.negative_ttl_seconds
+            if now - stored_at <= ttl:
+                conn.execute("UPDATE enrichment SET last_access = ? WHERE key = ?", (now, key))
+                if person is None:
+                    self._count("negative_hits")
+                    return None
+                self._count("hits")
+                return json.loads(person)
+        self._count("misses")
+        return MISS
+
+    def put(self, contact: Dict[str, Any], person: Optional[Dict[str, Any]]) -> None:
+        """Stores a match result; person=None records a "no match"."""
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO enrichment (key, person, stored_at, last_access) VALUES (?, ?, ?, ?)",
+            (identity_key(contact), json.dumps(person) if person is not None else None, now, now),
+        )
+        self._count("_puts")
+        # Counting rows is a table scan, so only check the size limit periodically
+        if self._puts % 100 == 0:
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        (size,) = conn.execute("SELECT COUNT(*) FROM enrichment").fetchone()
+        excess = size - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM enrichment WHERE key IN"
+                " (SELECT key FROM enrichment ORDER BY last_access LIMIT ?)",
+                (excess,),
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        (size,) = self._connect().execute("SELECT COUNT(*) FROM enrichment").fetchone()
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+            "size": size,
+        }
@@ -0,0 +1,83 @@
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from composio_crewai import App, ComposioToolSet
+
+logger = logging.getLogger(__name__)
+
+
+class ToolRegistry:
+    """
+    Process-wide cache of Composio tools.
+
+    Building a ComposioToolSet and fetching tool schemas costs outbound calls,
+    so tools are loaded once per app and shared across jobs. Once an entry is
+    older than ttl_seconds the cached tools keep being served while a
+    background thread fetches fresh schemas.
+    """
+
+    def __init__(self, ttl_seconds: float = 3600):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._toolset: Optional[ComposioToolSet] = None
+        # app -> (tools, loaded_at)
+        self._tools: Dict[App, Tuple[list, float]] = {}
+        self._refreshing: set = set()
+
+    @property
+    def toolset(self) -> ComposioToolSet:
+        if self._toolset is None:
+            with self._lock:
+                if self._toolset is None:
+                    self._toolset = ComposioToolSet()
+        return self._toolset
+
+    def _load(self, app: App) -> list:
+        tools = self.toolset.get_tools(apps=[app])
+        with self._lock:
+            self._tools[app] = (tools, time.monotonic())
+        return tools
+
+    def _refresh_in_background(self, app: App) -> None:
+        with self._lock:
+            if app in self._refreshing:
+                return
+            self._refreshing.add(app)
+
+        def _refresh():
+            try:
+                self._load(app)
+            except Exception as e:
+                # Keep serving the stale tools; the next call will try again
+                logger.warning(f"Failed to refresh {app} tools: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(app)
+
+        threading.Thread(target=_refresh, name=f"tool-refresh-{app}", daemon=True).start()
+
+    def get_tools(self, app: App) -> List:
+        """Returns the tools for app, loading them on first use."""
+        entry = self._tools.get(app)
+        if entry is None:
+            return list(self._load(app))
+        tools, loaded_at = entry
+        if time.monotonic() - loaded_at > self.ttl_seconds:
+            self._refresh_in_background(app)
+        return list(tools)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tools.clear()
+            self._toolset = None
+
+
+registry = ToolRegistry(ttl_seconds=float(os.getenv("COMPOSIO_TOOLS_TTL", "3600")))
+
+
+def get_tools(app: App) -> List:
+    """Returns the cached Composio tools for app from the shared registry."""
+    return registry.get_tools(app)
@@ -0,0 +1,30 @@
+import os
+import sys
+import time
+
+import pytest
+
+# Keep the process-wide stores out of the working directory; tests pass their own
+os.environ.setdefault("CHECKPOINT_PATH", "")
+os.environ.setdefault("LLM_CACHE_PATH", "")
+os.environ.setdefault("RATE_LIMIT_STORE", "")
+
+# The API node's modules (job store, payment poller, work queue, ...) live one level up
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+class Clock:
+    """A time.time() that only moves when a test moves it."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(time, "time", clock)
+    return clock
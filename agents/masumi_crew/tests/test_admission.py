@@ -0,0 +1,100 @@
+import pytest
+
+from admission import AdmissionController, OverCapacityError
+from job_runner import JobRunner
+from job_store import SQLiteJobStore
+from masumi_crew.governor import MemoryLimitStore, ProviderLimits, RateGovernor
+
+
+class FakeQueue:
+    def __init__(self, **counts):
+        self.counts = {"ready": 0, "leased": 0, "expired": 0, "done": 0, **counts}
+
+    def stats(self):
+        return self.counts
+
+
+def controller(tmp_path, work_queue=None, **kwargs):
+    jobs = SQLiteJobStore(str(tmp_path / "jobs.db"))
+    governor = RateGovernor({"apollo": ProviderLimits("apollo", rate=10, daily_quota=5)}, MemoryLimitStore())
+    runner = JobRunner(max_workers=2, max_queue=2)
+    return AdmissionController(runner, jobs, work_queue=work_queue, governor=governor, **kwargs)
+
+
+def reason(admission, slots=1):
+    error = admission.refusal(slots)
+    return error.reason if error else None
+
+
+def test_idle_node_admits(tmp_path):
+    admission = controller(tmp_path)
+    capacity = admission.capacity()
+    assert (capacity["limit"], capacity["committed"], capacity["free"]) == (4, 0, 4)
+    assert capacity["free_worker_slots"] == 2
+    admission.check()
+
+
+def test_jobs_waiting_on_payment_count_against_capacity(tmp_path, clock):
+    admission = controller(tmp_path, pending_window=300)
+    admission.jobs.create("stale", status="awaiting_payment", payment_status="pending")
+    clock.now += 301
+    admission.jobs.create("paid-long-ago", status="awaiting_payment", payment_status="FundsLocked")
+    admission.jobs.create("unpaid", status="awaiting_payment", payment_status="pending")
+    admission.jobs.create("reserved", status="starting", payment_status="pending")
+    admission.jobs.create("batch", kind="batch", status="awaiting_payment", payment_status="pending")
+    clock.now += 301
+
+    capacity = admission.capacity()
+    # Unpaid jobs past the window are unlikely to be paid; paid ones count until a run takes them
+    assert (capacity["pending_payments"], capacity["paid_unstarted"]) == (0, 1)
+    clock.now -= 301
+    capacity = admission.capacity()
+    assert (capacity["pending_payments"], capacity["paid_unstarted"], capacity["committed"]) == (2, 1, 3)
+    assert reason(admission) is None
+    assert reason(admission, slots=2) == "capacity"
+
+
+def test_batch_larger_than_the_node_is_taken_only_when_idle(tmp_path):
+    admission = controller(tmp_path)
+    assert reason(admission, slots=10) is None
+    admission.jobs.create("job-1", status="awaiting_payment", payment_status="pending")
+    error = admission.refusal(10)
+    assert error.reason == "capacity"
+    assert 5 <= error.retry_after <= 300
+
+
+def test_long_provider_pause_rejects(tmp_path, clock):
+    admission = controller(tmp_path, max_pause_seconds=10)
+    admission.governor.backoff("apollo", seconds=5)
+    assert reason(admission) is None
+    admission.governor.backoff("apollo", seconds=30)
+    error = admission.refusal()
+    assert error.reason == "rate_limited"
+    assert error.retry_after == 30
+
+
+def test_used_up_daily_quota_rejects(tmp_path, clock):
+    admission = controller(tmp_path)
+    for _ in range(5):
+        admission.governor.acquire("apollo")
+    with pytest.raises(OverCapacityError) as error:
+        admission.check()
+    assert error.value.reason == "quota"
+
+
+def test_slow_recent_jobs_reject(tmp_path):
+    admission = controller(tmp_path, max_p95_seconds=60)
+    for index, seconds in enumerate([10, 20, 120]):
+        admission.jobs.create(f"job-{index}", status="running")
+        admission.jobs.update(f"job-{index}", status="completed", run_seconds=seconds)
+    assert admission.capacity()["latency"]["p95_seconds"] == 120
+    assert reason(admission) == "latency"
+
+
+def test_queue_mode_counts_the_shared_queue(tmp_path):
+    admission = controller(tmp_path, work_queue=FakeQueue(ready=60, leased=30, expired=5), max_queue_depth=100)
+    capacity = admission.capacity()
+    assert (capacity["execution"], capacity["running"], capacity["queue_depth"]) == ("queue", 30, 65)
+    assert capacity["free_worker_slots"] is None
+    assert reason(admission, slots=5) is None
+    assert reason(admission, slots=6) == "capacity"
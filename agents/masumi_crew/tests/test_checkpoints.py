@@ -0,0 +1,98 @@
+import json
+from types import SimpleNamespace
+
+from masumi_crew.checkpoints import CheckpointStore, checkpoint_tasks, task_step
+from masumi_crew.governor import RateGovernor
+from masumi_crew.outreach import OutreachPipeline, SendLog
+from masumi_crew.tools.registry import registry
+
+CONTACTS = [{"first_name": "Ada", "email": "ada@x.com"}, {"first_name": "Bo", "email": "bo@y.com"}]
+
+
+class CountingLLM:
+    def __init__(self, subject):
+        self.subject = subject
+        self.prompts = []
+
+    def call(self, messages, *args, **kwargs):
+        prompt = messages[0]["content"]
+        self.prompts.append(prompt)
+        return json.dumps([
+            {"recipient_email": contact["email"], "subject": self.subject, "body": "Hi"}
+            for contact in CONTACTS if contact["email"] in prompt
+        ])
+
+
+class FakeToolset:
+    def __init__(self):
+        self.sent = []
+
+    def execute_action(self, action, params):
+        self.sent.append(params["recipient_email"])
+        return {"successful": True}
+
+
+def store(tmp_path, **kwargs):
+    return CheckpointStore(str(tmp_path / "checkpoints.db"), **kwargs)
+
+
+def test_steps_are_saved_per_job_and_cleared(tmp_path):
+    checkpoints = store(tmp_path)
+    assert checkpoints.get("job-1", "contacts") is None
+    checkpoints.save("job-1", "contacts", [{"email": "ada@x.com"}])
+    checkpoints.save("job-1", "payment", {"payment_id": "pay-1"})
+    checkpoints.save("job-2", "contacts", [])
+
+    assert checkpoints.get("job-1", "contacts") == [{"email": "ada@x.com"}]
+    assert list(checkpoints.steps("job-1")) == ["contacts", "payment"]
+    checkpoints.clear("job-1")
+    assert checkpoints.steps("job-1") == {}
+    assert checkpoints.get("job-2", "contacts") == []
+
+
+def test_old_checkpoints_are_deleted(tmp_path, clock):
+    checkpoints = store(tmp_path, ttl_seconds=100)
+    checkpoints.save("old", "contacts", [])
+    clock.now += 301
+    checkpoints.save("new", "contacts", [])
+    assert checkpoints.get("old", "contacts") is None
+    assert checkpoints.get("new", "contacts") == []
+
+
+def test_task_outputs_are_checkpointed_and_callbacks_restored(tmp_path):
+    checkpoints = store(tmp_path)
+    seen = []
+    tasks = [SimpleNamespace(callback=seen.append), SimpleNamespace(callback=None)]
+    crew = SimpleNamespace(tasks=tasks)
+
+    with checkpoint_tasks(crew, checkpoints, "job-1"):
+        for index, task in enumerate(crew.tasks):
+            task.callback(SimpleNamespace(raw=f"output {index}"))
+
+    assert checkpoints.get("job-1", task_step(0)) == "output 0"
+    assert checkpoints.get("job-1", task_step(1)) == "output 1"
+    assert [output.raw for output in seen] == ["output 0"]
+    assert (tasks[0].callback, tasks[1].callback) == (seen.append, None)
+
+
+def test_retried_job_resends_the_checkpointed_emails(tmp_path, monkeypatch):
+    toolset = FakeToolset()
+    monkeypatch.setattr(registry, "_toolset", toolset)
+    checkpoints = store(tmp_path)
+
+    def pipeline(llm):
+        send_log = SendLog(str(tmp_path / "outreach.db"))
+        return OutreachPipeline(llm, send_log=send_log, governor=RateGovernor({}), checkpoints=checkpoints)
+
+    first = CountingLLM("First draft")
+    pipeline(first).run("job-1", CONTACTS[:1], "pitch")
+    # The retry reaches one more contact; only that contact's email is written
+    retry = CountingLLM("Second draft")
+    pipeline(retry).run("job-1", CONTACTS, "pitch")
+
+    assert len(retry.prompts) == 1 and "ada@x.com" not in retry.prompts[0]
+    assert toolset.sent == ["ada@x.com", "bo@y.com"]
+    drafts = checkpoints.get("job-1", "emails_written")
+    assert {email: draft["subject"] for email, draft in drafts.items()} == {
+        "ada@x.com": "First draft", "bo@y.com": "Second draft",
+    }
@@ -0,0 +1,38 @@
+import itertools
+import threading
+
+import pytest
+
+from masumi_crew.crew_pool import CrewPool
+
+
+def test_waiter_builds_a_replacement_when_a_leased_crew_is_discarded():
+    pool = CrewPool(itertools.count().__next__, size=1)
+    got = []
+
+    def waiter():
+        with pool.lease() as crew:
+            got.append(crew)
+
+    with pytest.raises(RuntimeError):
+        with pool.lease() as first:
+            thread = threading.Thread(target=waiter)
+            thread.start()
+            # The pool is fully built, so the waiter blocks until this lease ends
+            thread.join(0.1)
+            assert thread.is_alive()
+            raise RuntimeError("job failed")
+    thread.join(2)
+    assert not thread.is_alive()
+    assert (first, got) == (0, [1])
+    assert pool.stats() == {"size": 1, "built": 1, "idle": 1}
+
+
+def test_returned_crew_is_reused():
+    pool = CrewPool(itertools.count().__next__, size=2)
+    pool.warm()
+    with pool.lease() as crew:
+        pass
+    with pool.lease() as again:
+        assert again == crew
+    assert pool.stats() == {"size": 2, "built": 2, "idle": 2}
@@ -0,0 +1,97 @@
+import threading
+import time
+
+from masumi_crew.governor import RateGovernor
+from masumi_crew.tools.enrichment import ApolloEnricher
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.body = body or {}
+        self.text = str(body)
+        self.headers = {}
+
+    def json(self):
+        return self.body
+
+
+class FakeApollo:
+    """Answers people/bulk_match and people/match from the names in the payloads."""
+
+    def __init__(self, delays=None, reject_bulk=False, truncate_bulk=False):
+        self.delays = delays or {}
+        self.reject_bulk = reject_bulk
+        self.truncate_bulk = truncate_bulk
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def post(self, url, json=None, timeout=None):
+        endpoint = url.split("?")[0].rsplit("/", 1)[-1]
+        with self._lock:
+            self.requests.append(endpoint)
+        if endpoint == "bulk_match":
+            names = [details["name"] for details in json["details"]]
+            time.sleep(max(self.delays.get(name, 0) for name in names))
+            if self.reject_bulk:
+                return FakeResponse(422, {"error": "invalid details"})
+            matches = [self.person(name) for name in names]
+            return FakeResponse(200, {"matches": matches[:1] if self.truncate_bulk else matches})
+        return FakeResponse(200, {"person": self.person(json["name"])})
+
+    @staticmethod
+    def person(name):
+        return {"email": f"{name.split()[0].lower()}@example.com", "title": "Partner"}
+
+
+def enricher(apollo, **kwargs):
+    enricher = ApolloEnricher(api_key="key", governor=RateGovernor({}), **kwargs)
+    enricher.session = apollo
+    return enricher
+
+
+def contacts(count):
+    return [{"first_name": f"Person{i}", "last_name": "Doe", "organization_name": "Acme"} for i in range(count)]
+
+
+def test_results_keep_input_order_when_batches_finish_out_of_order():
+    # The first batch answers last
+    apollo = FakeApollo(delays={"Person0 Doe": 0.2})
+    streamed = []
+    enriched = enricher(apollo, max_workers=4, batch_size=2).enrich(contacts(7), on_contact=streamed.append)
+
+    assert [contact["first_name"] for contact in enriched] == [f"Person{i}" for i in range(7)]
+    assert [contact["email"] for contact in enriched] == [f"person{i}@example.com" for i in range(7)]
+    assert apollo.requests == ["bulk_match"] * 4
+    assert sorted(contact["first_name"] for contact in streamed) == [f"Person{i}" for i in range(7)]
+
+
+def test_collect_false_only_streams():
+    streamed = []
+    enriched = enricher(FakeApollo(), batch_size=3).enrich(contacts(5), on_contact=streamed.append, collect=False)
+    assert enriched == []
+    assert len(streamed) == 5
+
+
+def test_rejected_bulk_batch_falls_back_to_single_matches():
+    apollo = FakeApollo(reject_bulk=True)
+    enriched = enricher(apollo, max_workers=1, batch_size=3).enrich(contacts(3))
+
+    assert apollo.requests == ["bulk_match", "match", "match", "match"]
+    assert [contact["email"] for contact in enriched] == [f"person{i}@example.com" for i in range(3)]
+
+
+def test_bulk_answer_of_the_wrong_length_falls_back_to_single_matches():
+    apollo = FakeApollo(truncate_bulk=True)
+    enriched = enricher(apollo, max_workers=1, batch_size=2).enrich(contacts(2))
+    assert [contact["email"] for contact in enriched] == ["person0@example.com", "person1@example.com"]
+    assert apollo.requests == ["bulk_match", "match", "match"]
+
+
+def test_bulk_no_match_keeps_the_search_result():
+    apollo = FakeApollo()
+    apollo.person = lambda name: None
+    enriched = enricher(apollo, batch_size=2).enrich(contacts(2))
+    assert [contact.get("email") for contact in enriched] == [None, None]
+    assert enriched[0]["organization_name"] == "Acme"
+    assert apollo.requests == ["bulk_match"]
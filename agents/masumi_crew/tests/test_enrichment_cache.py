@@ -0,0 +1,46 @@
+from masumi_crew.tools.enrichment_cache import MISS, EnrichmentCache, identity_key
+
+ADA = {"first_name": "Ada", "last_name": "Lovelace", "organization_name": "Analytical Engines",
+       "linkedin_url": "https://www.linkedin.com/in/ada/"}
+PERSON = {"email": "ada@engines.com"}
+
+
+def cache(tmp_path, **kwargs):
+    return EnrichmentCache(str(tmp_path / "enrichment.db"), ttl_seconds=100, negative_ttl_seconds=10, **kwargs)
+
+
+def test_identity_key_ignores_case_spacing_and_linkedin_host():
+    same = {"first_name": " ada ", "last_name": "LOVELACE", "organization_name": "analytical  engines",
+            "linkedin_url": "http://uk.linkedin.com/in/ada?trk=search"}
+    assert identity_key(same) == identity_key(ADA)
+
+
+def test_match_expires_after_ttl(tmp_path, clock):
+    store = cache(tmp_path)
+    store.put(ADA, PERSON)
+    clock.now += 100
+    assert store.get(ADA) == PERSON
+    clock.now += 1
+    assert store.get(ADA) is MISS
+
+
+def test_no_match_is_cached_for_the_shorter_negative_ttl(tmp_path, clock):
+    store = cache(tmp_path)
+    store.put(ADA, None)
+    clock.now += 10
+    assert store.get(ADA) is None
+    clock.now += 1
+    assert store.get(ADA) is MISS
+    stats = store.stats()
+    assert (stats["hits"], stats["negative_hits"], stats["misses"]) == (0, 1, 1)
+
+
+def test_least_recently_used_entries_are_dropped(tmp_path, clock):
+    store = cache(tmp_path, max_entries=50)
+    people = [{"first_name": f"P{i}", "last_name": "Doe"} for i in range(100)]
+    for person in people:
+        clock.now += 1
+        store.put(person, PERSON)
+    assert store.stats()["size"] == 50
+    assert store.get(people[0]) is MISS
+    assert store.get(people[-1]) == PERSON
@@ -0,0 +1,109 @@
+import time
+
+import pytest
+
+from masumi_crew.governor import (
+    MemoryLimitStore, ProviderLimits, QuotaExceededError, RateGovernor, SQLiteLimitStore,
+)
+
+
+class RateLimitError(Exception):
+    pass
+
+
+@pytest.fixture
+def sleeps(clock, monkeypatch):
+    """Makes time.sleep advance the test clock; returns the list of sleeps."""
+    slept = []
+
+    def sleep(seconds):
+        slept.append(round(seconds, 3))
+        clock.now += seconds
+
+    monkeypatch.setattr(time, "sleep", sleep)
+    return slept
+
+
+def governor(store=None, **limits):
+    return RateGovernor({"apollo": ProviderLimits("apollo", **limits)}, store or MemoryLimitStore())
+
+
+def test_bucket_allows_a_burst_then_paces_at_the_rate(sleeps):
+    g = governor(rate=2, burst=2)
+    for _ in range(4):
+        g.acquire("apollo")
+    assert sleeps == [0.5, 0.5]
+
+
+def test_backoff_pauses_exponentially_and_halves_the_rate(clock, sleeps):
+    g = governor(rate=10, recovery_per_second=0.01)
+    g.backoff("apollo")
+    assert g.stats()["apollo"]["paused_for"] == 1
+    assert g.stats()["apollo"]["rate_factor"] == 0.5
+    g.backoff("apollo")
+    assert g.stats()["apollo"]["paused_for"] == 2
+    assert g.stats()["apollo"]["rate_factor"] == 0.25
+
+    g.acquire("apollo")
+    # Waits out the pause, then refills at a quarter of the rate
+    assert sleeps[0] == 2
+    assert sum(sleeps) == pytest.approx(2 + 1 / 2.5)
+
+
+def test_retry_after_sets_the_pause(sleeps):
+    g = governor(rate=10)
+    g.backoff("apollo", seconds=5)
+    assert g.stats()["apollo"]["paused_for"] == 5
+
+
+def test_rate_limit_error_inside_limit_backs_off(sleeps):
+    g = governor(rate=10, max_concurrency=1)
+    with pytest.raises(RateLimitError):
+        with g.limit("apollo"):
+            raise RateLimitError("slow down")
+    assert g.stats()["apollo"]["paused_for"] == 1
+    # Other errors do not
+    with pytest.raises(ValueError):
+        with g.limit("other"):
+            raise ValueError("bad request")
+
+
+def test_rate_recovers_after_a_backoff(clock, sleeps):
+    g = governor(rate=10, recovery_per_second=0.1, max_backoff=60)
+    g.backoff("apollo")
+    clock.now += 3
+    g.acquire("apollo")
+    # Recovery counts from the end of the 1s pause
+    assert g.stats()["apollo"]["rate_factor"] == pytest.approx(0.7)
+
+
+def test_daily_quota_resets_at_utc_midnight(clock, sleeps):
+    g = governor(daily_quota=2)
+    g.acquire("apollo")
+    g.acquire("apollo")
+    with pytest.raises(QuotaExceededError):
+        g.acquire("apollo")
+    clock.now += 24 * 3600
+    g.acquire("apollo")
+    assert g.stats()["apollo"]["used_today"] == 1
+
+
+def test_unlimited_providers_pass_straight_through(sleeps):
+    g = governor(rate=1)
+    for _ in range(5):
+        g.acquire("gmail")
+    assert sleeps == []
+
+
+def test_sqlite_store_shares_buckets_and_backoff_between_governors(tmp_path, sleeps):
+    path = str(tmp_path / "limits.db")
+    first = governor(SQLiteLimitStore(path), rate=1, burst=1, daily_quota=3)
+    second = governor(SQLiteLimitStore(path), rate=1, burst=1, daily_quota=3)
+
+    first.acquire("apollo")
+    # The token first spent is gone for second too
+    second.acquire("apollo")
+    assert sleeps == [1]
+    first.backoff("apollo", seconds=30)
+    assert second.stats()["apollo"]["paused_for"] == 30
+    assert second.stats()["apollo"]["used_today"] == 2
@@ -0,0 +1,52 @@
+import asyncio
+import threading
+
+import pytest
+
+from job_runner import JobRunner, JobTimeoutError
+
+
+def test_timed_out_run_keeps_its_slot_until_the_thread_returns():
+    release = threading.Event()
+
+    async def run():
+        runner = JobRunner(max_workers=1, timeout=0.05)
+        with pytest.raises(JobTimeoutError):
+            await runner.run(release.wait)
+        busy = runner.stats()
+        release.set()
+        # The abandoned thread returns and gives its slot back
+        for _ in range(100):
+            if runner.running == 0:
+                break
+            await asyncio.sleep(0.01)
+        idle = runner.stats()
+        result = await runner.run(lambda: "next")
+        runner.shutdown()
+        return busy, idle, result
+
+    busy, idle, result = asyncio.run(run())
+    assert (busy["running"], busy["zombies"], busy["free_slots"]) == (1, 1, 0)
+    assert (idle["running"], idle["zombies"], idle["free_slots"]) == (0, 0, 1)
+    assert result == "next"
+
+
+def test_cancelled_run_is_counted_as_a_zombie():
+    release = threading.Event()
+
+    async def run():
+        runner = JobRunner(max_workers=2, timeout=None)
+        task = asyncio.get_running_loop().create_task(runner.run(release.wait))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        busy = runner.stats()
+        release.set()
+        await asyncio.sleep(0.1)
+        runner.shutdown()
+        return busy, runner.stats()
+
+    busy, idle = asyncio.run(run())
+    assert (busy["running"], busy["zombies"], busy["free_slots"]) == (1, 1, 1)
+    assert (idle["running"], idle["zombies"]) == (0, 0)
@@ -0,0 +1,84 @@
+import threading
+
+from job_store import SQLiteJobStore, create_job_store
+
+
+def store(tmp_path, **kwargs):
+    return SQLiteJobStore(str(tmp_path / "jobs.db"), **kwargs)
+
+
+def test_transition_applies_only_from_the_expected_status(tmp_path):
+    jobs = store(tmp_path)
+    jobs.create("job-1", status="awaiting_payment", payment_id="pay-1")
+
+    assert jobs.transition("job-1", "running", status="completed") is None
+    job = jobs.transition("job-1", "awaiting_payment", status="running", payment_status="paid")
+    assert (job["status"], job["payment_status"], job["payment_id"]) == ("running", "paid", "pay-1")
+    assert jobs.transition("job-1", "awaiting_payment", status="running") is None
+    assert jobs.transition("missing", "awaiting_payment", status="running") is None
+
+
+def test_only_one_concurrent_transition_wins(tmp_path):
+    jobs = store(tmp_path)
+    jobs.create("job-1", status="awaiting_payment")
+    won = []
+    start = threading.Barrier(8)
+
+    def claim(worker):
+        start.wait()
+        if jobs.transition("job-1", "awaiting_payment", status="running", worker=worker) is not None:
+            won.append(worker)
+
+    threads = [threading.Thread(target=claim, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(won) == 1
+    assert jobs.get("job-1")["worker"] == won[0]
+
+
+def test_finished_jobs_are_evicted_after_the_ttl(tmp_path, clock):
+    jobs = store(tmp_path, ttl_seconds=100)
+    jobs.create("done", status="running")
+    jobs.update("done", status="completed")
+    jobs.create("live", status="running")
+    created_at = jobs.get("live")["created_at"]
+
+    clock.now += 100
+    assert jobs.evict_expired() == 0
+    clock.now += 1
+    assert jobs.evict_expired() == 1
+    assert "done" not in jobs
+    assert jobs.get("live")["created_at"] == created_at
+
+
+def test_retried_job_is_not_evicted_while_it_runs(tmp_path, clock):
+    jobs = store(tmp_path, ttl_seconds=100)
+    jobs.create("job-1", status="running")
+    assert jobs.update("job-1", status="failed")["finished_at"] == clock.now
+    clock.now += 50
+    assert jobs.transition("job-1", "failed", status="running")["finished_at"] is None
+
+    clock.now += 100
+    assert jobs.evict_expired() == 0
+    assert jobs.update("job-1", status="completed")["finished_at"] == clock.now
+    assert [job["job_id"] for job in jobs.finished_since(clock.now)] == ["job-1"]
+
+
+def test_create_evicts_at_most_once_per_interval(tmp_path, clock):
+    jobs = store(tmp_path, ttl_seconds=10, evict_interval=300)
+    jobs.create("old", status="completed")
+    clock.now += 11
+    # The first create ran eviction when "old" was still fresh
+    jobs.create("new-1", status="running")
+    assert "old" in jobs
+    clock.now += 300
+    jobs.create("new-2", status="running")
+    assert "old" not in jobs
+
+
+def test_create_job_store_reads_the_url(tmp_path):
+    jobs = create_job_store(f"sqlite:///{tmp_path}/jobs.db", ttl_seconds=5)
+    assert (jobs.path, jobs.ttl_seconds) == (f"{tmp_path}/jobs.db", 5)
+    assert jobs.find(status=("running", "queued")) == []
@@ -0,0 +1,61 @@
+from openai.types.chat import ChatCompletionMessageToolCall
+
+from masumi_crew.llm_cache import CachedLLM, LLMCache
+
+TOOLS = [{"type": "function", "function": {"name": "apollo_search", "parameters": {"type": "object"}}}]
+MESSAGES = [{"role": "user", "content": "Find seed investors"}]
+
+
+class FakeLLM:
+    model = "gpt-4o"
+
+    def __init__(self, response):
+        self.response = response
+        self.calls = 0
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        self.calls += 1
+        return self.response
+
+
+def cached_llm(tmp_path, response):
+    llm = FakeLLM(response)
+    return llm, CachedLLM(llm, "openai/gpt-4o", cache=LLMCache(str(tmp_path / "llm.db")))
+
+
+def test_native_tool_calls_are_cached_per_tool_schema(tmp_path):
+    tool_call = ChatCompletionMessageToolCall(
+        id="call_1", type="function", function={"name": "apollo_search", "arguments": '{"q": "seed"}'}
+    )
+    llm, cached = cached_llm(tmp_path, [tool_call])
+
+    first = cached.call(MESSAGES, tools=TOOLS)
+    second = cached.call(MESSAGES, tools=TOOLS)
+    assert first == [tool_call]
+    # Replayed as the dict crewai's native tool loop accepts for OpenAI tool calls
+    assert second == [{"id": "call_1", "type": "function",
+                       "function": {"name": "apollo_search", "arguments": '{"q": "seed"}'}}]
+    assert llm.calls == 1
+
+    # Another tool schema is another request
+    other_tools = [{"type": "function", "function": {"name": "gmail_send", "parameters": {"type": "object"}}}]
+    cached.call(MESSAGES, tools=other_tools)
+    assert llm.calls == 2
+    stats = cached.cache.stats()
+    assert (stats["hits"], stats["tool_call_hits"], stats["misses"]) == (1, 1, 2)
+
+
+def test_calls_that_execute_functions_are_not_cached(tmp_path):
+    llm, cached = cached_llm(tmp_path, "done")
+    for _ in range(2):
+        cached.call(MESSAGES, tools=TOOLS, available_functions={"apollo_search": lambda q: q})
+    assert llm.calls == 2
+    assert cached.cache.stats()["bypassed"] == 2
+
+
+def test_unrecognised_list_responses_are_not_cached(tmp_path):
+    llm, cached = cached_llm(tmp_path, [object()])
+    cached.call(MESSAGES, tools=TOOLS)
+    cached.call(MESSAGES, tools=TOOLS)
+    assert llm.calls == 2
+    assert cached.cache.stats()["size"] == 0
@@ -0,0 +1,59 @@
+import pytest
+
+from masumi_crew.model_router import ModelLimiter, RoutedLLM
+
+
+class FakeModel:
+    def __init__(self, name, error=None):
+        self.name = name
+        self.error = error
+        self.llm = self
+        self.calls = 0
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return f"answer from {self.name}"
+
+
+class RateLimitError(Exception):
+    """Named like litellm's and openai's rate-limit errors."""
+
+
+def router(primary, *fallbacks, primary_limiter=None):
+    return RoutedLLM(
+        "write_emails",
+        primary,
+        primary_limiter or ModelLimiter(primary.name, 2, queue_timeout=0.01),
+        [(model, ModelLimiter(model.name, 2, queue_timeout=0.01)) for model in fallbacks],
+    )
+
+
+@pytest.mark.parametrize("error", [RateLimitError("429"), ConnectionError("refused"), TimeoutError()])
+def test_provider_errors_fall_back_to_the_next_model(error):
+    primary, fallback = FakeModel("fast", error), FakeModel("slow")
+    assert router(primary, fallback).call([]) == "answer from slow"
+    assert (primary.calls, fallback.calls) == (1, 1)
+
+
+def test_other_errors_are_raised_without_falling_back():
+    primary, fallback = FakeModel("fast", ValueError("bad prompt")), FakeModel("slow")
+    with pytest.raises(ValueError):
+        router(primary, fallback).call([])
+    assert fallback.calls == 0
+
+
+def test_saturated_primary_falls_back():
+    primary, fallback = FakeModel("fast"), FakeModel("slow")
+    limiter = ModelLimiter("fast", 1, queue_timeout=0.01)
+    with limiter.slot():
+        assert router(primary, fallback, primary_limiter=limiter).call([]) == "answer from slow"
+    assert primary.calls == 0
+
+
+def test_last_model_error_is_raised():
+    primary, fallback = FakeModel("fast", RateLimitError("429")), FakeModel("slow", RateLimitError("429"))
+    with pytest.raises(RateLimitError):
+        router(primary, fallback).call([])
+    assert (primary.calls, fallback.calls) == (1, 1)
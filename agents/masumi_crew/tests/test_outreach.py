@@ -0,0 +1,86 @@
+import json
+
+from masumi_crew.governor import QuotaExceededError, RateGovernor
+from masumi_crew.outreach import OutreachPipeline, SendLog
+from masumi_crew.tools.registry import registry
+
+
+class FakeLLM:
+    def __init__(self, response):
+        self.response = response
+
+    def call(self, messages, *args, **kwargs):
+        return self.response
+
+
+def pipeline(tmp_path, response=""):
+    tmp_path.mkdir(parents=True, exist_ok=True)
+    return OutreachPipeline(FakeLLM(response), send_log=SendLog(str(tmp_path / "outreach.db")), governor=RateGovernor({}))
+
+
+def test_drafts_are_matched_by_recipient_email_not_position(tmp_path):
+    contacts = [
+        {"first_name": "Ada", "email": "ada@x.com"},
+        {"first_name": "Bo", "email": "bo@y.com"},
+        {"first_name": "Cy", "email": "cy@z.com"},
+    ]
+    response = json.dumps([
+        {"recipient_email": " BO@y.com", "subject": "For Bo", "body": "Hi Bo"},
+        {"recipient_email": "ada@x.com", "subject": "For Ada", "body": "Hi Ada"},
+        {"recipient_email": "someone@else.com", "subject": "Stray", "body": "?"},
+    ])
+    emails = pipeline(tmp_path, response).write_emails(contacts, "pitch")
+    assert [(email["recipient_email"], email["subject"]) for email in emails] == [
+        ("ada@x.com", "For Ada"),
+        ("bo@y.com", "For Bo"),
+        # No draft came back for Cy, so Cy gets the generic email
+        ("cy@z.com", "Quick intro for your company"),
+    ]
+
+
+class FakeToolset:
+    def __init__(self, error=None):
+        self.error = error
+        self.sent = []
+
+    def execute_action(self, action, params):
+        self.sent.append(params["recipient_email"])
+        if self.error:
+            raise self.error
+        return {"successful": True}
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def send_twice(tmp_path, monkeypatch, error):
+    toolset = FakeToolset(error)
+    monkeypatch.setattr(registry, "_toolset", toolset)
+    contacts = [{"first_name": "Ada", "email": "ada@x.com"}]
+    first = pipeline(tmp_path).run("job-1", contacts, "pitch")
+    # A retry of the job goes through the same send log
+    toolset.error = None
+    second = pipeline(tmp_path).run("job-1", contacts, "pitch")
+    return first[0]["status"], second[0]["status"], toolset.sent
+
+
+def test_timeout_after_the_request_is_in_doubt_and_not_resent(tmp_path, monkeypatch):
+    first, second, sent = send_twice(tmp_path, monkeypatch, TimeoutError("read timed out"))
+    assert (first, second) == ("in_doubt", "in_doubt")
+    assert sent == ["ada@x.com"]
+
+
+def test_connection_reset_is_in_doubt(tmp_path, monkeypatch):
+    first, _, sent = send_twice(tmp_path, monkeypatch, ConnectionResetError("reset by peer"))
+    assert first == "in_doubt"
+    assert sent == ["ada@x.com"]
+
+
+def test_errors_known_to_send_nothing_are_retried(tmp_path, monkeypatch):
+    for error in (QuotaExceededError("quota"), HTTPError(422)):
+        first, second, sent = send_twice(tmp_path / type(error).__name__, monkeypatch, error)
+        assert (first, second) == ("failed", "sent")
+        assert sent == ["ada@x.com", "ada@x.com"]
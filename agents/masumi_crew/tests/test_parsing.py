@@ -0,0 +1,36 @@
+import pytest
+
+from masumi_crew.models import Contact
+from masumi_crew.parsing import iter_records, parse_contacts, repair_json
+
+
+def test_repair_leaves_colons_inside_strings_alone():
+    source = '{"body": "Hello, Note: call me", "subject": "s",}'
+    assert repair_json(source) == {"body": "Hello, Note: call me", "subject": "s"}
+
+
+def test_repair_leaves_apostrophes_inside_strings_alone():
+    source = """{"first_name": "it's", "b": 'x'}"""
+    assert repair_json(source) == {"first_name": "it's", "b": "x"}
+
+
+@pytest.mark.parametrize("source, expected", [
+    ("{name: 'Ada', active: True, title: None}", {"name": "Ada", "active": True, "title": None}),
+    ("{'first_name': 'O\\'Brien', 'tags': ['a', 'b',],}", {"first_name": "O'Brien", "tags": ["a", "b"]}),
+    ("{“first_name”: “Ada”, “note”: “x, y: z”}", {"first_name": "Ada", "note": "x, y: z"}),
+    ("{'quote': 'she said \"hi\"'}", {"quote": 'she said "hi"'}),
+    ('{"count": 3, "ratio": 1e-3, "ok": true,\n}', {"count": 3, "ratio": 1e-3, "ok": True}),
+    ('{"text": "True, None and False stay as words"}', {"text": "True, None and False stay as words"}),
+])
+def test_repair_fixes_llm_formatting(source, expected):
+    assert repair_json(source) == expected
+
+
+def test_records_stream_across_chunks():
+    chunks = ['Here you go: [{"first_name": "it', "'s\", \"email\": 'a@b.c'},", ' {first_name: "Bo",}]']
+    assert [contact.first_name for contact in iter_records(chunks, Contact)] == ["it's", "Bo"]
+
+
+def test_parse_contacts_with_apostrophes_and_colons():
+    output = """[{"first_name": "D'Arcy", "title": "VP: Sales",}, {'first_name': 'Ann', 'email': None}]"""
+    assert [contact.first_name for contact in parse_contacts(output)] == ["D'Arcy", "Ann"]
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+from masumi.config import Config
+
+from masumi_crew.governor import RateGovernor
+from payment_poller import PaymentPoller
+
+
+def poll(payment):
+    """Runs one poll_once over a single watched payment listed as payment; returns the on_paid calls."""
+    paid, states = [], []
+
+    async def on_paid(job_id, payment_id):
+        paid.append((job_id, payment_id))
+
+    async def run():
+        poller = PaymentPoller(
+            Config(payment_service_url="http://payments.test", payment_api_key="key"),
+            "agent",
+            on_paid,
+            on_state=lambda job_id, payment_id, state: states.append(state),
+            governor=RateGovernor({}),
+        )
+
+        async def check_payment_status(limit=10):
+            return {"data": {"Payments": [{"blockchainIdentifier": "pay-1", **payment}]}}
+
+        poller._client.check_payment_status = check_payment_status
+        poller.watch("pay-1", "job-1")
+        due = await poller.poll_once()
+        await asyncio.sleep(0)
+        return due, poller.pending
+
+    due, pending = asyncio.run(run())
+    assert due == 1
+    return paid, pending, states
+
+
+@pytest.mark.parametrize("payment", [
+    {"onChainState": "FundsLocked"},
+    {"onChainState": "Complete"},
+    {"onChainState": None, "NextAction": {"requestedAction": "PaymentComplete"}},
+    {"onChainState": None, "NextAction": {"requestedAction": "None"}},
+])
+def test_paid_states_start_the_job(payment):
+    paid, pending, states = poll(payment)
+    assert paid == [("job-1", "pay-1")]
+    assert pending == 0
+    assert states == [payment["onChainState"]]
+
+
+@pytest.mark.parametrize("payment", [
+    {"onChainState": None},
+    {"onChainState": None, "NextAction": None},
+    {"onChainState": "FundsOrDatumInvalid", "NextAction": {"requestedAction": "WaitingForExternalAction"}},
+])
+def test_unpaid_states_keep_the_payment_watched(payment):
+    paid, pending, _ = poll(payment)
+    assert paid == []
+    assert pending == 1
+
+
+def test_payment_missing_from_the_listing_is_checked_again():
+    paid, pending, states = poll({"blockchainIdentifier": "someone-else", "onChainState": "FundsLocked"})
+    assert (paid, pending, states) == ([], 1, [])
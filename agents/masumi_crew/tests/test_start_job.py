@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from job_store import SQLiteJobStore
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    # Importing the API module creates its stores; keep them in tmp_path
+    monkeypatch.setenv("JOB_STORE_URL", f"sqlite:///{tmp_path}/import.db")
+    monkeypatch.setenv("PAYMENT_SERVICE_URL", "http://payments.test/api/v1")
+    monkeypatch.setenv("PAYMENT_API_KEY", "key")
+    masumi_deploy = pytest.importorskip("masumi_deploy")
+
+    monkeypatch.setattr(masumi_deploy, "jobs", SQLiteJobStore(str(tmp_path / "jobs.db")))
+    return masumi_deploy
+
+
+def find(api, input_hash="hash-1"):
+    return asyncio.run(api._find_duplicate(input_hash))
+
+
+@pytest.mark.parametrize("status", ["awaiting_payment", "queued", "running", "completing"])
+def test_in_flight_job_is_returned(api, status):
+    api.jobs.create("job-1", status=status, input_hash="hash-1")
+    assert find(api)["job_id"] == "job-1"
+    assert find(api, "other-hash") is None
+
+
+def test_completed_job_is_reused_within_the_window(api, clock):
+    api.jobs.create("job-1", status="running", input_hash="hash-1")
+    api.jobs.update("job-1", status="completed")
+    clock.now += api.START_JOB_REUSE_SECONDS
+    assert find(api)["job_id"] == "job-1"
+    clock.now += 1
+    assert find(api) is None
+
+
+def test_failed_job_is_not_reused(api):
+    api.jobs.create("job-1", status="running", input_hash="hash-1")
+    api.jobs.update("job-1", status="failed")
+    assert find(api) is None
+
+
+def test_latest_matching_job_wins(api, clock):
+    api.jobs.create("job-1", status="running", input_hash="hash-1")
+    api.jobs.update("job-1", status="completed")
+    clock.now += 1
+    api.jobs.create("job-2", status="awaiting_payment", input_hash="hash-1")
+    assert find(api)["job_id"] == "job-2"
+
+
+def test_waits_for_a_concurrent_call_creating_the_payment_request(api):
+    api.jobs.create("job-1", status="starting", input_hash="hash-1")
+
+    async def run():
+        async def payment_request_created():
+            await asyncio.sleep(0.3)
+            api.jobs.update("job-1", status="awaiting_payment")
+
+        created = asyncio.create_task(payment_request_created())
+        duplicate = await api._find_duplicate("hash-1")
+        await created
+        return duplicate
+
+    assert asyncio.run(run())["job_id"] == "job-1"
+
+
+def test_stale_reservation_is_ignored(api, clock):
+    api.jobs.create("job-1", status="starting", input_hash="hash-1")
+    clock.now += api.START_JOB_RESERVATION_SECONDS
+    assert find(api) is None
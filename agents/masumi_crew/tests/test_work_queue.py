@@ -0,0 +1,69 @@
+from work_queue import SQLiteWorkQueue
+
+
+def queue(tmp_path, **kwargs):
+    return SQLiteWorkQueue(str(tmp_path / "queue.db"), lease_seconds=60, **kwargs)
+
+
+def test_enqueue_is_idempotent_until_the_job_is_done(tmp_path, clock):
+    q = queue(tmp_path)
+    assert q.enqueue("job-1", {"payment_id": "pay-1"})
+    assert not q.enqueue("job-1", {"payment_id": "pay-1"})
+
+    message = q.claim("w1")
+    assert (message["job_id"], message["payload"], message["attempts"]) == ("job-1", {"payment_id": "pay-1"}, 1)
+    assert not q.enqueue("job-1")
+    assert q.ack(message["id"], "w1")
+    # A retried job is queued again with a fresh attempt count
+    assert q.enqueue("job-1", {"payment_id": "pay-1"})
+    assert q.claim("w1")["attempts"] == 1
+
+
+def test_messages_are_leased_to_one_worker_in_order(tmp_path, clock):
+    q = queue(tmp_path)
+    q.enqueue("job-1")
+    clock.now += 1
+    q.enqueue("job-2")
+    assert q.claim("w1")["job_id"] == "job-1"
+    assert q.claim("w2")["job_id"] == "job-2"
+    assert q.claim("w3") is None
+    assert q.stats() == {"ready": 0, "leased": 2, "expired": 0, "done": 0}
+
+
+def test_expired_lease_goes_to_the_next_worker(tmp_path, clock):
+    q = queue(tmp_path)
+    q.enqueue("job-1")
+    first = q.claim("w1")
+    clock.now += 30
+    assert q.heartbeat(first["id"], "w1")
+    clock.now += 59
+    assert q.claim("w2") is None
+
+    clock.now += 2
+    assert q.stats()["expired"] == 1
+    second = q.claim("w2")
+    assert (second["job_id"], second["attempts"]) == ("job-1", 2)
+    # The first worker lost the lease: it may neither extend nor ack it
+    assert not q.heartbeat(first["id"], "w1")
+    assert not q.ack(first["id"], "w1")
+    assert q.ack(second["id"], "w2")
+
+
+def test_release_hands_the_message_back_without_using_an_attempt(tmp_path, clock):
+    q = queue(tmp_path)
+    q.enqueue("job-1")
+    message = q.claim("w1")
+    assert q.release(message["id"], "w1", delay=10)
+    assert q.claim("w2") is None
+    clock.now += 10
+    assert q.claim("w2")["attempts"] == 1
+
+
+def test_done_messages_are_deleted_after_the_ttl(tmp_path, clock):
+    q = queue(tmp_path, ttl_seconds=100)
+    q.enqueue("job-1")
+    q.ack(q.claim("w1")["id"], "w1")
+    clock.now += 301
+    q.enqueue("job-2")
+    q.claim("w1")
+    assert q.stats()["done"] == 0
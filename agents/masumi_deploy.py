@@ -1,13 +1,31 @@
+import asyncio
+import json
+import math
 import os
+import time
 import uvicorn
 import uuid
 from dotenv import load_dotenv
-from fastapi import FastAPI, Query, HTTPException
+from fastapi import FastAPI, Query, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field, field_validator
+from typing import Optional
 from masumi.config import Config
 from masumi.payment import Payment, Amount
-from crew_definition import ResearchCrew
+from admission import AdmissionController, OverCapacityError
 from logging_config import setup_logging
+from job_runner import JobRunner
+from job_store import FINISHED_STATUSES, create_job_store
+from job_events import JobEventBus, parse_last_event_id
+from masumi_crew.checkpoints import get_checkpoint_store
+from masumi_crew.governor import get_governor
+from masumi_crew.models import Contact, JobResult
+from masumi_crew.parsing import contacts_guardrail, parse_contacts
+from masumi_crew.telemetry import install_crewai_listeners, record, registry as metrics, span
+from masumi_crew.crew_pool import CrewPool, reset_crew
+from payment_poller import PaymentPoller
+from warmup import Warmup
+from work_queue import create_work_queue
 
 #### This is the what you want to deploy to Digital Ocean ####
 #### it is a few versions behind the one in local ####
@@ -34,10 +52,46 @@ app = FastAPI(
 )
 
 # ─────────────────────────────────────────────────────────────────────────────
-# Temporary in-memory job store (DO NOT USE IN PRODUCTION)
+# Job Store
 # ─────────────────────────────────────────────────────────────────────────────
-jobs = {}
-payment_instances = {}
+# Jobs are persisted (JOB_STORE_URL, default sqlite:///jobs.db) so they survive
+# restarts and are visible to every uvicorn worker. Finished jobs are evicted
+# after JOB_TTL_SECONDS.
+jobs = create_job_store()
+
+# Crew runs execute on a bounded worker pool instead of the event loop.
+# Tune with CREW_MAX_WORKERS, CREW_MAX_QUEUE, CREW_JOB_TIMEOUT and CREW_WORKER_MODE.
+crew_runner = JobRunner.from_env()
+
+# CREW_EXECUTION=local runs paid jobs on this node's crew_runner. With
+# CREW_EXECUTION=queue they go on the work queue (WORK_QUEUE_URL) instead and
+# crew_worker.py processes run them, so API and crew nodes scale separately.
+CREW_EXECUTION = os.getenv("CREW_EXECUTION", "local")
+work_queue = create_work_queue() if CREW_EXECUTION == "queue" else None
+
+# Per-job step outputs (contacts found, emails written, payment completion),
+# so /retry_job and redelivered queue jobs resume after the last completed step.
+# Every node shares CHECKPOINT_PATH; an empty value turns checkpointing off.
+checkpoints = get_checkpoint_store()
+
+# Calls to the payment service, the poller's included, are paced by the
+# "masumi" limits of the shared rate governor (config/limits.yaml)
+governor = get_governor()
+
+# Progress events per job, streamed over SSE on /jobs/{job_id}/events
+job_events = JobEventBus(
+    replay_size=int(os.getenv("JOB_EVENTS_REPLAY_SIZE", "500")),
+    jobs=jobs,
+    poll_seconds=float(os.getenv("JOB_EVENTS_POLL_SECONDS", "2"))
+)
+
+# Stage timings (payment, crew, task, tool, llm, enrichment) are exported on /metrics.
+# Spans recorded inside process-mode workers stay in those processes.
+metrics.gauge("masumi_jobs_in_flight", "Crew runs currently executing.").set_function(lambda: crew_runner.running)
+metrics.gauge("masumi_jobs_queued", "Crew runs waiting for a worker.").set_function(lambda: crew_runner.queued)
+metrics.gauge(
+    "masumi_jobs_zombie", "Crew runs that timed out or were cancelled but still hold a worker."
+).set_function(lambda: crew_runner.zombies)
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Initialize Masumi Payment Config
@@ -64,20 +118,63 @@ class StartJobRequest(BaseModel):
             }
         }
 
+# Largest batch /start_jobs accepts; every item becomes one child job
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+
+class StartJobsRequest(BaseModel):
+    identifier_from_purchaser: str
+    items: list[dict[str, str]] = Field(..., min_length=1)
+
+    @field_validator("items")
+    @classmethod
+    def check_items(cls, items):
+        if len(items) > BATCH_MAX_ITEMS:
+            raise ValueError(f"At most {BATCH_MAX_ITEMS} items per batch")
+        if any("text" not in item for item in items):
+            raise ValueError("Every item needs a text field")
+        return items
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "identifier_from_purchaser": "example_purchaser_123",
+                "items": [
+                    {"text": "Seed-stage investors focused on B2B SaaS"},
+                    {"text": "Angel investors in fintech"}
+                ]
+            }
+        }
+
 class ProvideInputRequest(BaseModel):
     job_id: str
 
+class RetryJobRequest(BaseModel):
+    job_id: str
+
 class ApolloEmailCrew:
-    def __init__(self):
-        self.toolset = ComposioToolSet()
-        self.apollo_tools = self.toolset.get_tools(apps=[App.APOLLO])
-        self.gmail_tools = self.toolset.get_tools(apps=[App.GMAIL])
-        self.brave_search = BraveSearchTool(n_results=3)
+    def __init__(self, on_event=None):
+        # crewai and Composio take seconds to import, so they load with the first crew, not the app
+        from crewai import Agent, Crew, Task
+        from composio_crewai import App
+        from masumi_crew.tools.registry import get_tools
+        from masumi_crew.model_router import get_model_router
+        from masumi_crew.outreach import OutreachPipeline
+
+        # on_event(event_type, data) receives progress updates for /jobs/{job_id}/events
+        self.on_event = on_event
+
+        # Each step's output is checkpointed per job, so a retried job resumes
+        # after the last step that completed
+        self.checkpoints = get_checkpoint_store()
+
+        # Tools come from the process-wide registry, loaded once and shared across jobs
+        self.apollo_tools = get_tools(App.APOLLO)
         
-        self.llm = LLM(
-            model="gpt-4-turbo",
-            max_tokens=4000,
-        )
+        # Models per step come from config/models.yaml: a small fast model for the
+        # Apollo search and JSON extraction, the stronger one only for email copy.
+        # Identical prompts are answered from the on-disk LLM cache.
+        router = get_model_router()
+        self.llm = router.llm_for("apollo_search")
         
         self.apollo_agent = Agent(
             role="Lead Prospector",
@@ -88,15 +185,6 @@ class ApolloEmailCrew:
             llm=self.llm
         )
         
-        self.email_agent = Agent(
-            role="Email Outreach Specialist",
-            goal="Send personalized emails to contacts using Gmail API",
-            backstory="Expert in crafting and sending professional outreach emails with high response rates.",
-            tools=self.gmail_tools,
-            verbose=True,
-            llm=self.llm
-        )
-        
         self.search_task = Task(
             description="""
             Search for venture capitalists and investors in the blockchain/web3 space using Apollo.
@@ -121,56 +209,135 @@ class ApolloEmailCrew:
             Find blockchain/web3 investors. If the Apollo API fails, compile a list from your general knowledge.
             """,
             agent=self.apollo_agent,
+            callback=self._on_search_done,
+            # Validates the JSON contacts and re-asks the agent (bounded) if none parse
+            guardrail=contacts_guardrail,
             expected_output="JSON array containing blockchain/web3 investors with their first name, last name, company, and linkedin URL",
             llm=self.llm
         )
         
-        self.email_task = Task(
-            description="""
-            Send personalized emails to each contact in the enriched contacts list.
-            
-            For each contact, create a personalized email that includes:
-            1. Their name and company
-            2. A brief introduction
-            3. The value proposition
-            4. A clear call to action
-            
-            Use the GMAIL_SEND_EMAIL tool with the following parameters:
-            - user_id: 'me'
-            - recipient_email: The contact's email
-            - subject: Personalized subject line
-            - body: The email content
-            - is_html: true
-            
-            Return a status report for each email sent.
-            """,
-            agent=self.email_agent,
-            expected_output="List of email sending status reports",
-            llm=self.llm
+        # Emails are written in batched LLM calls and sent by a deterministic
+        # pipeline instead of an agent calling GMAIL_SEND_EMAIL once per contact
+        self.outreach = OutreachPipeline(
+            router.llm_for("outreach_email"),
+            batch_size=int(os.getenv("OUTREACH_BATCH_SIZE", "10")),
+            max_workers=int(os.getenv("OUTREACH_CONCURRENCY", "4"))
         )
         
         self.crew = Crew(
-            agents=[self.apollo_agent, self.email_agent],
-            tasks=[self.search_task, self.email_task],
+            agents=[self.apollo_agent],
+            tasks=[self.search_task],
             verbose=True,
             llm=self.llm
         )
     
-    def execute(self, inputs=None):
-        return self.crew.kickoff(inputs)
-    
+    def reset(self):
+        """ Clears per-job state so crew_pool can hand this crew to the next job """
+        self.on_event = None
+        reset_crew(self.crew)
+
+    def _emit(self, event_type, data=None):
+        if self.on_event:
+            self.on_event(event_type, data)
+
+    def _on_search_done(self, output):
+        contacts = parse_contacts(output)
+        self._emit("contacts_found", [contact.model_dump(exclude_none=True) for contact in contacts])
+
+    def _search(self, inputs, job_id=None):
+        """ Runs the Apollo search, or rebuilds its output from the job's checkpoint """
+        from crewai.crews.crew_output import CrewOutput
+        from crewai.tasks.task_output import TaskOutput
+
+        saved = self.checkpoints.get(job_id, "contacts") if self.checkpoints and job_id else None
+        if saved is not None:
+            # An earlier attempt of this job already found the contacts
+            self._emit("contacts_found", saved)
+            search_output = TaskOutput(
+                description=self.search_task.description,
+                agent=self.apollo_agent.role,
+                raw=json.dumps(saved)
+            )
+            return CrewOutput(raw=search_output.raw, tasks_output=[search_output]), [Contact(**c) for c in saved]
+
+        with span("crew", "apollo_search") as crew_span:
+            result = self.crew.kickoff(inputs)
+            crew_span.add_usage(result.token_usage)
+        contacts = parse_contacts(result.tasks_output[0])
+        if self.checkpoints and job_id:
+            self.checkpoints.save(job_id, "contacts", [contact.model_dump(exclude_none=True) for contact in contacts])
+        return result, contacts
+
+    def execute(self, inputs=None, job_id=None):
+        from crewai.tasks.task_output import TaskOutput
+
+        inputs = inputs or {}
+        result, contacts = self._search(inputs, job_id)
+
+        with span("task", "outreach"):
+            statuses = self.outreach.run(
+                job_id or str(uuid.uuid4()),
+                [contact.model_dump(exclude_none=True) for contact in contacts],
+                pitch=str(inputs.get("text", "")),
+                on_status=lambda status: self._emit("email_status", status)
+            )
+
+        # Report the sends as the crew's final task output, as the email agent used to
+        email_output = TaskOutput(
+            description="Send personalized outreach emails to each contact",
+            agent="Email Outreach Specialist",
+            raw=json.dumps(statuses)
+        )
+        result.tasks_output.append(email_output)
+        result.raw = email_output.raw
+        result.json_dict = JobResult(contacts=contacts, emails=statuses).model_dump()
+        return result
+
+
+# Pre-built crews, one per worker, reused across jobs instead of rebuilt per job
+crew_pool = CrewPool(ApolloEmailCrew, size=crew_runner.max_workers, reset=ApolloEmailCrew.reset, name="apollo_email")
+
+
+def load_crew_stack():
+    """ Imports crewai and Composio and hooks crewai's events into /metrics """
+    import crewai, composio_crewai  # noqa: F401
+    from masumi_crew import llm_cache, model_router, outreach  # noqa: F401
+    install_crewai_listeners()
+
+# The crew stack loads in the background once the server is listening, so
+# /health and /availability answer immediately; /ready flips when it is done.
+warmup = Warmup()
+# In queue mode crews only run on crew_worker.py nodes
+if work_queue is None:
+    warmup.step("crew_stack", load_crew_stack)
+    # Process workers build their own crews; only thread workers share this pool
+    if crew_runner.mode == "thread":
+        warmup.step("crew_pool", crew_pool.warm, required=False)
+metrics.gauge("masumi_ready", "1 once start-up warm-up has finished.").set_function(lambda: int(warmup.ready))
+
+@app.on_event("startup")
+async def start_warmup():
+    warmup.start()
+
+def run_apollo_email_crew(input_data: str, on_event=None, job_id=None):
+    """ Runs a job on a pooled crew inside a crew_runner worker """
+    with crew_pool.lease() as crew:
+        crew.on_event = on_event
+        return crew.execute({"text": input_data}, job_id=job_id)
+
 # ─────────────────────────────────────────────────────────────────────────────
 # CrewAI Task Execution
 # ─────────────────────────────────────────────────────────────────────────────
-async def execute_crew_task(input_data: str) -> str:
+async def execute_crew_task(input_data: str, on_event=None, job_id=None) -> str:
     """ Execute a CrewAI task with Research and Writing Agents """
     # logger.info(f"Starting CrewAI task with input: {input_data}")
     # crew = ResearchCrew(logger=logger)
     # result = crew.crew.kickoff(inputs={"text": input_data})
     logger.info(f"Starting CrewAI task with input: {input_data}")
-    crew = ApolloEmailCrew()
-    inputs = {"text": input_data}
-    result = crew.execute(inputs)
+    # Event callbacks cannot cross into a process pool, so only thread workers stream progress
+    if crew_runner.mode != "thread":
+        on_event = None
+    result = await crew_runner.run(run_apollo_email_crew, input_data, on_event, job_id)
     logger.info("CrewAI task completed successfully")
     
     
@@ -179,6 +346,63 @@ async def execute_crew_task(input_data: str) -> str:
 # ─────────────────────────────────────────────────────────────────────────────
 # 1) Start Job (MIP-003: /start_job)
 # ─────────────────────────────────────────────────────────────────────────────
+# Retried /start_job calls (same purchaser, same input_data, so the same
+# input hash) attach to the job the first call started instead of paying and
+# running again. A completed job is reused for START_JOB_REUSE_SECONDS after
+# it finished; 0 turns reuse off.
+START_JOB_REUSE_SECONDS = float(os.getenv("START_JOB_REUSE_SECONDS", "3600"))
+# How long a job may stay "starting" while its payment request is created
+START_JOB_RESERVATION_SECONDS = 60
+IN_FLIGHT_STATUSES = ("awaiting_payment", "queued", "running", "completing")
+
+start_job_duplicates = metrics.counter(
+    "masumi_start_job_duplicates_total", "Duplicate /start_job calls answered with an existing job.", ("outcome",)
+)
+
+def _start_job_response(job: dict) -> dict:
+    payment_request = job["payment_request"]
+    return {
+        "status": "success",
+        "job_id": job["job_id"],
+        "blockchainIdentifier": payment_request["blockchainIdentifier"],
+        "submitResultTime": payment_request["submitResultTime"],
+        "unlockTime": payment_request["unlockTime"],
+        "externalDisputeUnlockTime": payment_request["externalDisputeUnlockTime"],
+        "agentIdentifier": job["agent_identifier"],
+        "sellerVkey": os.getenv("SELLER_VKEY"),
+        "identifierFromPurchaser": job["identifier_from_purchaser"],
+        "amounts": job["amounts"],
+        "input_hash": job["input_hash"]
+    }
+
+async def _find_duplicate(input_hash: str):
+    """ The job an identical /start_job already started, if it is still running or recently completed """
+    deadline = time.time() + START_JOB_RESERVATION_SECONDS
+    while True:
+        now = time.time()
+        candidates = jobs.find(input_hash=input_hash)
+        for job in reversed(candidates):
+            if job["status"] in IN_FLIGHT_STATUSES:
+                return job
+            if job["status"] == "completed" and now - (job["finished_at"] or 0) <= START_JOB_REUSE_SECONDS:
+                return job
+        # A concurrent call is still creating the payment request for this input; wait for it
+        starting = any(
+            job["status"] == "starting" and now - job["created_at"] < START_JOB_RESERVATION_SECONDS
+            for job in candidates
+        )
+        if not starting or now >= deadline:
+            return None
+        await asyncio.sleep(0.25)
+
+def _reject(error: OverCapacityError) -> None:
+    logger.warning(f"Rejected job request: {error}")
+    raise HTTPException(
+        status_code=429,
+        detail=str(error),
+        headers={"Retry-After": str(math.ceil(error.retry_after))}
+    )
+
 @app.post("/start_job")
 async def start_job(data: StartJobRequest):
     """ Initiates a job and creates a payment request """
@@ -192,7 +416,6 @@ async def start_job(data: StartJobRequest):
         input_text = data.input_data["text"]
         truncated_input = input_text[:100] + "..." if len(input_text) > 100 else input_text
         logger.info(f"Received job request with input: '{truncated_input}'")
-        logger.info(f"Starting job {job_id} with agent {agent_identifier}")
 
         # Define payment amounts
         payment_amount = os.getenv("PAYMENT_AMOUNT", "10000000")  # Default 10 ADA
@@ -209,45 +432,64 @@ async def start_job(data: StartJobRequest):
             identifier_from_purchaser=data.identifier_from_purchaser,
             input_data=data.input_data
         )
-        
+
+        # The input hash covers identifier_from_purchaser and input_data
+        duplicate = await _find_duplicate(payment.input_hash)
+        if duplicate is not None:
+            outcome = "reused" if duplicate["status"] == "completed" else "attached"
+            start_job_duplicates.inc(outcome=outcome)
+            logger.info(f"Duplicate start_job, returning job {duplicate['job_id']} ({outcome})")
+            return {**_start_job_response(duplicate), "duplicate": outcome}
+
+        # Turn the job away before the purchaser is asked to pay for it
+        admission.check()
+
+        # Reserve the input before the payment round trip so concurrent retries wait for this job
+        logger.info(f"Starting job {job_id} with agent {agent_identifier}")
+        jobs.create(
+            job_id,
+            status="starting",
+            payment_status="pending",
+            agent_identifier=agent_identifier,
+            input_data=data.input_data,
+            input_hash=payment.input_hash,
+            amounts=[{"amount": amount.amount, "unit": amount.unit} for amount in amounts],
+            result=None,
+            identifier_from_purchaser=data.identifier_from_purchaser
+        )
+
         logger.info("Creating payment request...")
-        payment_request = await payment.create_payment_request()
+        try:
+            with span("payment", "create_payment_request"):
+                async with governor.limit_async("masumi"):
+                    payment_request = await payment.create_payment_request()
+        except Exception:
+            jobs.delete(job_id)
+            raise
         payment_id = payment_request["data"]["blockchainIdentifier"]
         payment.payment_ids.add(payment_id)
         logger.info(f"Created payment request with ID: {payment_id}")
 
         # Store job info (Awaiting payment)
-        jobs[job_id] = {
-            "status": "awaiting_payment",
-            "payment_status": "pending",
-            "payment_id": payment_id,
-            "input_data": data.input_data,
-            "result": None,
-            "identifier_from_purchaser": data.identifier_from_purchaser
-        }
-
-        async def payment_callback(payment_id: str):
-            await handle_payment_status(job_id, payment_id)
+        job = jobs.update(
+            job_id,
+            status="awaiting_payment",
+            payment_id=payment_id,
+            payment_request={
+                key: payment_request["data"][key]
+                for key in ("blockchainIdentifier", "submitResultTime", "unlockTime", "externalDisputeUnlockTime")
+            }
+        )
 
-        # Start monitoring the payment status
-        payment_instances[job_id] = payment
+        # Hand the payment to the shared poller instead of a per-job monitor
         logger.info(f"Starting payment status monitoring for job {job_id}")
-        await payment.start_status_monitoring(payment_callback)
+        payment_poller.watch(payment_id, job_id)
+        job_events.publish(job_id, "awaiting_payment", {"payment_id": payment_id})
         
         # Return the response in the required format
-        return {
-            "status": "success",
-            "job_id": job_id,
-            "blockchainIdentifier": payment_request["data"]["blockchainIdentifier"],
-            "submitResultTime": payment_request["data"]["submitResultTime"],
-            "unlockTime": payment_request["data"]["unlockTime"],
-            "externalDisputeUnlockTime": payment_request["data"]["externalDisputeUnlockTime"],
-            "agentIdentifier": agent_identifier,
-            "sellerVkey": os.getenv("SELLER_VKEY"),
-            "identifierFromPurchaser": data.identifier_from_purchaser,
-            "amounts": amounts,
-            "input_hash": payment.input_hash
-        }
+        return _start_job_response(job)
+    except OverCapacityError as e:
+        _reject(e)
     except KeyError as e:
         logger.error(f"Missing required field in request: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -261,47 +503,326 @@ async def start_job(data: StartJobRequest):
             detail="Input_data or identifier_from_purchaser is missing, invalid, or does not adhere to the schema."
         )
 
+# ─────────────────────────────────────────────────────────────────────────────
+# 1b) Start a Batch of Jobs with One Payment
+# ─────────────────────────────────────────────────────────────────────────────
+@app.post("/start_jobs")
+async def start_jobs(data: StartJobsRequest):
+    """
+    Creates one job per item behind a single payment request whose input
+    hash covers every item. All jobs start once that payment is confirmed,
+    and the payment is completed once every job finished; follow them with
+    /batch_status or per job with /status.
+
+    The amounts returned are the per-job price times the number of items.
+    The payment service charges the price the agent is registered with, so
+    agents that sell batches need pricing there that covers a whole batch.
+    """
+    try:
+        batch_id = str(uuid.uuid4())
+        agent_identifier = os.getenv("AGENT_IDENTIFIER")
+        admission.check(slots=len(data.items))
+        logger.info(f"Starting batch {batch_id} with {len(data.items)} jobs for agent {agent_identifier}")
+
+        payment_amount = os.getenv("PAYMENT_AMOUNT", "10000000")
+        payment_unit = os.getenv("PAYMENT_UNIT", "lovelace")
+        amounts = [{"amount": str(int(payment_amount) * len(data.items)), "unit": payment_unit}]
+
+        # The input hash covers every item, so the purchaser pays for exactly this batch
+        payment = Payment(
+            agent_identifier=agent_identifier,
+            config=config,
+            identifier_from_purchaser=data.identifier_from_purchaser,
+            input_data={"items": data.items}
+        )
+
+        # Reserve the batch and its jobs before the payment round trip, so
+        # admission counts the whole batch while its payment request is created
+        job_ids = [
+            jobs.create(
+                str(uuid.uuid4()),
+                status="starting",
+                payment_status="pending",
+                batch_id=batch_id,
+                agent_identifier=agent_identifier,
+                input_data=item,
+                result=None,
+                identifier_from_purchaser=data.identifier_from_purchaser
+            )["job_id"]
+            for item in data.items
+        ]
+        jobs.create(
+            batch_id,
+            kind="batch",
+            status="starting",
+            payment_status="pending",
+            job_ids=job_ids,
+            agent_identifier=agent_identifier,
+            input_data={"items": data.items},
+            input_hash=payment.input_hash,
+            amounts=amounts,
+            identifier_from_purchaser=data.identifier_from_purchaser
+        )
+
+        try:
+            with span("payment", "create_payment_request"):
+                async with governor.limit_async("masumi"):
+                    payment_request = await payment.create_payment_request(
+                        metadata=json.dumps({"batch_id": batch_id, "items": len(data.items), "amounts": amounts})
+                    )
+        except Exception:
+            for job_id in [*job_ids, batch_id]:
+                jobs.delete(job_id)
+            raise
+        payment_id = payment_request["data"]["blockchainIdentifier"]
+        logger.info(f"Created payment request {payment_id} for batch {batch_id}")
+
+        # Every job carries the batch's payment; only the batch record is watched
+        for job_id in job_ids:
+            jobs.update(job_id, status="awaiting_payment", payment_id=payment_id)
+        batch = jobs.update(
+            batch_id,
+            status="awaiting_payment",
+            payment_id=payment_id,
+            payment_request={
+                key: payment_request["data"][key]
+                for key in ("blockchainIdentifier", "submitResultTime", "unlockTime", "externalDisputeUnlockTime")
+            }
+        )
+        payment_poller.watch(payment_id, batch_id)
+        job_events.publish(batch_id, "awaiting_payment", {"payment_id": payment_id})
+        for job_id in job_ids:
+            job_events.publish(job_id, "awaiting_payment", {"batch_id": batch_id})
+
+        response = _start_job_response(batch)
+        del response["job_id"]
+        return {**response, "batch_id": batch_id, "job_ids": job_ids}
+    except OverCapacityError as e:
+        _reject(e)
+    except Exception as e:
+        logger.error(f"Error in start_jobs: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=400,
+            detail="items or identifier_from_purchaser is missing, invalid, or does not adhere to the schema."
+        )
+
 # ─────────────────────────────────────────────────────────────────────────────
 # 2) Process Payment and Execute AI Task
 # ─────────────────────────────────────────────────────────────────────────────
+def _payment_for_job(job: dict) -> Payment:
+    """ Rebuilds the Payment for a job from the job store """
+    payment = Payment(
+        agent_identifier=job.get("agent_identifier") or os.getenv("AGENT_IDENTIFIER"),
+        config=config,
+        identifier_from_purchaser=job["identifier_from_purchaser"],
+        input_data=job["input_data"]
+    )
+    payment.payment_ids.add(job["payment_id"])
+    return payment
+
+async def run_paid_job(job: dict, payment_id: str) -> None:
+    """ Runs the crew for a paid job, completes its payment and stores the result """
+    job_id = job["job_id"]
+    logger.info(f"Input data: {job['input_data']}")
+    emit = job_events.emitter(job_id)
+    emit("running", {"payment_id": payment_id})
+
+    # Execute the AI task
+    started = time.perf_counter()
+    result = await execute_crew_task(job["input_data"], emit, job_id)
+    run_seconds = time.perf_counter() - started
+    result_dict = result.json_dict
+    print(f"Result: {result_dict}")
+    logger.info(f"Crew task completed for job {job_id}")
+
+    if job.get("batch_id"):
+        # The batch's payment is completed once, when its last job finished
+        job = jobs.update(job_id, status="completed", result=result, run_seconds=run_seconds)
+        emit("completed", {"job_id": job_id})
+        await settle_batch(job)
+        return
+
+    # Mark payment as completed on Masumi, unless an earlier attempt already did
+    # Use a shorter string for the result hash; the payment client only accepts strings
+    if checkpoints and checkpoints.get(job_id, "payment") is not None:
+        logger.info(f"Payment for job {job_id} was completed by an earlier attempt")
+    else:
+        with span("payment", "complete_payment"):
+            async with governor.limit_async("masumi"):
+                await _payment_for_job(job).complete_payment(payment_id, json.dumps(result_dict))
+        if checkpoints:
+            checkpoints.save(job_id, "payment", {"payment_id": payment_id})
+        logger.info(f"Payment completed for job {job_id}")
+
+    # Update job status
+    jobs.update(job_id, status="completed", payment_status="completed", result=result, run_seconds=run_seconds)
+    emit("completed", {"job_id": job_id})
+
+async def _fail_job(job_id: str, payment_id: str, error: Exception) -> None:
+    logger.error(f"Error processing payment {payment_id} for job {job_id}: {str(error)}", exc_info=True)
+    job = jobs.update(job_id, status="failed", error=str(error))
+    job_events.publish(job_id, "failed", {"error": str(error)})
+    await settle_batch(job)
+
+def _start_paid_job(job_id: str, payment_id: str) -> Optional[dict]:
+    """
+    Claims a job whose payment was confirmed. Queued for the crew workers,
+    or returned to be run here; None if it is no longer awaiting payment.
+    """
+    if work_queue is not None:
+        # Crew workers pick the job up from the queue
+        job = jobs.transition(job_id, "awaiting_payment", status="queued", payment_status="paid")
+        if job is None:
+            logger.info(f"Job {job_id} is no longer awaiting payment, skipping")
+            return None
+        record("payment", "wait", time.time() - job["created_at"])
+        work_queue.enqueue(job_id, {"payment_id": payment_id})
+        job_events.publish(job_id, "queued", {"payment_id": payment_id})
+        return None
+
+    # Claim the job; another worker may already have picked it up
+    job = jobs.transition(job_id, "awaiting_payment", status="running", payment_status="paid")
+    if job is None:
+        logger.info(f"Job {job_id} is no longer awaiting payment, skipping")
+        return None
+    record("payment", "wait", time.time() - job["created_at"])
+    return job
+
+async def _run_claimed_job(job: dict, payment_id: str) -> None:
+    try:
+        await run_paid_job(job, payment_id)
+    except Exception as e:
+        await _fail_job(job["job_id"], payment_id, e)
+
 async def handle_payment_status(job_id: str, payment_id: str) -> None:
     """ Executes CrewAI task after payment confirmation """
+    logger.info(f"Payment {payment_id} completed for job {job_id}, executing task...")
     try:
-        logger.info(f"Payment {payment_id} completed for job {job_id}, executing task...")
-        
-        # Update job status to running
-        jobs[job_id]["status"] = "running"
-        logger.info(f"Input data: {jobs[job_id]['input_data']}")
-
-        # Execute the AI task
-        result = await execute_crew_task(jobs[job_id]["input_data"])
-        result_dict = result.json_dict
-        print(f"Result: {result_dict}")
-        logger.info(f"Crew task completed for job {job_id}")
-        
-        # Mark payment as completed on Masumi
-        # Use a shorter string for the result hash
-        await payment_instances[job_id].complete_payment(payment_id, result_dict)
-        logger.info(f"Payment completed for job {job_id}")
+        job = _start_paid_job(job_id, payment_id)
+    except Exception as e:
+        await _fail_job(job_id, payment_id, e)
+        return
+    if job is not None:
+        await _run_claimed_job(job, payment_id)
+
+async def handle_batch_payment(batch_id: str, payment_id: str) -> None:
+    """ Starts every job of a batch once the batch's payment is confirmed """
+    batch = jobs.transition(batch_id, "awaiting_payment", status="running", payment_status="paid")
+    if batch is None:
+        logger.info(f"Batch {batch_id} is no longer awaiting payment, skipping")
+        return
+    logger.info(f"Payment {payment_id} completed for batch {batch_id}, starting {len(batch['job_ids'])} jobs")
+    job_events.publish(batch_id, "running", {"payment_id": payment_id})
+
+    claimed = []
+    for job_id in batch["job_ids"]:
+        try:
+            job = _start_paid_job(job_id, payment_id)
+        except Exception as e:
+            await _fail_job(job_id, payment_id, e)
+            continue
+        if job is not None:
+            claimed.append(job)
+    # Local runs share the crew runner's slots with every other job
+    await asyncio.gather(*(_run_claimed_job(job, payment_id) for job in claimed))
 
-        # Update job status
-        jobs[job_id]["status"] = "completed"
-        jobs[job_id]["payment_status"] = "completed"
-        jobs[job_id]["result"] = result
+async def retry_paid_job(job: dict) -> None:
+    await _run_claimed_job(job, job["payment_id"])
 
-        # Stop monitoring payment status
-        if job_id in payment_instances:
-            payment_instances[job_id].stop_status_monitoring()
-            del payment_instances[job_id]
+async def settle_batch(job: Optional[dict]) -> None:
+    """
+    Completes a batch's payment once, with the results of its jobs that
+    succeeded, when its last job finished. A batch whose jobs all failed
+    keeps its payment until one of them is retried.
+    """
+    batch_id = job.get("batch_id") if job else None
+    batch = jobs.get(batch_id) if batch_id else None
+    if batch is None or batch["payment_status"] == "completed":
+        return
+    children = [jobs.get(job_id) for job_id in batch["job_ids"]]
+    if any(child is not None and child["status"] not in FINISHED_STATUSES for child in children):
+        return
+    completed = {
+        child["job_id"]: (child["result"] or {}).get("json_dict")
+        for child in children if child is not None and child["status"] == "completed"
+    }
+    if not completed:
+        if jobs.transition(batch_id, batch["status"], status="failed") is not None:
+            job_events.publish(batch_id, "failed", {"job_ids": batch["job_ids"]})
+        return
+
+    # Claim the completion; the batch's last jobs may finish together on different workers
+    if jobs.transition(batch_id, batch["status"], status="completing") is None:
+        return
+    try:
+        if checkpoints and checkpoints.get(batch_id, "payment") is not None:
+            logger.info(f"Payment for batch {batch_id} was completed by an earlier attempt")
+        else:
+            with span("payment", "complete_payment"):
+                async with governor.limit_async("masumi"):
+                    await _payment_for_job(batch).complete_payment(batch["payment_id"], json.dumps(completed))
+            if checkpoints:
+                checkpoints.save(batch_id, "payment", {"payment_id": batch["payment_id"]})
     except Exception as e:
-        logger.error(f"Error processing payment {payment_id} for job {job_id}: {str(e)}", exc_info=True)
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["error"] = str(e)
-        
-        # Still stop monitoring to prevent repeated failures
-        if job_id in payment_instances:
-            payment_instances[job_id].stop_status_monitoring()
-            del payment_instances[job_id]
+        logger.error(f"Error completing payment {batch['payment_id']} for batch {batch_id}: {str(e)}", exc_info=True)
+        jobs.update(batch_id, status="failed", error=str(e))
+        job_events.publish(batch_id, "failed", {"error": str(e)})
+        return
+    logger.info(f"Payment completed for batch {batch_id} with {len(completed)} of {len(children)} jobs")
+    for job_id in completed:
+        jobs.update(job_id, payment_status="completed")
+    jobs.update(batch_id, status="completed", payment_status="completed", completed=len(completed))
+    job_events.publish(batch_id, "completed", {"job_ids": batch["job_ids"], "completed": len(completed)})
+
+async def _on_payment_confirmed(job_id: str, payment_id: str) -> None:
+    job = jobs.get(job_id)
+    if job is not None and job.get("kind") == "batch":
+        await handle_batch_payment(job_id, payment_id)
+    else:
+        await handle_payment_status(job_id, payment_id)
+
+def _record_payment_state(job_id: str, payment_id: str, state) -> None:
+    """ Stores the latest on-chain payment state reported by the poller """
+    jobs.update(job_id, payment_status=state or "pending")
+
+# One poller checks every pending payment; adaptive intervals via PAYMENT_POLL_*
+payment_poller = PaymentPoller.from_env(
+    config,
+    os.getenv("AGENT_IDENTIFIER"),
+    on_paid=_on_payment_confirmed,
+    on_state=_record_payment_state
+)
+
+metrics.gauge("masumi_payments_pending", "Payments the poller is waiting on.").set_function(lambda: payment_poller.pending)
+if work_queue is not None:
+    metrics.gauge("masumi_work_queue_ready", "Paid jobs waiting for a crew worker.").set_function(
+        lambda: work_queue.stats()["ready"]
+    )
+
+# New jobs are rejected with 429 before a payment request is created when the
+# node is over capacity; tune with ADMISSION_* (see admission.py)
+admission = AdmissionController.from_env(crew_runner, jobs, work_queue=work_queue, governor=governor)
+metrics.gauge("masumi_admission_free", "Jobs this node can still admit.").set_function(
+    lambda: admission.capacity()["free"]
+)
+
+@app.on_event("startup")
+async def start_payment_poller():
+    """ Resumes watching payments of jobs persisted before a restart """
+    job_events.bind_loop(asyncio.get_running_loop())
+    # A job left "starting" by a restart never got its payment request
+    for job in jobs.find(status="starting"):
+        if time.time() - job["created_at"] >= START_JOB_RESERVATION_SECONDS:
+            jobs.update(job["job_id"], status="failed", error="Server stopped before the payment request was created")
+    # The jobs of a batch wait on the batch's payment, which is watched under the batch id
+    pending = [job for job in jobs.find(status="awaiting_payment") if not job.get("batch_id")]
+    payment_poller.watch_many((job["payment_id"], job["job_id"], job.get("created_at")) for job in pending)
+    logger.info(f"Watching {len(pending)} pending payments")
+    payment_poller.start()
+
+@app.on_event("shutdown")
+async def stop_payment_poller():
+    await payment_poller.stop()
 
 # ─────────────────────────────────────────────────────────────────────────────
 # 3) Check Job and Payment Status (MIP-003: /status)
@@ -310,24 +831,17 @@ async def handle_payment_status(job_id: str, payment_id: str) -> None:
 async def get_status(job_id: str):
     """ Retrieves the current status of a specific job """
     logger.info(f"Checking status for job {job_id}")
-    if job_id not in jobs:
+    job = jobs.get(job_id)
+    if job is None:
         logger.warning(f"Job {job_id} not found")
         raise HTTPException(status_code=404, detail="Job not found")
 
-    job = jobs[job_id]
-
-    # Check latest payment status if payment instance exists
-    if job_id in payment_instances:
-        try:
-            status = await payment_instances[job_id].check_payment_status()
-            job["payment_status"] = status.get("data", {}).get("status")
-            logger.info(f"Updated payment status for job {job_id}: {job['payment_status']}")
-        except ValueError as e:
-            logger.warning(f"Error checking payment status: {str(e)}")
-            job["payment_status"] = "unknown"
-        except Exception as e:
-            logger.error(f"Error checking payment status: {str(e)}", exc_info=True)
-            job["payment_status"] = "error"
+    # payment_status is kept current by the shared payment poller; the jobs
+    # of a batch share the payment of their batch until it is confirmed
+    if job.get("batch_id") and job["status"] in ("starting", "awaiting_payment"):
+        batch = jobs.get(job["batch_id"])
+        if batch is not None:
+            job["payment_status"] = batch["payment_status"]
 
     return {
         "job_id": job_id,
@@ -336,18 +850,116 @@ async def get_status(job_id: str):
         "result": job.get("result")
     }
 
+@app.get("/batch_status")
+async def get_batch_status(batch_id: str):
+    """ Status of a batch from /start_jobs and of each of its jobs """
+    batch = jobs.get(batch_id)
+    if batch is None or batch.get("kind") != "batch":
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    children = [jobs.get(job_id) for job_id in batch["job_ids"]]
+    items = [
+        {
+            "job_id": job_id,
+            "status": child["status"] if child else "unknown",
+            "payment_status": child["payment_status"] if child else "unknown"
+        }
+        for job_id, child in zip(batch["job_ids"], children)
+    ]
+    counts = {}
+    for item in items:
+        counts[item["status"]] = counts.get(item["status"], 0) + 1
+
+    return {
+        "batch_id": batch_id,
+        "status": batch["status"],
+        "payment_status": batch["payment_status"],
+        "payment_id": batch.get("payment_id"),
+        "counts": counts,
+        "jobs": items
+    }
+
+@app.post("/retry_job")
+async def retry_job(data: RetryJobRequest):
+    """
+    Runs a paid job that failed again. Steps an earlier attempt checkpointed
+    (contacts found, emails written and sent, payment completion) are not repeated.
+    """
+    job = jobs.get(data.job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.get("kind") == "batch":
+        raise HTTPException(status_code=400, detail="Retry the jobs of a batch one by one")
+    if job["status"] not in ("failed", "timeout") or job["payment_status"] != "paid":
+        raise HTTPException(status_code=409, detail="Only paid jobs that failed can be retried")
+
+    if work_queue is not None:
+        job = jobs.transition(job["job_id"], job["status"], status="queued", error=None)
+        if job is not None:
+            work_queue.enqueue(job["job_id"], {"payment_id": job["payment_id"]})
+    else:
+        job = jobs.transition(job["job_id"], job["status"], status="running", error=None)
+        if job is not None:
+            asyncio.create_task(retry_paid_job(job))
+    if job is None:
+        raise HTTPException(status_code=409, detail="Job is already being retried")
+    logger.info(f"Retrying job {job['job_id']}")
+    job_events.publish(job["job_id"], job["status"], {"retry": True})
+
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "checkpoints": list(checkpoints.steps(job["job_id"])) if checkpoints else []
+    }
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 3b) Stream Job Progress (Server-Sent Events)
+# ─────────────────────────────────────────────────────────────────────────────
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request):
+    """ Streams a job's progress events; reconnecting clients send Last-Event-ID """
+    if job_id not in jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    last_event_id = parse_last_event_id(request.headers.get("last-event-id"))
+    return StreamingResponse(
+        job_events.sse(job_id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # ─────────────────────────────────────────────────────────────────────────────
 # 4) Check Server Availability (MIP-003: /availability)
 # ─────────────────────────────────────────────────────────────────────────────
 @app.get("/availability")
 async def check_availability():
-    """ Checks if the server is operational """
+    """ Reports whether the server takes new jobs, and its free capacity, latency and rate-limit state """
+    capacity = await asyncio.to_thread(admission.capacity)
+    refusal = admission.refusal(capacity=capacity)
+    if refusal is not None:
+        return {
+            "status": "unavailable",
+            "agentIdentifier": os.getenv("AGENT_IDENTIFIER"),
+            "message": str(refusal),
+            "retryAfter": math.ceil(refusal.retry_after),
+            "capacity": capacity
+        }
     return {
         "status": "available",
         "agentIdentifier": os.getenv("AGENT_IDENTIFIER"),
-        "message": "The server is running smoothly."
+        "message": "The server is running smoothly.",
+        "capacity": capacity,
+        "llm_cache": _llm_cache_stats()
     }
 
+def _llm_cache_stats():
+    # Crews run on crew_worker.py nodes in queue mode, and importing the cache
+    # pulls in crewai; leave that to the warm-up
+    if work_queue is not None or not warmup.ready:
+        return None
+    from masumi_crew.llm_cache import llm_cache_stats
+    return llm_cache_stats()
+
 # ─────────────────────────────────────────────────────────────────────────────
 # 5) Retrieve Input Schema (MIP-003: /input_schema)
 # ─────────────────────────────────────────────────────────────────────────────
@@ -371,6 +983,14 @@ async def input_schema():
         ]
     }
 
+# ─────────────────────────────────────────────────────────────────────────────
+# 5b) Prometheus Metrics
+# ─────────────────────────────────────────────────────────────────────────────
+@app.get("/metrics")
+async def prometheus_metrics():
+    """ Stage latency histograms, retry and token counters, queue and in-flight gauges """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # ─────────────────────────────────────────────────────────────────────────────
 # 6) Health Check
 # ─────────────────────────────────────────────────────────────────────────────
@@ -383,6 +1003,16 @@ async def health():
         "status": "healthy"
     }
 
+@app.get("/ready")
+async def ready():
+    """
+    Readiness probe: 503 until the crew stack has loaded, so traffic is only
+    routed to a new instance once its first job will not pay the import cost.
+    """
+    if not warmup.ready:
+        raise HTTPException(status_code=503, detail=warmup.status())
+    return {"status": "ready", **warmup.status()}
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Main Logic if Called as a Script
 # ─────────────────────────────────────────────────────────────────────────────
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+from masumi.config import Config
+from masumi.payment import Payment
+from masumi_crew.governor import RateGovernor, get_governor
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Shared payment-status poller
+#
+# Instead of one Payment.start_status_monitoring loop per job, a single
+# PaymentPoller tracks every pending payment_id and checks them all with one
+# walk of the payment listing per tick. Young payments are checked often, old ones
+# progressively less, so traffic grows with ticks rather than with jobs.
+# ─────────────────────────────────────────────────────────────────────────────
+
+logger = logging.getLogger(__name__)
+
+# On-chain states and next actions that mean the purchaser has paid and the
+# job may run; the same check as Payment.start_status_monitoring
+PAID_STATES = ("FundsLocked", "Complete")
+PAID_ACTIONS = ("PaymentComplete", "None")
+
+
+def is_paid(payment: dict) -> bool:
+    next_action = (payment.get("NextAction") or {}).get("requestedAction")
+    return payment.get("onChainState") in PAID_STATES or next_action in PAID_ACTIONS
+
+
+class PaymentPoller:
+    def __init__(
+        self,
+        config: Config,
+        agent_identifier: Optional[str],
+        on_paid: Callable[[str, str], Awaitable[None]],
+        on_state: Optional[Callable[[str, str, Optional[str]], None]] = None,
+        page_size: int = 100,
+        tick_seconds: float = 2,
+        young_age: float = 120,
+        young_interval: float = 5,
+        interval: float = 30,
+        old_age: float = 1800,
+        old_interval: float = 120,
+        governor: Optional[RateGovernor] = None,
+    ):
+        self.config = config
+        self.agent_identifier = agent_identifier
+        self.on_paid = on_paid
+        self.on_state = on_state
+        self.page_size = page_size
+        self.tick_seconds = tick_seconds
+        self.young_age = young_age
+        self.young_interval = young_interval
+        self.interval = interval
+        self.old_age = old_age
+        self.old_interval = old_interval
+        self.governor = governor or get_governor()
+        # payment_id -> {"job_id", "registered_at", "next_check"}
+        self._watched: Dict[str, dict] = {}
+        self._task: Optional[asyncio.Task] = None
+        # One Payment object is reused purely as a client for the listing endpoint
+        self._client = Payment(
+            agent_identifier=agent_identifier,
+            config=config,
+            identifier_from_purchaser="payment-poller",
+            input_data={}
+        )
+
+    @classmethod
+    def from_env(cls, config: Config, agent_identifier: Optional[str], on_paid, on_state=None) -> "PaymentPoller":
+        """ Builds a poller tuned by PAYMENT_POLL_* environment variables """
+        return cls(
+            config,
+            agent_identifier,
+            on_paid,
+            on_state=on_state,
+            page_size=int(os.getenv("PAYMENT_POLL_PAGE_SIZE", "100")),
+            young_interval=float(os.getenv("PAYMENT_POLL_YOUNG_INTERVAL", "5")),
+            interval=float(os.getenv("PAYMENT_POLL_INTERVAL", "30")),
+            old_interval=float(os.getenv("PAYMENT_POLL_OLD_INTERVAL", "120")),
+        )
+
+    @property
+    def pending(self) -> int:
+        return len(self._watched)
+
+    def watch(self, payment_id: str, job_id: str, registered_at: Optional[float] = None) -> None:
+        """ Starts tracking a payment; on_paid(job_id, payment_id) fires once it is paid """
+        now = time.time()
+        self._watched[payment_id] = {
+            "job_id": job_id,
+            "registered_at": registered_at or now,
+            "next_check": now,
+        }
+
+    def watch_many(self, entries: Iterable[tuple]) -> None:
+        for payment_id, job_id, registered_at in entries:
+            self.watch(payment_id, job_id, registered_at)
+
+    def unwatch(self, payment_id: str) -> None:
+        self._watched.pop(payment_id, None)
+
+    def _interval_for(self, age: float) -> float:
+        if age < self.young_age:
+            return self.young_interval
+        if age < self.old_age:
+            return self.interval
+        return self.old_interval
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Payment poll failed: {str(e)}", exc_info=True)
+            await asyncio.sleep(self.tick_seconds)
+
+    async def poll_once(self) -> int:
+        """ Checks every payment that is due with a single request; returns how many were due """
+        now = time.time()
+        due = [pid for pid, entry in self._watched.items() if entry["next_check"] <= now]
+        if not due:
+            return 0
+
+        # check_payment_status walks every page of the agent's payment listing,
+        # so one check costs a request per page_size payments on record; full
+        # pages keep that count as low as the service allows.
+        self._client.payment_ids = set(due)
+        async with self.governor.limit_async("masumi"):
+            response = await self._client.check_payment_status(limit=self.page_size)
+        payments = response.get("data", {}).get("Payments", [])
+        by_id = {p.get("blockchainIdentifier"): p for p in payments}
+
+        for payment_id in due:
+            entry = self._watched.get(payment_id)
+            if entry is None:
+                continue
+            payment = by_id.get(payment_id)
+            state = payment.get("onChainState") if payment else None
+            if self.on_state and payment is not None:
+                self.on_state(entry["job_id"], payment_id, state)
+            if payment is not None and is_paid(payment):
+                self.unwatch(payment_id)
+                logger.info(f"Payment {payment_id} for job {entry['job_id']} is {state}")
+                asyncio.get_running_loop().create_task(self.on_paid(entry["job_id"], payment_id))
+            else:
+                entry["next_check"] = now + self._interval_for(now - entry["registered_at"])
+        return len(due)
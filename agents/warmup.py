@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from masumi_crew.telemetry import record
+
+logger = logging.getLogger(__name__)
+
+
+class Warmup:
+    """
+    Start-up work that runs in the background after the server is listening.
+
+    Importing crewai and Composio and building crews takes seconds, so it is
+    done here, off the event loop, instead of at module import. /health and
+    /availability answer during warm-up; /ready reports 503 until every
+    required step has finished. An optional step that fails is logged and
+    skipped, since whatever it prepares is also built on demand.
+    """
+
+    def __init__(self):
+        self._steps: List[tuple] = []
+        self.state = "pending"
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.timings: Dict[str, float] = {}
+        self._done = asyncio.Event()
+
+    def step(self, name: str, fn: Callable[[], Any], required: bool = True) -> None:
+        self._steps.append((name, fn, required))
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        self.state = "warming"
+        self.started_at = time.time()
+        try:
+            for name, fn, required in self._steps:
+                started = time.perf_counter()
+                outcome = "ok"
+                try:
+                    await loop.run_in_executor(None, fn)
+                except Exception as e:
+                    outcome = "error"
+                    if required:
+                        self.state = "failed"
+                        self.error = f"{name}: {e}"
+                        logger.exception(f"Warm-up step {name} failed")
+                        return
+                    logger.warning(f"Optional warm-up step {name} failed: {e}")
+                finally:
+                    self.timings[name] = time.perf_counter() - started
+                    record("startup", name, self.timings[name], outcome)
+            self.state = "ready"
+        finally:
+            self.finished_at = time.time()
+            self._done.set()
+
+    def start(self) -> "asyncio.Task":
+        """Schedules run() on the running loop; call from a startup handler."""
+        return asyncio.get_running_loop().create_task(self.run())
+
+    async def wait(self) -> bool:
+        await self._done.wait()
+        return self.ready
+
+    def status(self) -> Dict[str, Any]:
+        seconds = None
+        if self.started_at is not None:
+            seconds = (self.finished_at or time.time()) - self.started_at
+        return {
+            "state": self.state,
+            "error": self.error,
+            "seconds": seconds,
+            "steps": {name: round(value, 3) for name, value in self.timings.items()},
+        }
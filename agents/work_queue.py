@@ -0,0 +1,227 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Work queue
+#
+# With CREW_EXECUTION=queue the API nodes only take payments; paid jobs are
+# put on this queue and run by crew_worker.py processes, which can live on
+# other machines. A worker leases a message for lease_seconds and keeps the
+# lease alive with heartbeats. If the worker dies, the lease runs out and the
+# message is handed to the next worker that asks. WorkQueue is the interface;
+# SQLiteWorkQueue is the default backend. Other backends register themselves
+# in BACKENDS by URL scheme.
+# ─────────────────────────────────────────────────────────────────────────────
+
+# Message states; "done" messages are deleted after the TTL
+READY, LEASED, DONE = "ready", "leased", "done"
+
+
+class WorkQueue(ABC):
+    """ Interface every work queue backend implements """
+
+    def __init__(self, lease_seconds: float = 120, max_attempts: int = 3, ttl_seconds: Optional[float] = None):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.ttl_seconds = ttl_seconds
+        self._last_eviction = 0.0
+
+    @abstractmethod
+    def enqueue(self, job_id: str, payload: Optional[Dict[str, Any]] = None, delay: float = 0) -> bool:
+        """
+        Adds a message for job_id; returns False if the job is already queued.
+        Enqueueing is idempotent so every API node may react to the same payment.
+        A job whose message is done (e.g. one being retried) is queued again
+        with a fresh attempt count.
+        """
+        ...
+
+    @abstractmethod
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Leases the oldest available message to worker_id and returns it
+        (id, job_id, payload, attempts), or None if nothing is available.
+        A message whose lease expired is available again.
+        """
+        ...
+
+    @abstractmethod
+    def heartbeat(self, message_id: int, worker_id: str) -> bool:
+        """ Extends the lease; False means the worker lost it and must not ack """
+        ...
+
+    @abstractmethod
+    def ack(self, message_id: int, worker_id: str) -> bool:
+        """ Marks a leased message done """
+        ...
+
+    @abstractmethod
+    def release(self, message_id: int, worker_id: str, delay: float = 0) -> bool:
+        """ Gives a leased message back for another worker, e.g. on shutdown """
+        ...
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        ...
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """ SQLite backend in WAL mode; workers on one host (or a shared volume) can use it """
+
+    def __init__(self, path: str = "work_queue.db", **kwargs: Any):
+        super().__init__(**kwargs)
+        self.path = path
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self) -> None:
+        self._connect().executescript(
+            """
+            CREATE TABLE IF NOT EXISTS work_queue (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT NOT NULL UNIQUE,
+                payload TEXT NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL,
+                lease_owner TEXT,
+                lease_expires REAL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_work_queue_state ON work_queue(state, available_at);
+            """
+        )
+
+    def enqueue(self, job_id: str, payload: Optional[Dict[str, Any]] = None, delay: float = 0) -> bool:
+        now = time.time()
+        cursor = self._connect().execute(
+            "INSERT INTO work_queue (job_id, payload, state, available_at, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(job_id) DO UPDATE SET payload = excluded.payload, state = excluded.state, attempts = 0,"
+            " available_at = excluded.available_at, lease_owner = NULL, lease_expires = NULL,"
+            " updated_at = excluded.updated_at WHERE work_queue.state = ?",
+            (job_id, json.dumps(payload or {}), READY, now + delay, now, now, DONE),
+        )
+        return cursor.rowcount == 1
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        now = time.time()
+        # BEGIN IMMEDIATE takes the write lock up front so two workers can never lease the same message
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT * FROM work_queue WHERE (state = ? AND available_at <= ?)"
+                " OR (state = ? AND lease_expires < ?) ORDER BY id LIMIT 1",
+                (READY, now, LEASED, now),
+            ).fetchone()
+            if row is None:
+                conn.execute("ROLLBACK")
+                return None
+            conn.execute(
+                "UPDATE work_queue SET state = ?, attempts = attempts + 1, lease_owner = ?,"
+                " lease_expires = ?, updated_at = ? WHERE id = ?",
+                (LEASED, worker_id, now + self.lease_seconds, now, row["id"]),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._maybe_evict()
+        return {
+            "id": row["id"],
+            "job_id": row["job_id"],
+            "payload": json.loads(row["payload"]),
+            "attempts": row["attempts"] + 1,
+        }
+
+    def _update_leased(self, message_id: int, worker_id: str, sql: str, params: tuple) -> bool:
+        cursor = self._connect().execute(
+            sql + " WHERE id = ? AND state = ? AND lease_owner = ?", params + (message_id, LEASED, worker_id),
+        )
+        return cursor.rowcount == 1
+
+    def heartbeat(self, message_id: int, worker_id: str) -> bool:
+        now = time.time()
+        return self._update_leased(
+            message_id, worker_id, "UPDATE work_queue SET lease_expires = ?, updated_at = ?",
+            (now + self.lease_seconds, now),
+        )
+
+    def ack(self, message_id: int, worker_id: str) -> bool:
+        return self._update_leased(
+            message_id, worker_id, "UPDATE work_queue SET state = ?, lease_owner = NULL, updated_at = ?",
+            (DONE, time.time()),
+        )
+
+    def release(self, message_id: int, worker_id: str, delay: float = 0) -> bool:
+        now = time.time()
+        # A release is not a failed attempt, so the attempt it used is given back
+        return self._update_leased(
+            message_id, worker_id,
+            "UPDATE work_queue SET state = ?, attempts = MAX(attempts - 1, 0), lease_owner = NULL,"
+            " available_at = ?, updated_at = ?",
+            (READY, now + delay, now),
+        )
+
+    def stats(self) -> Dict[str, int]:
+        now = time.time()
+        rows = self._connect().execute(
+            "SELECT CASE WHEN state = ? AND lease_expires < ? THEN 'expired' ELSE state END AS s, COUNT(*)"
+            " FROM work_queue GROUP BY s",
+            (LEASED, now),
+        ).fetchall()
+        counts = {READY: 0, LEASED: 0, "expired": 0, DONE: 0}
+        counts.update({row[0]: row[1] for row in rows})
+        return counts
+
+    def _maybe_evict(self, interval: float = 300) -> None:
+        now = time.time()
+        if self.ttl_seconds and now - self._last_eviction >= interval:
+            self._last_eviction = now
+            self._connect().execute(
+                "DELETE FROM work_queue WHERE state = ? AND updated_at < ?", (DONE, now - self.ttl_seconds),
+            )
+
+
+# URL scheme -> backend class. Register new backends here.
+BACKENDS = {
+    "sqlite": SQLiteWorkQueue,
+}
+
+
+def create_work_queue(url: Optional[str] = None) -> WorkQueue:
+    """
+    Builds the work queue described by url (default: WORK_QUEUE_URL or
+    sqlite:///work_queue.db). Leases last WORK_QUEUE_LEASE_SECONDS; a job whose
+    lease expired WORK_QUEUE_MAX_ATTEMPTS times is given up on.
+    """
+    url = url or os.getenv("WORK_QUEUE_URL", "sqlite:///work_queue.db")
+    parsed = urlparse(url)
+    backend = BACKENDS.get(parsed.scheme)
+    if backend is None:
+        raise ValueError(f"Unsupported work queue backend: {parsed.scheme}")
+    path = parsed.path[1:] if parsed.path.startswith("/") else parsed.path
+    return backend(
+        path or "work_queue.db",
+        lease_seconds=float(os.getenv("WORK_QUEUE_LEASE_SECONDS", "120")),
+        max_attempts=int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", "3")),
+        ttl_seconds=float(os.getenv("JOB_TTL_SECONDS", str(7 * 24 * 3600))),
+    )
@@ -4,6 +4,11 @@ import { openai } from "@ai-sdk/openai";
 import { exec } from "child_process";
 import { Prospect } from "@/globals/type";
 
+// How often /status is polled, and how long to wait for the crew run in total.
+// The default wait is a little over the server's 900s job timeout (CREW_JOB_TIMEOUT).
+const STATUS_POLL_INTERVAL_MS = 3000;
+const STATUS_MAX_WAIT_MS = Number(process.env.PROSPECTS_MAX_WAIT_MS ?? 16 * 60 * 1000);
+
 export async function GET(request: Request) {
   try {
     const { searchParams } = new URL(request.url);
@@ -61,23 +66,40 @@ export async function getProspects(description: string) {
     throw new Error("Failed to get job_id from start_job response");
   }
 
-  // Second request: status with job_id
+  // Second request: poll status with job_id until the crew run finishes
   const statusCurlCommand = `curl -X GET 'http://localhost:8000/status?job_id=${startJobResponse.job_id}' -H 'accept: application/json'`;
 
-  const prospects = await new Promise<any>((resolve, reject) => {
-    exec(statusCurlCommand, (error, stdout, stderr) => {
-      if (error) {
-        reject(error);
-        return;
-      }
-      try {
-        const json = JSON.parse(stdout);
-        resolve(json);
-      } catch (parseError) {
-        reject(parseError);
-      }
+  const fetchStatus = () =>
+    new Promise<any>((resolve, reject) => {
+      exec(statusCurlCommand, (error, stdout, stderr) => {
+        if (error) {
+          reject(error);
+          return;
+        }
+        try {
+          const json = JSON.parse(stdout);
+          resolve(json);
+        } catch (parseError) {
+          reject(parseError);
+        }
+      });
     });
-  });
+
+  const deadline = Date.now() + STATUS_MAX_WAIT_MS;
+  let prospects = await fetchStatus();
+  while (prospects.status === "queued" || prospects.status === "running") {
+    if (Date.now() + STATUS_POLL_INTERVAL_MS > deadline) {
+      throw new Error(
+        `Job ${startJobResponse.job_id} still ${prospects.status} after ${Math.round(STATUS_MAX_WAIT_MS / 1000)}s`
+      );
+    }
+    await new Promise((resolve) => setTimeout(resolve, STATUS_POLL_INTERVAL_MS));
+    prospects = await fetchStatus();
+  }
+
+  if (prospects.status !== "completed") {
+    throw new Error(prospects.error || `Job ended with status ${prospects.status}`);
+  }
 
   const toJson = JSON.parse(prospects.result.tasks_output[0].raw);
 